@@ -0,0 +1,96 @@
+import os
+import filecmp
+import hashlib
+import joblib
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = os.path.join("models", "cache")
+
+def hash_data(*arrays):
+    """
+    Content hash of DataFrames / Series / arrays (values, dtypes and column names).
+    """
+    digest = hashlib.sha1()
+    for data in arrays:
+        if isinstance(data, (pd.DataFrame, pd.Series)):
+            names = list(data.columns) if isinstance(data, pd.DataFrame) else [data.name]
+            digest.update(repr(names).encode())
+            digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+        else:
+            data = np.asarray(data)
+            digest.update(f"{data.dtype.str}{data.shape}".encode())
+            # Hash in row blocks so memory-mapped arrays are never loaded whole
+            block = max(1, (1 << 24) // max(data[:1].nbytes, 1))
+            for start in range(0, len(data), block):
+                digest.update(np.ascontiguousarray(data[start:start + block]).tobytes())
+    return digest.hexdigest()
+
+def hash_params(*parts):
+    """
+    Hash of configuration values (feature lists, thresholds, estimator params, ...).
+    Estimators are represented by their class and get_params().
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        if hasattr(part, "get_params"):
+            part = (type(part).__name__, sorted((k, repr(v)) for k, v in part.get_params().items()))
+        digest.update(repr(part).encode())
+    return digest.hexdigest()
+
+def save_if_changed(value, path):
+    """
+    joblib.dump value to path, leaving the file (and its mtime) untouched if it
+    already holds identical bytes. Returns True if the file was written.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(value, tmp_path)
+    if os.path.exists(path) and filecmp.cmp(tmp_path, path, shallow=False):
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, path)
+    return True
+
+def model_key(data_key, name, model, *extra):
+    """
+    Cache key for a model trained on data identified by data_key.
+    Only this model's own parameters are included, so editing one model leaves the others cached.
+    """
+    return hash_params(data_key, name, model, *extra)
+
+class ArtifactCache:
+    """
+    Content-addressed store for pipeline artifacts (scaled matrices, fold scores, fitted models).
+    Artifacts live at <root>/<kind>/<key[:2]>/<key>.pkl and are never modified once written.
+    """
+
+    def __init__(self, root=CACHE_DIR):
+        self.root = root
+
+    def path(self, kind, key):
+        return os.path.join(self.root, kind, key[:2], f"{key}.pkl")
+
+    def has(self, kind, key):
+        return os.path.exists(self.path(kind, key))
+
+    def load(self, kind, key):
+        return joblib.load(self.path(kind, key))
+
+    def get(self, kind, key, default=None):
+        if not self.has(kind, key):
+            return default
+        try:
+            return self.load(kind, key)
+        except Exception:
+            # A corrupt entry is treated as a miss and overwritten on the next save
+            return default
+
+    def save(self, kind, key, value):
+        path = self.path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial artifact
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        joblib.dump(value, tmp_path)
+        os.replace(tmp_path, path)
+        return path
@@ -0,0 +1,221 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+
+def percentiles(samples):
+    """
+    Latency summary in milliseconds.
+    """
+    samples = np.asarray(samples) * 1000
+    return {
+        "n": int(samples.size),
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p90_ms": float(np.percentile(samples, 90)),
+        "p99_ms": float(np.percentile(samples, 99)),
+        "max_ms": float(samples.max())
+    }
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def make_queries(df, n_queries, rng):
+    """
+    A mix of substring, multi-token (name + artist) and misspelled queries drawn from the catalog.
+    """
+    from src.search_index import clean_artists
+    rows = rng.choice(len(df), size=n_queries, replace=True)
+    queries = []
+    for i, row in enumerate(rows):
+        name = str(df['name'].iloc[row]).lower()
+        artist = clean_artists(df['artists'].iloc[row]).split(",")[0].lower()
+        kind = i % 3
+        if kind == 0:
+            queries.append(name)
+        elif kind == 1:
+            queries.append(f"{name.split()[0]} {artist.split()[-1]}")
+        else:
+            # Drop one character to simulate a typo
+            pos = int(rng.integers(len(name))) if name else 0
+            queries.append(name[:pos] + name[pos + 1:])
+    return queries
+
+def bench_catalog(n_rows, n_queries=200, n_predictions=200, with_training=False,
+                  with_evaluation=False, seed=42):
+    """
+    Time every hot path on a fresh synthetic catalog of n_rows, cold (no caches) and warm.
+    Must be called from an empty working directory; all artifacts land under it.
+    """
+    from src.synthetic_data import write_catalog
+    from src import search_index
+    from src.data_loader import load_data
+    from src.data_engineering import preprocess_data, split_data, TRAINING_COLUMNS
+    from src.live_predict import search_local_data, CATALOG_COLUMNS
+    from src.predict import predict_song, predict_batch
+    from src.train_models import get_models
+    import joblib
+
+    rng = np.random.default_rng(seed)
+    results = {"rows": n_rows}
+
+    _, elapsed = timed(write_catalog, os.path.join("data", "spotify_data.csv"), n_rows, seed=seed)
+    results["generate_s"] = elapsed
+    print(f"  generated {n_rows} rows in {elapsed:.2f}s")
+
+    # load_data: cold parses the CSV and builds the columnar cache, warm reads the cache
+    _, cold = timed(load_data, verbose=False)
+    _, warm = timed(load_data, verbose=False)
+    df, projected = timed(load_data, verbose=False, columns=CATALOG_COLUMNS)
+    _, no_cache = timed(load_data, verbose=False, use_cache=False)
+    results["load_data"] = {"cold_s": cold, "warm_s": warm, "warm_projected_s": projected, "csv_only_s": no_cache}
+
+    # preprocess_data: cold fits the scaler, warm hits the artifact cache
+    training_df = load_data(verbose=False, columns=TRAINING_COLUMNS)
+    _, cold = timed(preprocess_data, training_df.copy())
+    (X, y), warm = timed(preprocess_data, training_df.copy())
+    results["preprocess_data"] = {"cold_s": cold, "warm_s": warm}
+
+    # search_local_data: index build (cold), index load from disk, then per-query latency
+    search_index._loaded_indexes.clear()
+    _, build = timed(search_index.get_search_index, df)
+    search_index._loaded_indexes.clear()
+    index, load = timed(search_index.get_search_index, df)
+    latencies = []
+    misses = 0
+    for query in make_queries(df, n_queries, rng):
+        start = time.perf_counter()
+        try:
+            search_local_data(df, query, index)
+        except ValueError:
+            misses += 1
+        latencies.append(time.perf_counter() - start)
+    results["search_local_data"] = {
+        "index_build_s": build, "index_load_s": load, "misses": misses, **percentiles(latencies)
+    }
+
+    # predict_song / predict_batch with the Random Forest from get_models()
+    model = get_models()["Random Forest"]
+    train_rows = min(len(X), 50000)
+    _, fit_time = timed(model.fit, X.iloc[:train_rows], y.iloc[:train_rows])
+    scaler = joblib.load(os.path.join("models", "scaler.pkl"))
+    rows = rng.choice(len(df), size=n_predictions)
+    records = [df.iloc[row].to_dict() for row in rows]
+    _, first = timed(predict_song, records[0], model, scaler)
+    latencies = [timed(predict_song, record, model, scaler)[1] for record in records]
+    batch = df.iloc[:min(len(df), 10000)]
+    _, batch_time = timed(predict_batch, batch, model, scaler)
+    results["predict_song"] = {
+        "fit_rows": train_rows, "fit_s": fit_time, "first_call_s": first, **percentiles(latencies),
+        "batch_rows": len(batch), "batch_s": batch_time
+    }
+
+    if with_training:
+        from src.train_models import train_and_evaluate
+        X_train, X_test, y_train, y_test = split_data(X, y)
+        _, cold = timed(train_and_evaluate, X_train, X_test, y_train, y_test)
+        _, warm = timed(train_and_evaluate, X_train, X_test, y_train, y_test)
+        results["train_and_evaluate"] = {"cold_s": cold, "warm_s": warm}
+
+    if with_evaluation:
+        from src.evaluate import run_evaluation
+        _, cold = timed(run_evaluation)
+        _, warm = timed(run_evaluation)
+        results["run_evaluation"] = {"cold_s": cold, "warm_s": warm}
+
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def run_suite(sizes, label=None, **kwargs):
+    """
+    Benchmark each catalog size in its own scratch directory and return the full report.
+    """
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    report = {
+        "label": label, "commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(), "platform": platform.platform(),
+        "cpu_count": os.cpu_count(), "results": {}
+    }
+    original_dir = os.getcwd()
+    for n_rows in sizes:
+        print(f"\nBenchmarking {n_rows} rows...")
+        work_dir = tempfile.mkdtemp(prefix=f"toptrack-bench-{n_rows}-")
+        try:
+            os.chdir(work_dir)
+            report["results"][str(n_rows)] = bench_catalog(n_rows, **kwargs)
+        finally:
+            os.chdir(original_dir)
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+def _flatten(data, prefix=""):
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and (key.endswith("_s") or key.endswith("_ms")):
+            flat[name] = value
+    return flat
+
+def compare(baseline_path, candidate_path, threshold=1.10):
+    """
+    Print every timing present in both reports with its ratio; flags slowdowns above threshold.
+    """
+    with open(baseline_path) as f:
+        baseline = _flatten(json.load(f)["results"])
+    with open(candidate_path) as f:
+        candidate = _flatten(json.load(f)["results"])
+
+    regressions = 0
+    print(f"{'metric':<50} {'baseline':>12} {'candidate':>12} {'ratio':>8}")
+    for key in sorted(set(baseline) & set(candidate)):
+        ratio = candidate[key] / baseline[key] if baseline[key] else float("inf")
+        flag = "  <-- slower" if ratio > threshold else ""
+        regressions += bool(flag)
+        print(f"{key:<50} {baseline[key]:>12.4f} {candidate[key]:>12.4f} {ratio:>7.2f}x{flag}")
+    print(f"\n{regressions} metrics slower than {threshold:.2f}x the baseline.")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark suite on synthetic catalogs.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000], help="Catalog sizes (rows)")
+    parser.add_argument("--queries", type=int, default=200, help="Search queries per size")
+    parser.add_argument("--predictions", type=int, default=200, help="Single-song predictions per size")
+    parser.add_argument("--with-training", action="store_true", help="Also time train_and_evaluate")
+    parser.add_argument("--with-evaluation", action="store_true", help="Also time run_evaluation (slow)")
+    parser.add_argument("--label", default=None, help="Name for the results file (defaults to the git commit)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"), help="Compare two results files")
+    args = parser.parse_args()
+    try:
+        if args.compare:
+            sys.exit(1 if compare(*args.compare) else 0)
+
+        report = run_suite(
+            args.sizes, label=args.label, n_queries=args.queries, n_predictions=args.predictions,
+            with_training=args.with_training, with_evaluation=args.with_evaluation
+        )
+        label = args.label or report["commit"] or time.strftime("%Y%m%d-%H%M%S")
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_path = os.path.join(RESULTS_DIR, f"{label}.json")
+        with open(output_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBenchmark results saved to {output_path}")
+    except Exception as e:
+        print(f"Error during benchmark: {e}")
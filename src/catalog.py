@@ -0,0 +1,97 @@
+import sys
+import numpy as np
+import pandas as pd
+from src.schema import FEATURE_COLUMNS
+
+class SlimCatalog:
+    """
+    Compact, read-only view of the local catalog for the live predictor.
+
+    Feature and popularity columns are the float32 / small-int arrays of the columnar
+    cache, memory-mapped so predictor processes share them. Names and artists stay
+    dictionary-encoded (the cache's integer codes plus one interned string per distinct
+    value), with artist lists parsed into display form ("A, B") once at load time.
+    Track ids are a fixed-width bytes array instead of Python strings.
+    Missing values (categorical code -1) read back as "" for names and artists and None for ids.
+    """
+
+    def __init__(self, ids, name_codes, names, artist_codes, artists, columns):
+        self.ids = ids
+        self.name_codes = name_codes
+        self.names = names
+        self.artist_codes = artist_codes
+        self.artists = artists
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.name_codes)
+
+    def __getitem__(self, column):
+        """
+        A column as a pandas Series, so build_search_index() can take the catalog like a DataFrame.
+        """
+        if column == 'name':
+            return pd.Series(pd.Categorical.from_codes(self.name_codes, categories=self.names))
+        if column == 'artists':
+            # Display form; clean_artists() leaves it unchanged. The trailing "" is what code -1 picks
+            return pd.Series(np.asarray(self.artists + [""], dtype=object)[self.artist_codes])
+        if column == 'id':
+            return pd.Series(np.char.decode(self.ids))
+        return pd.Series(self.columns[column])
+
+    def name(self, position):
+        code = self.name_codes[position]
+        return self.names[code] if code >= 0 else ""
+
+    def artist_display(self, position):
+        code = self.artist_codes[position]
+        return self.artists[code] if code >= 0 else ""
+
+    def row(self, position):
+        """
+        One song as a plain dict: id, name, artists (display form), popularity and features.
+        """
+        record = {
+            'id': self.ids[position].decode() or None,
+            'name': self.name(position),
+            'artists': self.artist_display(position)
+        }
+        for column, values in self.columns.items():
+            record[column] = values[position].item()
+        return record
+
+def _interned(values):
+    return [sys.intern(str(value)) for value in values]
+
+def read_slim_catalog(cache_dir):
+    """
+    Build a SlimCatalog straight from the columnar cache, without materializing a DataFrame.
+    """
+    from src.search_index import clean_artists
+    from src.data_loader import read_cache_columns
+    from src.live_predict import CATALOG_COLUMNS
+    data = read_cache_columns(cache_dir, CATALOG_COLUMNS)
+
+    name_codes, name_values = data['name']
+    artist_codes, artist_values = data['artists']
+    id_codes, id_values = data['id']
+    if name_values is None or artist_values is None or id_values is None:
+        raise ValueError("Expected id, name and artists to be stored as categorical columns.")
+
+    # Each distinct artists value is parsed once, not on every hit
+    artists = _interned(clean_artists(value) for value in artist_values)
+    # Code -1 (missing) must not index from the end of the category list
+    id_codes = np.asarray(id_codes)
+    ids = np.where(id_codes >= 0, np.asarray(id_values, dtype=np.bytes_)[id_codes], b"")
+    columns = {column: data[column][0] for column in ['popularity'] + FEATURE_COLUMNS}
+    return SlimCatalog(ids, name_codes, _interned(name_values), artist_codes, artists, columns)
+
+def load_slim_catalog(filepath=None):
+    """
+    Load the slim catalog and its search index: (SlimCatalog, SearchIndex).
+    """
+    from src.data_loader import resolve_data_path, ensure_cache
+    from src.search_index import get_search_index
+    filepath = resolve_data_path(filepath)
+    catalog = read_slim_catalog(ensure_cache(filepath, verbose=False))
+    return catalog, get_search_index(catalog, filepath)
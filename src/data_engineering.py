@@ -1,70 +1,208 @@
 import pandas as pd
+import numpy as np
+import json
+import argparse
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import MinMaxScaler
 from src.data_loader import load_data
 import os
 import joblib
+from src.tracing import span, traced
+from src.artifact_cache import ArtifactCache, hash_data, hash_params, save_if_changed
+from src.schema import FEATURE_COLUMNS, TRAINING_COLUMNS, HIT_THRESHOLD
 
-def preprocess_data(df):
+# Where the out-of-core pipeline writes its memory-mapped matrices
+STREAM_DIR = os.path.join("data", "streamed")
+
+@traced("preprocess_data")
+def preprocess_data(df, use_cache=True):
     """
     Select features, define target, and normalize data.
+    
+    Results are cached under a hash of the input columns, the feature list and the
+    target threshold, so an unchanged dataset is not rescaled on every run.
     """
     print("Preprocessing data...")
     
     # 1. Feature Selection
-    # Standard audio features provided by Spotify
-    feature_columns = [
-        'danceability', 'energy', 'key', 'loudness', 'mode', 
-        'speechiness', 'acousticness', 'instrumentalness', 
-        'liveness', 'valence', 'tempo', 'duration_ms', 'year'
-    ]
+    feature_columns = FEATURE_COLUMNS
     
     # Check if columns exist
     missing_cols = [col for col in feature_columns if col not in df.columns]
     if missing_cols:
         raise ValueError(f"Missing columns in dataset: {missing_cols}")
 
-    X = df[feature_columns].copy()
+    cache = ArtifactCache()
+    with span("hash_inputs"):
+        key = hash_params(hash_data(df[feature_columns], df['popularity']), feature_columns, HIT_THRESHOLD, MinMaxScaler())
     
     # 2. Target Definition
     # Create binary "Hit" column (Popularity > 70)
     # Note: 70 is a high threshold, we can adjust if classes are too imbalanced
-    df['is_hit'] = (df['popularity'] > 70).astype(int)
+    df['is_hit'] = (df['popularity'] > HIT_THRESHOLD).astype(int)
     y = df['is_hit']
     
     print(f"Target distribution (Hit=1, Not Hit=0):\n{y.value_counts()}")
+    
+    scaler_path = os.path.join("models", "scaler.pkl")
+    cached = cache.get("preprocess", key) if use_cache else None
+    if cached is not None:
+        X_scaled, scaler = cached
+        print("Reusing cached scaled features.")
+        if save_if_changed(scaler, scaler_path):
+            print(f"Scaler saved to {scaler_path}")
+        return X_scaled, y
+    
+    X = df[feature_columns].copy()
 
     # 3. Data Normalization
     # Scale features to 0-1 range
-    scaler = MinMaxScaler()
-    X_scaled = scaler.fit_transform(X)
-    X_scaled = pd.DataFrame(X_scaled, columns=feature_columns)
+    with span("fit_scaler", rows=len(X)):
+        scaler = MinMaxScaler()
+        X_scaled = scaler.fit_transform(X)
+        X_scaled = pd.DataFrame(X_scaled, columns=feature_columns)
     
     # Save Scaler for future use (Prediction Phase)
-    os.makedirs("models", exist_ok=True)
-    scaler_path = os.path.join("models", "scaler.pkl")
-    joblib.dump(scaler, scaler_path)
-    print(f"Scaler saved to {scaler_path}")
+    with span("save_scaler"):
+        if save_if_changed(scaler, scaler_path):
+            print(f"Scaler saved to {scaler_path}")
+    
+    if use_cache:
+        with span("cache_preprocess"):
+            cache.save("preprocess", key, (X_scaled, scaler))
     
     return X_scaled, y
 
+def _default_source():
+    filepath = os.path.join("data", "spotify_data.csv")
+    if not os.path.exists(filepath):
+        from src.data_loader import download_data
+        filepath = download_data()
+    return filepath
+
+@traced("preprocess_streaming")
+def preprocess_streaming(filepath=None, out_dir=STREAM_DIR, chunksize=500000):
+    """
+    Out-of-core version of preprocess_data for catalogs larger than RAM.
+    
+    Reads the CSV in chunks twice: the first pass fits the scaler incrementally
+    (MinMaxScaler.partial_fit accumulates min/max), the second writes the scaled float32
+    features and int8 target into memory-mapped .npy files in out_dir.
+    Returns (X, y) as read-only memmaps.
+    """
+    print("Preprocessing data in chunks...")
+    filepath = filepath or _default_source()
+    
+    def read_chunks():
+        return pd.read_csv(filepath, usecols=TRAINING_COLUMNS, chunksize=chunksize)
+    
+    # Pass 1: scaler min/max and row count
+    scaler = MinMaxScaler()
+    n_rows = 0
+    n_hits = 0
+    with span("fit_scaler_streaming"):
+        for chunk in read_chunks():
+            scaler.partial_fit(chunk[FEATURE_COLUMNS])
+            n_rows += len(chunk)
+            n_hits += int((chunk['popularity'] > HIT_THRESHOLD).sum())
+    print(f"Target distribution (Hit=1, Not Hit=0): {n_hits} hits / {n_rows - n_hits} non-hits")
+    
+    scaler_path = os.path.join("models", "scaler.pkl")
+    if save_if_changed(scaler, scaler_path):
+        print(f"Scaler saved to {scaler_path}")
+    
+    # Pass 2: scale each chunk straight into the memory-mapped outputs
+    os.makedirs(out_dir, exist_ok=True)
+    X_path = os.path.join(out_dir, "X.npy")
+    y_path = os.path.join(out_dir, "y.npy")
+    X = np.lib.format.open_memmap(X_path, mode='w+', dtype=np.float32, shape=(n_rows, len(FEATURE_COLUMNS)))
+    y = np.lib.format.open_memmap(y_path, mode='w+', dtype=np.int8, shape=(n_rows,))
+    with span("write_streamed", rows=n_rows):
+        position = 0
+        for chunk in read_chunks():
+            end = position + len(chunk)
+            X[position:end] = scaler.transform(chunk[FEATURE_COLUMNS])
+            y[position:end] = (chunk['popularity'] > HIT_THRESHOLD).to_numpy()
+            position = end
+        X.flush()
+        y.flush()
+    del X, y
+    
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump({"columns": FEATURE_COLUMNS, "rows": n_rows, "source": filepath}, f)
+    print(f"Scaled features saved to {X_path} ({n_rows} rows)")
+    return load_streamed(out_dir)
+
+def load_streamed(out_dir=STREAM_DIR, name=""):
+    """
+    Memory-map the matrices written by preprocess_streaming (or split_data's train/test files).
+    """
+    X = np.load(os.path.join(out_dir, f"X{name}.npy"), mmap_mode='r')
+    y = np.load(os.path.join(out_dir, f"y{name}.npy"), mmap_mode='r')
+    return X, y
+
+def _write_rows(source, indices, path, block=1000000):
+    """
+    Copy the given rows of a memmap into a new .npy memmap, one block at a time.
+    """
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=source.dtype, shape=(len(indices),) + source.shape[1:])
+    for start in range(0, len(indices), block):
+        out[start:start + block] = source[indices[start:start + block]]
+    out.flush()
+    del out
+    return np.load(path, mmap_mode='r')
+
+def split_memmap(X, y, test_size=0.2, random_state=42):
+    """
+    Stratified split of memory-mapped X/y into train/test .npy files next to X.
+    Only the index arrays and one block of rows are held in RAM at a time.
+    """
+    out_dir = os.path.dirname(X.filename)
+    train_idx, test_idx = train_test_split(
+        np.arange(len(y)), test_size=test_size, random_state=random_state, stratify=np.asarray(y)
+    )
+    # Sorted indices keep the reads from the source file sequential
+    train_idx.sort()
+    test_idx.sort()
+    X_train = _write_rows(X, train_idx, os.path.join(out_dir, "X_train.npy"))
+    X_test = _write_rows(X, test_idx, os.path.join(out_dir, "X_test.npy"))
+    y_train = _write_rows(y, train_idx, os.path.join(out_dir, "y_train.npy"))
+    y_test = _write_rows(y, test_idx, os.path.join(out_dir, "y_test.npy"))
+    return X_train, X_test, y_train, y_test
+
+@traced("split_data")
 def split_data(X, y, test_size=0.2, random_state=42):
     """
     Split data into training and testing sets.
+    Memory-mapped inputs (from preprocess_streaming) are split into memory-mapped files.
     """
     print("Splitting data...")
+    if isinstance(X, np.memmap):
+        return split_memmap(X, y, test_size=test_size, random_state=random_state)
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=test_size, random_state=random_state, stratify=y
     )
     return X_train, X_test, y_train, y_test
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prepare features and target.")
+    parser.add_argument("--stream", action="store_true", help="Process the CSV in chunks into memory-mapped files")
+    parser.add_argument("--chunksize", type=int, default=500000, help="Rows per chunk with --stream")
+    args = parser.parse_args()
     try:
-        # Load raw data
-        df = load_data()
-        
-        # Preprocess features and target
-        X, y = preprocess_data(df)
+        if args.stream:
+            X, y = preprocess_streaming(chunksize=args.chunksize)
+        else:
+            # Load raw data
+            df = load_data(columns=TRAINING_COLUMNS)
+            
+            # Preprocess features and target
+            X, y = preprocess_data(df)
+            
+            # Similar-song index over the scaled catalog (its own step, not part of preprocessing)
+            from src.neighbor_index import ensure_neighbor_index
+            with span("neighbor_index"):
+                ensure_neighbor_index(X, y)
         
         # Split into train/test
         X_train, X_test, y_train, y_test = split_data(X, y)
@@ -1,7 +1,12 @@
 import pandas as pd
+import numpy as np
 import os
-import kagglehub
+import json
+import hashlib
 import shutil
+from src.tracing import span, traced
+
+CACHE_VERSION = 1
 
 def download_data(target_dir="data"):
     """
@@ -9,6 +14,8 @@ def download_data(target_dir="data"):
     Returns the path to the CSV file.
     """
     print("Downloading dataset from Kaggle...")
+    # Imported here: kagglehub is slow to import and only needed on first run
+    import kagglehub
     # Download latest version
     path = kagglehub.dataset_download("fcpercival/160k-spotify-songs-sorted")
     print("Path to dataset files:", path)
@@ -32,9 +39,151 @@ def download_data(target_dir="data"):
     print(f"Dataset copied to {target_path}")
     return target_path
 
-def load_data(filepath=None, verbose=True):
+@traced("file_hash")
+def file_hash(filepath, chunk_size=1 << 20):
     """
-    Load data from a CSV file. If filepath is not provided, it attempts to download/find it.
+    Content hash of a file, used to key the columnar cache.
+    """
+    digest = hashlib.sha1()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+def _stem(filepath):
+    return os.path.splitext(os.path.basename(filepath))[0]
+
+def source_hash(filepath):
+    """
+    Content hash of filepath, re-read only when its size or mtime has changed.
+    The last (size, mtime_ns, hash) is kept in data/.cache/<csv name>.source.json.
+    """
+    stat = os.stat(filepath)
+    stamp_path = os.path.join(os.path.dirname(filepath), ".cache", f"{_stem(filepath)}.source.json")
+    try:
+        with open(stamp_path) as f:
+            stamp = json.load(f)
+        if stamp["size"] == stat.st_size and stamp["mtime_ns"] == stat.st_mtime_ns:
+            return stamp["hash"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    digest = file_hash(filepath)
+    os.makedirs(os.path.dirname(stamp_path), exist_ok=True)
+    with open(stamp_path + ".tmp", "w") as f:
+        json.dump({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest}, f)
+    os.replace(stamp_path + ".tmp", stamp_path)
+    return digest
+
+def get_cache_dir(filepath):
+    """
+    The columnar cache lives in data/.cache/<csv name>-<content hash>/.
+    """
+    return os.path.join(os.path.dirname(filepath), ".cache", f"{_stem(filepath)}-{source_hash(filepath)}")
+
+def compact_column(series):
+    """
+    Downcast a column to the smallest dtype that holds it:
+    float32 for floats, the smallest int for ints, categorical for strings.
+    """
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_float_dtype(series):
+        return series.astype(np.float32)
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer')
+    return series.astype('category')
+
+@traced("build_cache")
+def build_cache(filepath, cache_dir, content_hash=None):
+    """
+    Parse the CSV once and write one .npy file per column plus a manifest.
+    Categorical columns are stored as integer codes + a JSON list of categories.
+    """
+    with span("read_csv"):
+        df = pd.read_csv(filepath)
+    tmp_dir = cache_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        series = compact_column(df[col])
+        entry = {"name": col, "file": f"col{i}.npy"}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry["kind"] = "category"
+            entry["categories"] = f"col{i}.categories.json"
+            np.save(os.path.join(tmp_dir, entry["file"]), series.cat.codes.to_numpy())
+            with open(os.path.join(tmp_dir, entry["categories"]), "w", encoding="utf-8") as f:
+                json.dump([str(c) for c in series.cat.categories], f)
+        else:
+            entry["kind"] = "numeric"
+            np.save(os.path.join(tmp_dir, entry["file"]), series.to_numpy())
+        columns.append(entry)
+
+    manifest = {"version": CACHE_VERSION, "n_rows": len(df), "source_hash": content_hash, "columns": columns}
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+
+    # Swap the finished cache into place so readers never see a half-written one
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+    return manifest
+
+def is_cache_valid(cache_dir):
+    """
+    A cache is usable if its manifest exists and was written by this CACHE_VERSION.
+    """
+    manifest_path = os.path.join(cache_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return False
+    with open(manifest_path) as f:
+        return json.load(f).get("version") == CACHE_VERSION
+
+def read_cache_columns(cache_dir, columns=None, mmap=True):
+    """
+    Raw cached columns as {name: (values, categories)}: categorical columns give their
+    integer codes and category list, numeric ones give (values, None).
+    """
+    with open(os.path.join(cache_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+
+    entries = {entry["name"]: entry for entry in manifest["columns"]}
+    names = list(entries) if columns is None else list(columns)
+    missing = [name for name in names if name not in entries]
+    if missing:
+        raise ValueError(f"Missing columns in dataset: {missing}")
+
+    data = {}
+    for name in names:
+        entry = entries[name]
+        values = np.load(os.path.join(cache_dir, entry["file"]), mmap_mode='r' if mmap else None)
+        categories = None
+        if entry["kind"] == "category":
+            with open(os.path.join(cache_dir, entry["categories"]), encoding="utf-8") as f:
+                categories = json.load(f)
+        data[name] = (values, categories)
+    return data
+
+@traced("read_cache")
+def read_cache(cache_dir, columns=None, mmap=True):
+    """
+    Read (a projection of) the cached columns as a DataFrame. Numeric columns are memory-mapped,
+    one block per column: the frame is built without consolidation, so same-dtype columns are
+    not merged into an in-memory 2-D block. Later whole-frame operations (.to_numpy(), copies)
+    still materialize, so hot paths that only need arrays use read_cache_columns() directly.
+    """
+    data = {}
+    for name, (values, categories) in read_cache_columns(cache_dir, columns, mmap).items():
+        if categories is not None:
+            values = pd.Categorical.from_codes(np.asarray(values), categories=categories)
+        data[name] = values
+    # copy=False keeps each column its own (unconsolidated) block over the mmap
+    return pd.DataFrame(data, copy=False)
+
+def resolve_data_path(filepath=None):
+    """
+    The CSV to load: filepath, or data/spotify_data.csv (downloaded if missing).
     """
     if filepath is None:
         filepath = os.path.join("data", "spotify_data.csv")
@@ -43,8 +192,36 @@ def load_data(filepath=None, verbose=True):
     
     if not os.path.exists(filepath):
         raise FileNotFoundError(f"The file {filepath} does not exist.")
+    return filepath
+
+def ensure_cache(filepath, verbose=True):
+    """
+    Return the columnar cache directory for filepath, building it first if needed.
+    """
+    cache_dir = get_cache_dir(filepath)
+    if not is_cache_valid(cache_dir):
+        if verbose:
+            print(f"Building columnar cache in {cache_dir}...")
+        build_cache(filepath, cache_dir, source_hash(filepath))
+    return cache_dir
+
+@traced("load_data")
+def load_data(filepath=None, verbose=True, columns=None, use_cache=True):
+    """
+    Load data from a CSV file. If filepath is not provided, it attempts to download/find it.
+
+    The first load converts the CSV into a typed columnar cache next to it; later loads
+    read (and memory-map) only the requested columns from that cache.
+    """
+    filepath = resolve_data_path(filepath)
     
-    df = pd.read_csv(filepath)
+    if use_cache:
+        df = read_cache(ensure_cache(filepath, verbose), columns=columns)
+    else:
+        with span("read_csv"):
+            df = pd.read_csv(filepath, usecols=columns)
+        if columns is not None:
+            df = df[list(columns)]
     if verbose:
         print(f"Loaded data with {df.shape[0]} rows and {df.shape[1]} columns.")
     return df
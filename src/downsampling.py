@@ -0,0 +1,63 @@
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+
+class DownsampledClassifier(ClassifierMixin, BaseEstimator):
+    """
+    Fits estimator on every positive row and a random negative_rate fraction of the
+    negative rows, then maps its probabilities back to the full class balance.
+
+    A model trained on negatives kept at rate beta over-states the odds of a hit by 1/beta,
+    so p = beta * p_s / (beta * p_s - p_s + 1) undoes it. class_weight='balanced' is pinned
+    to the weights of the full training set first; recomputed on the sample it would
+    already shift the odds by beta for some models (logistic regression) and not for
+    others (fully grown trees), and the correction could not be applied uniformly.
+    """
+
+    def __init__(self, estimator, negative_rate=0.1, random_state=42):
+        self.estimator = estimator
+        self.negative_rate = negative_rate
+        self.random_state = random_state
+
+    def sample(self, y):
+        """
+        Sorted row indices kept for training: all positives plus the sampled negatives.
+        """
+        y = np.asarray(y)
+        negatives = np.flatnonzero(y == 0)
+        n_kept = max(1, int(round(len(negatives) * self.negative_rate)))
+        rng = np.random.default_rng(self.random_state)
+        kept = rng.choice(negatives, size=min(n_kept, len(negatives)), replace=False)
+        return np.sort(np.concatenate([np.flatnonzero(y != 0), kept]))
+
+    def fit(self, X, y):
+        if not 0 < self.negative_rate <= 1:
+            raise ValueError(f"negative_rate must be in (0, 1], got {self.negative_rate}")
+        y = np.asarray(y)
+        rows = self.sample(y)
+        # The rate actually applied (rounding can move it slightly)
+        n_negatives = int(np.sum(y == 0))
+        self.negative_rate_ = (len(rows) - int(np.sum(y != 0))) / n_negatives if n_negatives else 1.0
+        self.n_train_rows_ = len(rows)
+        X_sample = X.iloc[rows] if hasattr(X, "iloc") else np.asarray(X)[rows]
+        estimator = clone(self.estimator)
+        if estimator.get_params().get("class_weight") == "balanced":
+            classes, counts = np.unique(y, return_counts=True)
+            estimator.set_params(class_weight={cls: len(y) / (len(classes) * count) for cls, count in zip(classes.tolist(), counts)})
+        self.estimator_ = estimator.fit(X_sample, y[rows])
+        self.classes_ = self.estimator_.classes_
+        if hasattr(self.estimator_, "n_features_in_"):
+            self.n_features_in_ = self.estimator_.n_features_in_
+        return self
+
+    def predict_proba(self, X):
+        proba = np.asarray(self.estimator_.predict_proba(X), dtype=np.float64)
+        beta = self.negative_rate_
+        if beta == 1.0:
+            return proba
+        hit_column = list(self.classes_).index(1)
+        p_s = proba[:, hit_column]
+        p = beta * p_s / (beta * p_s - p_s + 1)
+        return np.column_stack([1 - p, p]) if hit_column == 1 else np.column_stack([p, 1 - p])
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
@@ -1,63 +1,251 @@
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 import os
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from src.data_loader import load_data
 
-def perform_eda(df):
+OUTPUT_DIR = "plots"
+
+# Above this many rows the loudness/popularity scatter is drawn as a binned 2D histogram
+MAX_SCATTER_POINTS = 50000
+
+# Fixed bin edges so aggregates from different chunks can be added together
+POPULARITY_EDGES = np.linspace(0, 100, 101)
+LOUDNESS_EDGES = np.linspace(-60, 5, 131)
+
+class EdaAggregates:
+    """
+    Everything the EDA figures need, accumulated chunk by chunk in one pass:
+    missing counts, moments for the summary and correlation matrix, a popularity
+    histogram and a loudness x popularity 2D histogram. Raw points are kept only
+    while there are at most max_points rows.
+    """
+
+    def __init__(self, max_points=MAX_SCATTER_POINTS):
+        self.max_points = max_points
+        self.rows = 0
+        self.missing = None
+        self.columns = None
+        self.shift = None
+        self.count = None
+        self.sum = None
+        self.cross = None
+        self.minimum = None
+        self.maximum = None
+        self.popularity_counts = np.zeros(len(POPULARITY_EDGES) - 1, dtype=np.int64)
+        self.loudness_popularity = np.zeros((len(LOUDNESS_EDGES) - 1, len(POPULARITY_EDGES) - 1), dtype=np.int64)
+        self.points = []
+
+    def update(self, chunk):
+        self.rows += len(chunk)
+        missing = chunk.isnull().sum()
+        self.missing = missing if self.missing is None else self.missing.add(missing, fill_value=0)
+
+        numeric = chunk.select_dtypes(include='number')
+        if self.columns is None:
+            self.columns = list(numeric.columns)
+            # Moments are taken around the first chunk's means to keep the sums well conditioned
+            self.shift = numeric.mean().to_numpy(dtype=np.float64)
+            n = len(self.columns)
+            self.count = np.zeros((n, n))
+            self.sum = np.zeros((n, n))
+            self.cross = np.zeros((n, n))
+            self.minimum = np.full(n, np.inf)
+            self.maximum = np.full(n, -np.inf)
+        values = numeric[self.columns].to_numpy(dtype=np.float64) - self.shift
+        present = ~np.isnan(values)
+        values = np.where(present, values, 0.0)
+        weights = present.astype(np.float64)
+        # Pairwise-complete sums, like DataFrame.corr()
+        self.count += weights.T @ weights
+        self.sum += values.T @ weights
+        self.cross += values.T @ values
+        self.minimum = np.fmin(self.minimum, np.nanmin(np.where(present, values, np.nan), axis=0))
+        self.maximum = np.fmax(self.maximum, np.nanmax(np.where(present, values, np.nan), axis=0))
+
+        popularity = chunk['popularity'].dropna().to_numpy(dtype=np.float64)
+        self.popularity_counts += np.histogram(popularity, bins=POPULARITY_EDGES)[0]
+        pairs = chunk[['loudness', 'popularity']].dropna().to_numpy(dtype=np.float64)
+        self.loudness_popularity += np.histogram2d(
+            np.clip(pairs[:, 0], LOUDNESS_EDGES[0], LOUDNESS_EDGES[-1]), pairs[:, 1],
+            bins=(LOUDNESS_EDGES, POPULARITY_EDGES)
+        )[0].astype(np.int64)
+
+        if self.points is not None:
+            if self.rows <= self.max_points:
+                self.points.append(pairs)
+            else:
+                self.points = None
+
+    def summary(self):
+        """
+        count / mean / std / min / max per numeric column.
+        """
+        n = np.diag(self.count)
+        mean_shifted = np.diag(self.sum) / n
+        variance = (np.diag(self.cross) - n * mean_shifted ** 2) / (n - 1)
+        return pd.DataFrame({
+            "count": n, "mean": mean_shifted + self.shift, "std": np.sqrt(np.maximum(variance, 0)),
+            "min": self.minimum + self.shift, "max": self.maximum + self.shift
+        }, index=self.columns).T
+
+    def correlation(self):
+        mean_x = self.sum / self.count
+        mean_y = self.sum.T / self.count
+        # Variances use each column's own non-missing rows (same as DataFrame.corr when nothing is missing)
+        covariance = self.cross / self.count - mean_x * mean_y
+        variance = np.diag(self.cross) / np.diag(self.count) - (np.diag(self.sum) / np.diag(self.count)) ** 2
+        std = np.sqrt(np.maximum(variance, 0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = covariance / np.outer(std, std)
+        np.fill_diagonal(corr, 1.0)
+        return pd.DataFrame(np.clip(corr, -1, 1), index=self.columns, columns=self.columns)
+
+def compute_aggregates(chunks, max_points=MAX_SCATTER_POINTS):
+    aggregates = EdaAggregates(max_points)
+    for chunk in chunks:
+        aggregates.update(chunk)
+    return aggregates
+
+def iter_frame(df, chunksize=500000):
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+def smoothed_histogram(counts, edges, total):
+    """
+    KDE-style density curve computed from the histogram itself (Gaussian kernel, Scott's
+    bandwidth), so its cost does not grow with the number of rows.
+    """
+    centers = (edges[:-1] + edges[1:]) / 2
+    width = edges[1] - edges[0]
+    mean = np.average(centers, weights=counts)
+    std = np.sqrt(np.average((centers - mean) ** 2, weights=counts))
+    bandwidth = max(std * total ** (-1 / 5), width)
+    offsets = np.arange(-int(4 * bandwidth / width) - 1, int(4 * bandwidth / width) + 2) * width
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2)
+    kernel /= kernel.sum()
+    return centers, np.convolve(counts, kernel, mode="same")
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+def _save(fig, path):
+    import matplotlib.pyplot as plt
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+def render_correlation(corr, path):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    fig, ax = plt.subplots(figsize=(12, 10))
+    sns.heatmap(corr, annot=True, cmap='coolwarm', fmt=".2f", ax=ax)
+    ax.set_title("Correlation Matrix of Audio Features")
+    return _save(fig, path)
+
+def render_popularity(counts, total, path):
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(10, 6))
+    # Bars merge the 1-point bins five at a time (an even split of the integer scores);
+    # the curve uses the fine bins
+    bar_edges = np.linspace(0, 100, 21)
+    bar_counts = np.histogram(POPULARITY_EDGES[:-1], bins=bar_edges, weights=counts)[0]
+    ax.bar(bar_edges[:-1], bar_counts, width=np.diff(bar_edges), align="edge", alpha=0.6, edgecolor="white")
+    centers, density = smoothed_histogram(counts, POPULARITY_EDGES, total)
+    bar_scale = (bar_edges[1] - bar_edges[0]) / (POPULARITY_EDGES[1] - POPULARITY_EDGES[0])
+    ax.plot(centers, density * bar_scale)
+    ax.set_title("Distribution of Song Popularity")
+    ax.set_xlabel("Popularity")
+    ax.set_ylabel("Count")
+    return _save(fig, path)
+
+def render_loudness_popularity(points, grid, path):
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import LogNorm
+    fig, ax = plt.subplots(figsize=(10, 6))
+    if points is not None:
+        ax.scatter(points[:, 0], points[:, 1], alpha=0.1, s=10)
+    else:
+        mesh = ax.pcolormesh(LOUDNESS_EDGES, POPULARITY_EDGES, np.ma.masked_equal(grid.T, 0),
+                             norm=LogNorm(), cmap="viridis")
+        fig.colorbar(mesh, ax=ax, label="Songs")
+    ax.set_title("Loudness vs Popularity")
+    ax.set_xlabel("Loudness")
+    ax.set_ylabel("Popularity")
+    return _save(fig, path)
+
+def render_figures(aggregates, output_dir=OUTPUT_DIR, workers=None):
+    """
+    Render every figure from the aggregates, one per worker process (Agg backend).
+    Workers only receive the small aggregate arrays, never the dataset.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    points = np.concatenate(aggregates.points) if aggregates.points else None
+    jobs = [
+        ("Correlation matrix", render_correlation,
+         (aggregates.correlation(), os.path.join(output_dir, "correlation_matrix.png"))),
+        ("Popularity distribution", render_popularity,
+         (aggregates.popularity_counts, aggregates.rows, os.path.join(output_dir, "popularity_distribution.png"))),
+        ("Loudness vs Popularity plot", render_loudness_popularity,
+         (points, aggregates.loudness_popularity, os.path.join(output_dir, "loudness_vs_popularity.png")))
+    ]
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    if workers <= 1:
+        _init_worker()
+        for label, fn, args in jobs:
+            print(f"{label} saved to {fn(*args)}")
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = [(label, executor.submit(fn, *args)) for label, fn, args in jobs]
+        for label, future in futures:
+            print(f"{label} saved to {future.result()}")
+
+def perform_eda(df, max_points=MAX_SCATTER_POINTS, workers=None):
     """
     Perform Exploratory Data Analysis on the dataset.
     """
     print("Performing EDA...")
-    
+
     # Check for missing values
     print("\nMissing Values:")
     print(df.isnull().sum())
-    
+
     # Summary statistics
     print("\nSummary Statistics:")
     print(df.describe())
-    
-    # Correlation Matrix
-    numeric_df = df.select_dtypes(include=['float64', 'int64'])
-    plt.figure(figsize=(12, 10))
-    sns.heatmap(numeric_df.corr(), annot=True, cmap='coolwarm', fmt=".2f")
-    plt.title("Correlation Matrix of Audio Features")
-    plt.tight_layout()
-    
-    output_dir = "plots"
-    os.makedirs(output_dir, exist_ok=True)
-    correlation_plot_path = os.path.join(output_dir, "correlation_matrix.png")
-    plt.savefig(correlation_plot_path)
-    print(f"\nCorrelation matrix saved to {correlation_plot_path}")
-    
-    # Distribution of Popularity
-    plt.figure(figsize=(10, 6))
-    sns.histplot(df['popularity'], bins=30, kde=True)
-    plt.title("Distribution of Song Popularity")
-    plt.xlabel("Popularity")
-    plt.ylabel("Count")
-    plt.tight_layout()
-    
-    popularity_plot_path = os.path.join(output_dir, "popularity_distribution.png")
-    plt.savefig(popularity_plot_path)
-    print(f"Popularity distribution saved to {popularity_plot_path}")
-
-    # Scatter plot: Loudness vs Popularity (as per roadmap)
-    plt.figure(figsize=(10, 6))
-    sns.scatterplot(x='loudness', y='popularity', data=df, alpha=0.1)
-    plt.title("Loudness vs Popularity")
-    plt.xlabel("Loudness")
-    plt.ylabel("Popularity")
-    plt.tight_layout()
-    
-    loudness_plot_path = os.path.join(output_dir, "loudness_vs_popularity.png")
-    plt.savefig(loudness_plot_path)
-    print(f"Loudness vs Popularity plot saved to {loudness_plot_path}")
+
+    aggregates = compute_aggregates(iter_frame(df), max_points)
+    render_figures(aggregates, workers=workers)
+
+def perform_eda_streaming(filepath, chunksize=500000, max_points=MAX_SCATTER_POINTS, workers=None):
+    """
+    Same figures for a CSV read in chunks, for exports too large to load at once.
+    """
+    print("Performing EDA in chunks...")
+    aggregates = compute_aggregates(pd.read_csv(filepath, chunksize=chunksize), max_points)
+
+    print("\nMissing Values:")
+    print(aggregates.missing)
+    print("\nSummary Statistics:")
+    print(aggregates.summary())
+
+    render_figures(aggregates, workers=workers)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exploratory Data Analysis plots.")
+    parser.add_argument("--stream", metavar="CSV", default=None, help="Aggregate this CSV in chunks instead of loading it")
+    parser.add_argument("--max-points", type=int, default=MAX_SCATTER_POINTS,
+                        help="Largest dataset drawn as a raw scatter; bigger ones are binned")
+    parser.add_argument("--workers", type=int, default=None, help="Figure rendering processes")
+    args = parser.parse_args()
     try:
-        df = load_data()
-        perform_eda(df)
+        if args.stream:
+            perform_eda_streaming(args.stream, max_points=args.max_points, workers=args.workers)
+        else:
+            df = load_data()
+            perform_eda(df, max_points=args.max_points, workers=args.workers)
     except Exception as e:
         print(f"Error during EDA: {e}")
@@ -4,23 +4,36 @@ import seaborn as sns
 import numpy as np
 import os
 import joblib
-from sklearn.model_selection import cross_val_score, StratifiedKFold
+import argparse
+from sklearn.model_selection import StratifiedKFold
 from src.data_loader import load_data
-from src.data_engineering import preprocess_data
+from src.data_engineering import preprocess_data, TRAINING_COLUMNS
 from src.train_models import get_models
+from src.scheduler import run_scheduled_evaluation, METRICS
+from src.artifact_cache import save_if_changed
+from src.score_table import build_score_table, load_score_table
+from src.model_registry import current_version
+from src.leaderboard import build_entries, save_leaderboard, print_leaderboard, model_file, add_budget_arguments, budget_from_args
+from src.schema import FEATURE_COLUMNS
+from src.tracing import span, traced
 
-def run_evaluation():
+@traced("run_evaluation")
+def run_evaluation(budget=None, metric="accuracy", negative_rate=None):
     """
     Runs Cross-Validation and generates a Leaderboard.
+    negative_rate switches on fast mode (see train_models.get_models).
+
+    Every model's serving cost is measured too (see leaderboard.py); the winner is the best
+    model by metric within budget ({"max_latency_ms", "max_memory_mb", "max_size_mb"}).
     """
     print("Starting Comparative Analysis & Evaluation (Phase 4)...")
     
     # Load Data
-    df = load_data()
+    df = load_data(columns=TRAINING_COLUMNS)
     X, y = preprocess_data(df)
     
     # Initialize Models
-    models = get_models()
+    models = get_models(negative_rate)
     
     # Configuration for Cross-Validation
     # Using StratifiedKFold because of the class imbalance
@@ -28,53 +41,76 @@ def run_evaluation():
     
     results = {}
     print(f"\nRunning {cv.get_n_splits()}-Fold Cross-Validation on {len(models)} models...")
-    print("This might take a few minutes...\n")
+    print("All (model, fold) pairs and final fits share one process pool; finished tasks are checkpointed.\n")
     
-    for name, model in models.items():
-        print(f"Evaluating {name}...")
-        # Using 'f1' or 'roc_auc' is better for imbalance, but we'll stick to accuracy as per roadmap 
-        # (or maybe f1 to be smarter). Let's do Accuracy as requested but maybe print others.
-        # The roadmap explicitly asked for "Metric Calculation" but also "Leaderboard... comparing accuracy".
-        # I will calculate Accuracy for the chart.
-        scores = cross_val_score(model, X, y, cv=cv, scoring='accuracy', n_jobs=-1)
-        mean_score = np.mean(scores)
-        std_score = np.std(scores)
-        
-        print(f"  -> Accuracy: {mean_score:.4f} (+/- {std_score:.4f})")
-        results[name] = mean_score
-        
-        # Train and Save the final model on full data
-        print(f"  -> Training final {name} on full dataset...")
-        model.fit(X, y)
+    evaluation = run_scheduled_evaluation(X, y, models, cv)
+    
+    os.makedirs("models", exist_ok=True)
+    for name, outcome in evaluation.items():
+        print(f"\n{name}:")
+        scores = outcome["scores"]
+        for metric_name in METRICS:
+            print(f"  -> {metric_name}: {np.mean(scores[metric_name]):.4f} (+/- {np.std(scores[metric_name]):.4f})")
+        # The chart shows accuracy, as per roadmap; the winner also depends on cost (see leaderboard.py)
+        results[name] = np.mean(scores["accuracy"])
         
-        # Create models directory if not exists
-        os.makedirs("models", exist_ok=True)
-        model_path = os.path.join("models", f"{name.replace(' ', '_').lower()}.pkl")
-        joblib.dump(model, model_path)
-        print(f"  -> Saved to {model_path}")
+        # Save the final model trained on the full dataset
+        model_path = model_file(name)
+        with span(f"save_model:{name}"):
+            saved = save_if_changed(outcome["model"], model_path)
+        if saved:
+            print(f"  -> Saved to {model_path}")
+        else:
+            print(f"  -> {model_path} is up to date")
+
+    # Rank on serving cost as well; the predictor loads the model picked here
+    print("\nMeasuring serving costs...")
+    with span("measure_serving_cost"):
+        scaler = joblib.load(os.path.join("models", "scaler.pkl"))
+        board = save_leaderboard(build_entries(evaluation, df[FEATURE_COLUMNS], scaler), budget, metric)
+    print_leaderboard(board)
+    print("Leaderboard saved to models/leaderboard.json")
+
+    # Score the whole catalog once so the live predictor can look local songs up
+    with span("score_catalog"):
+        if load_score_table() is None:
+            print("\nScoring the local catalog with the saved model...")
+            build_score_table()
+        else:
+            print("\nCatalog score table is up to date")
 
     # Generate Leaderboard Visualization
     print("\nGenerating Leaderboard Chart...")
     
-    plt.figure(figsize=(10, 6))
-    sns.barplot(x=list(results.keys()), y=list(results.values()), palette='viridis')
-    plt.title("Model Accuracy Leaderboard (5-Fold CV)")
-    plt.ylabel("Accuracy Score")
-    plt.ylim(0.8, 1.0) # Zoom in to see differences if they are high
-    plt.tight_layout()
-    
-    os.makedirs("plots", exist_ok=True)
-    plot_path = os.path.join("plots", "model_leaderboard.png")
-    plt.savefig(plot_path)
+    with span("render_leaderboard"):
+        plt.figure(figsize=(10, 6))
+        sns.barplot(x=list(results.keys()), y=list(results.values()), palette='viridis')
+        plt.title("Model Accuracy Leaderboard (5-Fold CV)")
+        plt.ylabel("Accuracy Score")
+        plt.ylim(0.8, 1.0) # Zoom in to see differences if they are high
+        plt.tight_layout()
+        
+        os.makedirs("plots", exist_ok=True)
+        plot_path = os.path.join("plots", "model_leaderboard.png")
+        plt.savefig(plot_path)
     print(f"Leaderboard saved to {plot_path}")
     
     # Determine Winner
-    winner = max(results, key=results.get)
+    winner = board["winner"]
     print(f"\n🏆 The Winning Model is: {winner} with {results[winner]:.4f} accuracy!")
-    print(f"You can find the saved model in models/{winner.replace(' ', '_').lower()}.pkl")
+    print(f"You can find the saved model in {board['winner_path']}")
+    active = current_version()
+    if active is not None:
+        print(f"Predictors serve registry version {active}; publish these models with "
+              f"`python -m src.model_registry register --activate`.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-validate every model and pick the one to serve.")
+    add_budget_arguments(parser)
+    parser.add_argument("--negative-rate", type=float, default=None,
+                        help="Fast mode: train on all hits and this fraction of the non-hits")
+    args = parser.parse_args()
     try:
-        run_evaluation()
+        run_evaluation(budget=budget_from_args(args), metric=args.metric, negative_rate=args.negative_rate)
     except Exception as e:
         print(f"Error during evaluation: {e}")
@@ -0,0 +1,235 @@
+import os
+import time
+import argparse
+import joblib
+import numpy as np
+import pandas as pd
+from src.schema import FEATURE_COLUMNS
+
+ENGINE_PATH = os.path.join("models", "random_forest_engine.npz")
+
+class CompiledForest:
+    """
+    A fitted RandomForestClassifier flattened into contiguous node arrays.
+
+    All trees are evaluated for a whole batch at once with NumPy gathers, and the
+    MinMaxScaler transform is applied inside the engine, so it takes raw features.
+    Probabilities are accumulated in the same order and precision as sklearn, so
+    results match RandomForestClassifier.predict_proba bit for bit.
+    """
+
+    # Tells predict_batch to pass unscaled features
+    takes_raw_features = True
+
+    def __init__(self, feature, threshold, left, right, leaf_proba, roots, classes,
+                 scale=None, offset=None, leaf_scale=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.classes_ = classes
+        self.scale = scale
+        self.offset = offset
+        # Set when leaf_proba holds quantized integers (see model_format.py)
+        self.leaf_scale = leaf_scale
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None):
+        """
+        Compile a fitted RandomForestClassifier (and optionally its MinMaxScaler).
+        """
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise ValueError("Only single-output forests can be compiled.")
+
+        n_classes = int(model.n_classes_)
+        features, thresholds, lefts, rights, probas, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes, dtype=np.int64)
+            is_leaf = tree.children_left == -1
+
+            # Leaves point at themselves so a traversal that reached them stays put
+            left = np.where(is_leaf, node_ids, tree.children_left) + offset
+            right = np.where(is_leaf, node_ids, tree.children_right) + offset
+
+            # Same normalization as DecisionTreeClassifier.predict_proba
+            proba = tree.value[:, 0, :n_classes].astype(np.float64)
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            proba /= normalizer
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(tree.threshold.astype(np.float64))
+            lefts.append(left.astype(np.int32))
+            rights.append(right.astype(np.int32))
+            probas.append(proba)
+            roots.append(offset)
+            offset += n_nodes
+
+        scale = getattr(scaler, "scale_", None) if scaler is not None else None
+        min_ = getattr(scaler, "min_", None) if scaler is not None else None
+        if scaler is not None and (scale is None or min_ is None):
+            raise ValueError("Only MinMaxScaler can be folded into the engine.")
+
+        return cls(
+            np.concatenate(features), np.concatenate(thresholds),
+            np.concatenate(lefts), np.concatenate(rights), np.concatenate(probas),
+            np.asarray(roots, dtype=np.int32), np.asarray(model.classes_),
+            None if scale is None else np.asarray(scale, dtype=np.float64),
+            None if min_ is None else np.asarray(min_, dtype=np.float64)
+        )
+
+    def _prepare(self, X):
+        """
+        Scale raw features (if a scaler was folded in) and cast to float32 like sklearn's trees.
+        """
+        X = np.asarray(X)
+        if self.scale is not None:
+            X = X * self.scale
+            X += self.offset
+        return np.ascontiguousarray(X, dtype=np.float32)
+
+    def apply(self, X):
+        """
+        Return the leaf node reached in every tree, shape (n_samples, n_estimators).
+        """
+        X = self._prepare(X)
+        n_samples = X.shape[0]
+        nodes = np.broadcast_to(self.roots, (n_samples, self.n_estimators)).ravel().copy()
+        rows = np.repeat(np.arange(n_samples), self.n_estimators)
+
+        # Only walk the (sample, tree) pairs that haven't reached a leaf yet
+        active = np.arange(nodes.size)
+        while active.size:
+            current = nodes[active]
+            values = X[rows[active], self.feature[current]]
+            next_nodes = np.where(values <= self.threshold[current], self.left[current], self.right[current])
+            nodes[active] = next_nodes
+            active = active[next_nodes != current]
+        return nodes.reshape(n_samples, self.n_estimators)
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[0], self.leaf_proba.shape[1]), dtype=np.float64)
+        # Accumulate tree by tree, in estimator order, exactly like sklearn
+        for t in range(self.n_estimators):
+            proba += self.leaf_proba[leaves[:, t]]
+        proba /= self.n_estimators
+        if self.leaf_scale is not None:
+            proba *= self.leaf_scale
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+    def save(self, path=ENGINE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        arrays = {
+            "feature": self.feature, "threshold": self.threshold, "left": self.left,
+            "right": self.right, "leaf_proba": self.leaf_proba, "roots": self.roots,
+            "classes": self.classes_
+        }
+        if self.scale is not None:
+            arrays["scale"] = self.scale
+            arrays["offset"] = self.offset
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path=ENGINE_PATH):
+        with np.load(path) as data:
+            return cls(
+                data["feature"], data["threshold"], data["left"], data["right"],
+                data["leaf_proba"], data["roots"], data["classes"],
+                data["scale"] if "scale" in data else None,
+                data["offset"] if "offset" in data else None
+            )
+
+def export_engine(model_path=os.path.join("models", "random_forest.pkl"),
+                  scaler_path=os.path.join("models", "scaler.pkl"), path=ENGINE_PATH):
+    """
+    Compile the saved Random Forest + scaler and write the engine arrays to disk.
+    """
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    engine = CompiledForest.from_sklearn(model, scaler)
+    engine.save(path)
+    print(f"Compiled {engine.n_estimators} trees ({engine.node_count} nodes) to {path}")
+    return engine, model, scaler
+
+def check_equivalence(engine, model, scaler, raw_features):
+    """
+    Compare the engine with sklearn on the same raw features.
+    Returns True if the probabilities are bit-for-bit identical.
+    """
+    from src.predict import scale_features
+    raw_features = np.asarray(raw_features, dtype=np.float32)
+    scaled = scale_features(raw_features, scaler)
+    expected = model.predict_proba(pd.DataFrame(scaled, columns=FEATURE_COLUMNS))
+    actual = engine.predict_proba(raw_features)
+    return np.array_equal(expected, actual)
+
+def _time_call(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def run_benchmark(engine, model, scaler, raw_features, batch_sizes=(1, 100, 10000)):
+    """
+    Time sklearn (scale + predict_proba) against the compiled engine for each batch size.
+    """
+    from src.predict import scale_features
+    results = []
+    for batch_size in batch_sizes:
+        idx = np.arange(batch_size) % len(raw_features)
+        batch = np.asarray(raw_features, dtype=np.float32)[idx]
+        repeats = 20 if batch_size <= 100 else 3
+
+        def sklearn_call():
+            scaled = scale_features(batch, scaler)
+            model.predict_proba(pd.DataFrame(scaled, columns=FEATURE_COLUMNS))
+
+        sklearn_time = _time_call(sklearn_call, repeats)
+        engine_time = _time_call(lambda: engine.predict_proba(batch), repeats)
+        results.append({
+            "batch_size": batch_size,
+            "sklearn_ms": sklearn_time * 1000,
+            "engine_ms": engine_time * 1000,
+            "speedup": sklearn_time / engine_time
+        })
+        print(f"  batch={batch_size:>6} | sklearn {sklearn_time * 1000:9.2f} ms | "
+              f"engine {engine_time * 1000:9.2f} ms | speedup {sklearn_time / engine_time:6.1f}x")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile the Random Forest into an array-based inference engine.")
+    parser.add_argument("--benchmark", action="store_true", help="Also check equivalence and time batch sizes 1, 100 and 10k")
+    args = parser.parse_args()
+    try:
+        engine, model, scaler = export_engine()
+        if args.benchmark:
+            from src.data_loader import load_data
+            df = load_data(columns=FEATURE_COLUMNS)
+            raw = df[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+            sample = raw[np.random.default_rng(42).choice(len(raw), size=min(len(raw), 10000), replace=False)]
+
+            identical = check_equivalence(engine, model, scaler, sample)
+            print(f"Bit-for-bit identical to sklearn: {identical}")
+            print("Benchmark:")
+            run_benchmark(engine, model, scaler, sample)
+    except Exception as e:
+        print(f"Error: {e}")
@@ -0,0 +1,209 @@
+import re
+import zlib
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Weakest match search() still returns, on its 0-1 score (difflib's default cutoff, which
+# the old fallback used). Sharing one word with a longer query scores well below it.
+MIN_SCORE = 0.6
+
+def tokenize(text):
+    """
+    Split normalized text into word tokens.
+    """
+    return TOKEN_PATTERN.findall(text)
+
+def edit_distance(a, b, max_distance):
+    """
+    Optimal string alignment distance (Levenshtein + adjacent transpositions).
+    Returns max_distance + 1 as soon as the distance is known to exceed max_distance.
+    """
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                value = min(value, previous_previous[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+def _deletes(term, max_distance):
+    """
+    All strings reachable from term by deleting up to max_distance characters (term included).
+    """
+    results = {term}
+    frontier = {term}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for word in frontier:
+            if len(word) <= 1:
+                continue
+            for i in range(len(word)):
+                next_frontier.add(word[:i] + word[i + 1:])
+        next_frontier -= results
+        results |= next_frontier
+        frontier = next_frontier
+    return results
+
+def _hash(text):
+    return zlib.crc32(text.encode("utf-8"))
+
+def allowed_distance(token, max_distance):
+    """
+    Short tokens get a smaller typo budget, otherwise "a" would match every two-letter word.
+    """
+    if len(token) <= 2:
+        return 0
+    if len(token) <= 5:
+        return min(1, max_distance)
+    return max_distance
+
+class FuzzyMatcher:
+    """
+    SymSpell-style typo-tolerant matcher over name and artist tokens.
+
+    Every vocabulary token's prefix is expanded into its deletion neighbourhood once;
+    a query token is matched by expanding its own deletions and looking them up, so a
+    lookup touches only a handful of candidate tokens instead of the whole catalog.
+    Rows are identified by their popularity rank in the SearchIndex.
+    """
+
+    def __init__(self, max_distance=2, prefix_length=7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.vocab = []
+        self.token_offsets = np.zeros(1, dtype=np.int64)
+        self.token_rows = np.empty(0, dtype=np.int32)
+        self.delete_hashes = np.empty(0, dtype=np.uint32)
+        self.delete_tokens = np.empty(0, dtype=np.int32)
+        self.name_lengths = np.empty(0, dtype=np.int16)
+        self.n_rows = 0
+
+    def fit(self, names, artists):
+        """
+        Build the vocabulary, the token -> rows postings and the deletion dictionary.
+        names and artists are normalized strings ordered by popularity rank.
+        """
+        token_ids = {}
+        postings = []
+        name_lengths = []
+        for rank, (name, artist) in enumerate(zip(names, artists)):
+            name_tokens = tokenize(name)
+            name_lengths.append(len(name_tokens))
+            for token in set(name_tokens) | set(tokenize(artist)):
+                token_id = token_ids.get(token)
+                if token_id is None:
+                    token_id = token_ids[token] = len(postings)
+                    postings.append([])
+                postings[token_id].append(rank)
+
+        self.vocab = list(token_ids)
+        self.n_rows = len(names)
+        self.name_lengths = np.asarray(name_lengths, dtype=np.int16)
+        lengths = np.fromiter((len(rows) for rows in postings), dtype=np.int64, count=len(postings))
+        self.token_offsets = np.concatenate(([0], np.cumsum(lengths)))
+        self.token_rows = np.fromiter(
+            (rank for rows in postings for rank in rows), dtype=np.int32, count=int(lengths.sum())
+        )
+
+        hashes = []
+        owners = []
+        for token_id, token in enumerate(self.vocab):
+            key = token[:self.prefix_length]
+            for deleted in _deletes(key, allowed_distance(token, self.max_distance)):
+                hashes.append(_hash(deleted))
+                owners.append(token_id)
+        hashes = np.asarray(hashes, dtype=np.uint32)
+        owners = np.asarray(owners, dtype=np.int32)
+        order = np.argsort(hashes, kind='stable')
+        self.delete_hashes = hashes[order]
+        self.delete_tokens = owners[order]
+        return self
+
+    def rows_for_token(self, token_id):
+        return self.token_rows[self.token_offsets[token_id]:self.token_offsets[token_id + 1]]
+
+    def lookup_token(self, term):
+        """
+        Return [(token_id, distance)] for vocabulary tokens within the typo budget of term.
+        """
+        max_distance = allowed_distance(term, self.max_distance)
+        key = term[:self.prefix_length]
+        candidates = set()
+        for deleted in _deletes(key, max_distance):
+            h = _hash(deleted)
+            start = np.searchsorted(self.delete_hashes, h, side='left')
+            end = np.searchsorted(self.delete_hashes, h, side='right')
+            candidates.update(self.delete_tokens[start:end].tolist())
+
+        matches = []
+        for token_id in candidates:
+            distance = edit_distance(term, self.vocab[token_id], max_distance)
+            if distance <= max_distance:
+                matches.append((token_id, distance))
+        return matches
+
+    def search(self, query, k=5, min_score=MIN_SCORE):
+        """
+        Return up to k (rank, score) pairs, best first. score is in (0, 1]; 1 means every
+        query token matched exactly and the name has no extra words. Ties are broken by
+        popularity rank. Matches scoring below min_score are dropped.
+        """
+        terms = tokenize(query)
+        if not terms or self.n_rows == 0:
+            return []
+
+        all_rows = []
+        all_scores = []
+        for term in terms:
+            rows = []
+            scores = []
+            for token_id, distance in self.lookup_token(term):
+                token_rows = self.rows_for_token(token_id)
+                similarity = 1.0 - distance / max(len(term), len(self.vocab[token_id]))
+                rows.append(token_rows)
+                scores.append(np.full(len(token_rows), similarity))
+            if not rows:
+                continue
+            rows = np.concatenate(rows)
+            scores = np.concatenate(scores)
+            # Keep the best similarity per row for this term
+            order = np.lexsort((-scores, rows))
+            rows, scores = rows[order], scores[order]
+            first = np.ones(len(rows), dtype=bool)
+            first[1:] = rows[1:] != rows[:-1]
+            all_rows.append(rows[first])
+            all_scores.append(scores[first])
+
+        if not all_rows:
+            return []
+
+        rows = np.concatenate(all_rows)
+        scores = np.concatenate(all_scores)
+        unique_rows, inverse = np.unique(rows, return_inverse=True)
+        totals = np.bincount(inverse, weights=scores) / len(terms)
+        # Prefer names that don't carry many words beyond the query
+        coverage = len(terms) / np.maximum(self.name_lengths[unique_rows], len(terms))
+        totals = 0.8 * totals + 0.2 * coverage
+
+        keep = totals >= min_score
+        unique_rows, totals = unique_rows[keep], totals[keep]
+
+        # Best score first, then most popular (lowest rank)
+        best = np.lexsort((unique_rows, -totals))[:k]
+        return [(int(unique_rows[i]), round(float(totals[i]), 4)) for i in best]
@@ -0,0 +1,241 @@
+"""
+Hedged song lookup for the live predictor: the Spotify API and the local index race.
+
+Both branches start together. The preferred source's answer is used if it arrives within
+the latency budget; otherwise the other branch answers and the loser is cancelled (or,
+once it is already running, abandoned and its result logged). A circuit breaker stops
+calling an API that keeps failing or missing the budget until a cool-down has passed.
+Both branches run on one executor shared by every lookup in the process.
+"""
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from src.query_metrics import context_bound
+
+logger = logging.getLogger(__name__)
+
+# Seconds the API gets before the local answer is used instead
+DEFAULT_BUDGET = 0.8
+
+# Threads of the shared executor; abandoned API calls hold one until their own timeout
+SHARED_WORKERS = 8
+
+_shared_executor = None
+_shared_lock = threading.Lock()
+
+def shared_executor():
+    """
+    The process-wide executor both lookup branches run on, created on first use.
+    """
+    global _shared_executor
+    with _shared_lock:
+        if _shared_executor is None:
+            _shared_executor = ThreadPoolExecutor(max_workers=SHARED_WORKERS, thread_name_prefix="lookup")
+        return _shared_executor
+
+class CircuitBreaker:
+    """
+    closed: calls go through. After failure_threshold consecutive failures it opens and
+    refuses calls for cooldown seconds, then lets a single probe through (half-open):
+    a success closes it again, a failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=3, cooldown=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if self._probing or self.clock() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        """
+        Returns True if this failure opened the breaker.
+        """
+        with self._lock:
+            self.failures += 1
+            was_open = self.opened_at is not None
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+                self._probing = False
+                return not was_open
+            return False
+
+class _Outcome:
+    """
+    Reports one API call to the breaker exactly once: at the deadline if it was too slow,
+    otherwise when it finishes.
+    """
+
+    def __init__(self, breaker):
+        self.breaker = breaker
+        self.opened = False
+        self._reported = False
+        self._lock = threading.Lock()
+
+    def report(self, ok):
+        with self._lock:
+            if self._reported:
+                return
+            self._reported = True
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.opened = self.breaker.record_failure()
+
+class HedgedLookup:
+    """
+    lookup(query) -> (found, source), where found is (features, track_name, artist_name)
+    and source is "api" or "local".
+
+    api_fn(query) returns found or None; local_fn(query, log) returns found or raises
+    ValueError when nothing matches. Messages the local search prints go through log and
+    are only shown when the local answer is the one used.
+    """
+
+    def __init__(self, api_fn, local_fn, budget=DEFAULT_BUDGET, prefer="api", breaker=None, executor=None):
+        if prefer not in ("api", "local"):
+            raise ValueError(f"prefer must be 'api' or 'local', not {prefer!r}")
+        self.api_fn = api_fn
+        self.local_fn = local_fn
+        self.budget = budget
+        self.prefer = prefer
+        self.breaker = breaker or CircuitBreaker()
+        self._executor = executor or shared_executor()
+
+    def _start_api(self, query):
+        if self.api_fn is None or not self.breaker.allow():
+            return None, None
+        outcome = _Outcome(self.breaker)
+        # Both branches run with the caller's query record, so their stages are timed
+        future = self._executor.submit(context_bound(self.api_fn), query)
+        future.add_done_callback(lambda f: outcome.report(not f.cancelled() and f.exception() is None))
+        return future, outcome
+
+    def _start_local(self, query, cancelled, messages):
+        def run():
+            # The losing branch may be cancelled while it waits (e.g. on the catalog warm-up)
+            if cancelled.is_set():
+                return None
+            return self.local_fn(query, messages.append)
+        return self._executor.submit(context_bound(run))
+
+    @staticmethod
+    def _log_loser(future, source, query):
+        """
+        Log what the branch whose answer was not used ends up returning.
+        """
+        def report(f):
+            if f.cancelled():
+                logger.debug("%s lookup for %r cancelled", source, query)
+            elif isinstance(f.exception(), ValueError):
+                logger.info("%s lookup for %r lost the race with no match: %s", source, query, f.exception())
+            elif f.exception() is not None:
+                logger.warning("%s lookup for %r lost the race and failed: %r", source, query, f.exception())
+            else:
+                found = f.result()
+                logger.info("%s lookup for %r lost the race and returned %s", source, query,
+                            f"{found[1]} - {found[2]}" if found else None)
+        future.add_done_callback(report)
+
+    @staticmethod
+    def _api_result(future, timeout):
+        """
+        (finished, found): found is None if the call failed or had no match.
+        """
+        try:
+            return True, future.result(timeout=timeout)
+        except FutureTimeout:
+            return False, None
+        except Exception as e:
+            logger.warning("API lookup failed: %r", e)
+            return True, None
+
+    def _local_answer(self, local, messages):
+        found = local.result()
+        for message in messages:
+            print(message)
+        return found, "local"
+
+    def lookup(self, query):
+        cancelled = threading.Event()
+        messages = []
+        api, outcome = self._start_api(query)
+        local = self._start_local(query, cancelled, messages)
+        if api is None:
+            return self._local_answer(local, messages)
+
+        if self.prefer == "local":
+            try:
+                answer = self._local_answer(local, messages)
+            except ValueError:
+                # Nothing local; the API may still know the song
+                finished, found = self._api_result(api, None)
+                if found:
+                    return found, "api"
+                raise
+            api.cancel()
+            self._log_loser(api, "API", query)
+            return answer
+
+        finished, found = self._api_result(api, self.budget)
+        if found:
+            cancelled.set()
+            local.cancel()
+            self._log_loser(local, "Local", query)
+            return found, "api"
+        if not finished:
+            outcome.report(False)
+            api.cancel()
+            self._log_loser(api, "API", query)
+            print(f"  (API slower than {self.budget:.1f}s. Answering from the offline database...)")
+        else:
+            # The done-callback may not have run yet; report() only counts the call once
+            outcome.report(api.exception() is None)
+            if api.exception() is not None:
+                print("  (API unavailable. Switching to offline database...)")
+        if outcome.opened:
+            print(f"  (API keeps failing. Skipping it for {self.breaker.cooldown:g}s...)")
+        try:
+            return self._local_answer(local, messages)
+        except ValueError:
+            if finished:
+                raise
+            # No local match either: give the slow API the rest of its own timeout
+            finished, found = self._api_result(api, None)
+            if found:
+                return found, "api"
+            raise
+
+    def close(self):
+        """
+        Shut down the executor, unless it is the shared one other lookups still use.
+        """
+        if self._executor is not _shared_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
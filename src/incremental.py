@@ -0,0 +1,299 @@
+"""
+Incremental model updates for new tracks, instead of full retrains.
+
+The raw training rows live in an append-only store (data/training_set/). An update
+appends the new rows there and moves each model forward from the latest version:
+
+- Random Forest: warm_start with extra trees, fit on the new rows plus a replay sample
+  of older rows so the new trees do not only see this week's releases.
+- XGBoost: more boosting rounds continued from the existing booster, on the same rows.
+- Logistic Regression: continued with SGD (log loss, a partial_fit model) from the
+  current coefficients; the first update converts the LogisticRegression.
+- KNN: the KD-tree is rebuilt over the whole store (building it is fast next to training).
+
+The scaler is pinned: every version keeps the scaler its models were trained with, and
+new rows are scaled with it even when they fall outside its range (the drift is reported).
+Each update is written as a new version of the model registry (models/versions/, see
+model_registry.py), so earlier versions stay valid. Apart from KNN, update time follows
+the size of the delta.
+"""
+import os
+import json
+import time
+import argparse
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.utils.class_weight import compute_class_weight
+from src.schema import FEATURE_COLUMNS, TRAINING_COLUMNS, HIT_THRESHOLD
+from src.model_registry import (VERSIONS_DIR, SCALER_FILE, MODEL_FILES, list_versions, read_version,
+                                write_version, load_version, activate, current_version, served_model,
+                                default_served)
+
+TRAINING_SET_DIR = os.path.join("data", "training_set")
+
+class TrainingStore:
+    """
+    Append-only raw training rows: float32 features (X.f32) and int8 labels (y.i8).
+    meta.json holds the committed row count; bytes past it (an interrupted append) are ignored
+    and overwritten by the next append.
+    """
+
+    def __init__(self, path=TRAINING_SET_DIR):
+        self.path = path
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    @property
+    def rows(self):
+        try:
+            with open(self._file("meta.json")) as f:
+                return json.load(f)["rows"]
+        except OSError:
+            return 0
+
+    def exists(self):
+        return os.path.exists(self._file("meta.json"))
+
+    def _commit(self, rows):
+        tmp_path = self._file("meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"rows": rows, "columns": FEATURE_COLUMNS}, f)
+        os.replace(tmp_path, self._file("meta.json"))
+
+    def append(self, X, y):
+        """
+        Append rows; costs O(len(X)), whatever the size of the store.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        y = np.ascontiguousarray(y, dtype=np.int8)
+        os.makedirs(self.path, exist_ok=True)
+        rows = self.rows
+        for name, array, width in (("X.f32", X, 4 * len(FEATURE_COLUMNS)), ("y.i8", y, 1)):
+            with open(self._file(name), "ab") as f:
+                f.truncate(rows * width)
+                f.write(array.tobytes())
+        self._commit(rows + len(X))
+
+    def arrays(self):
+        """
+        (X, y) as read-only memory maps of the committed rows.
+        """
+        rows = self.rows
+        X = np.memmap(self._file("X.f32"), dtype=np.float32, mode="r", shape=(rows, len(FEATURE_COLUMNS)))
+        y = np.memmap(self._file("y.i8"), dtype=np.int8, mode="r", shape=(rows,))
+        return X, y
+
+def training_rows(df):
+    """
+    Raw feature matrix and hit labels from a catalog DataFrame (same target as preprocess_data).
+    """
+    X = df[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+    y = (df['popularity'] > HIT_THRESHOLD).to_numpy(dtype=np.int8)
+    return X, y
+
+def initialize(filepath=None, models_dir="models", versions_dir=VERSIONS_DIR, store=None):
+    """
+    Start incremental updates from the current state: copy the full training rows into the
+    store and snapshot the models saved by evaluate.py (with their scaler) as the first version.
+    """
+    from src.data_loader import load_data
+    store = store or TrainingStore()
+    if store.exists() or list_versions(versions_dir):
+        raise ValueError(f"{store.path} or {versions_dir} already exists; remove them to start over.")
+    df = load_data(filepath, verbose=False, columns=TRAINING_COLUMNS)
+    store.append(*training_rows(df))
+
+    models = {}
+    for name, file in MODEL_FILES.items():
+        model_path = os.path.join(models_dir, file)
+        if os.path.exists(model_path):
+            models[name] = joblib.load(model_path)
+    if not models:
+        raise FileNotFoundError(f"No models found in {models_dir}. Run evaluate.py first.")
+    scaler = joblib.load(os.path.join(models_dir, SCALER_FILE))
+    return write_version(models, scaler, {"parent": None, "rows_total": store.rows, "rows_added": store.rows,
+                                          "segments": [[0, store.rows]], "serve": default_served(models)})
+
+def scaler_drift(scaler, X_new):
+    """
+    Per feature: share of new rows outside the pinned scaler's fitted [min, max] range.
+    """
+    outside = (X_new < scaler.data_min_) | (X_new > scaler.data_max_)
+    return {column: round(float(share), 4) for column, share in zip(FEATURE_COLUMNS, outside.mean(axis=0)) if share > 0}
+
+def pinned_class_weight(y):
+    """
+    class_weight='balanced' computed on the whole store, so fits on a delta keep the global balance.
+    """
+    classes = np.unique(y)
+    return dict(zip(classes.tolist(), compute_class_weight("balanced", classes=classes, y=y)))
+
+def _scaled(X, scaler):
+    from src.predict import scale_features
+    return pd.DataFrame(scale_features(np.asarray(X, dtype=np.float32), scaler), columns=FEATURE_COLUMNS)
+
+def grow_forest(model, X, y, trees, class_weight):
+    model.set_params(warm_start=True, n_estimators=model.n_estimators + trees)
+    if model.get_params().get("class_weight") == "balanced":
+        model.set_params(class_weight=class_weight)
+    return model.fit(X, y)
+
+def continue_boosting(model, X, y, rounds):
+    booster = model.get_booster()
+    update = clone(model).set_params(n_estimators=rounds)
+    update.fit(X, y, xgb_model=booster)
+    # fit() counts only the rounds it added; report the whole ensemble
+    return update.set_params(n_estimators=booster.num_boosted_rounds() + rounds)
+
+def continue_linear(model, X, y, class_weight, n_train, eta0=0.01):
+    """
+    One SGD pass over the delta from the current coefficients. A LogisticRegression is
+    first turned into the equivalent log-loss SGDClassifier (same coefficients, and
+    alpha = 1 / (C * n_train) so the penalty matches C over the n_train training rows,
+    not over the size of this update).
+    """
+    from sklearn.linear_model import LogisticRegression, SGDClassifier
+    if isinstance(model, LogisticRegression):
+        sgd = SGDClassifier(loss="log_loss", alpha=1.0 / (model.C * n_train), learning_rate="constant",
+                            eta0=eta0, class_weight=class_weight, random_state=42)
+        sgd.coef_ = model.coef_.copy()
+        sgd.intercept_ = model.intercept_.copy()
+        sgd.classes_ = model.classes_
+        model = sgd
+    # SGD works in float64, like the coefficients it starts from
+    return model.partial_fit(np.asarray(X, dtype=np.float64), y, classes=model.classes_)
+
+def update_model(name, model, X_fit, y_fit, store_scaled, store_y, options):
+    """
+    Move one model forward on X_fit / y_fit (new rows plus replay sample, already scaled).
+    """
+    from src.downsampling import DownsampledClassifier
+    if isinstance(model, DownsampledClassifier):
+        # Keep the wrapper's sampling rate so its recalibration stays valid
+        rows = model.sample(y_fit)
+        model.estimator_ = update_model(name, model.estimator_, X_fit.iloc[rows], y_fit[rows],
+                                        store_scaled, store_y, options)
+        return model
+
+    class_weight = options["class_weight"]
+    if name == "Random Forest":
+        return grow_forest(model, X_fit, y_fit, options["trees"], class_weight)
+    if name == "XGBoost":
+        return continue_boosting(model, X_fit, y_fit, options["rounds"])
+    if name == "Logistic Regression":
+        return continue_linear(model, X_fit, y_fit, class_weight, len(store_y))
+    if name == "KNN":
+        return model.fit(store_scaled(), store_y)
+    raise ValueError(f"Don't know how to update {name} incrementally.")
+
+def version_segments(manifest):
+    """
+    The [start, stop) store row ranges a version was trained on. They are a prefix of the
+    store unless an update was built on a rolled-back version; older manifests hold the prefix.
+    """
+    return manifest.get("segments") or [[0, manifest["rows_total"]]]
+
+def base_version(versions_dir=VERSIONS_DIR):
+    """
+    The version an update builds on: the active one (CURRENT), or the latest incremental
+    version when none is active.
+    """
+    parent = current_version(versions_dir)
+    if parent is None:
+        # Versions registered from models/ (see model_registry.py) have no training rows to build on
+        versions = [version for version in list_versions(versions_dir)
+                    if "rows_total" in read_version(version, versions_dir)]
+        if not versions:
+            raise FileNotFoundError("No base version. Run `python -m src.incremental --init` first.")
+        return versions[-1]
+    if "rows_total" not in read_version(parent, versions_dir):
+        raise ValueError(f"The active version {parent} was registered from models/ and has no training rows; "
+                         f"activate an incremental version or run `python -m src.incremental --init` again.")
+    return parent
+
+def apply_update(new_df, trees=10, rounds=20, replay=1.0, versions_dir=VERSIONS_DIR, store=None, seed=42):
+    """
+    Append new_df's tracks to the training store and write a new version on top of the
+    active one (see base_version). replay is the number of older rows sampled per new row
+    for the forest and booster fits.
+    """
+    store = store or TrainingStore()
+    if not store.exists():
+        raise FileNotFoundError("No training store. Run `python -m src.incremental --init` first.")
+    parent = base_version(versions_dir)
+    models, scaler, parent_manifest = load_version(parent, versions_dir)
+    segments = version_segments(parent_manifest)
+    if segments[-1][1] > store.rows:
+        raise ValueError(f"{store.path} has {store.rows} rows but {parent} was trained on rows up to "
+                         f"{segments[-1][1]}; the store and the versions are out of sync.")
+
+    start = time.perf_counter()
+    X_new, y_new = training_rows(new_df)
+    X_store, y_store = store.arrays()
+    # Store rows of the parent's training set (rows of rolled-back updates are skipped)
+    parent_rows = np.concatenate([np.arange(first, stop) for first, stop in segments])
+    y_old = np.asarray(y_store[parent_rows])
+    y_all = np.concatenate([y_old, y_new]).astype(np.int64)
+
+    rng = np.random.default_rng(seed)
+    replay_rows = np.sort(rng.choice(len(y_old), size=min(len(y_old), int(round(replay * len(X_new)))), replace=False))
+    X_fit = _scaled(np.concatenate([X_store[parent_rows[replay_rows]], X_new]), scaler)
+    y_fit = np.concatenate([y_old[replay_rows], y_new]).astype(np.int64)
+    options = {"trees": trees, "rounds": rounds, "class_weight": pinned_class_weight(y_all)}
+    # Only KNN needs every row
+    store_scaled = lambda: _scaled(np.concatenate([X_store[parent_rows], X_new]), scaler)
+
+    timings = {}
+    for name in list(models):
+        model_start = time.perf_counter()
+        models[name] = update_model(name, models[name], X_fit, y_fit, store_scaled, y_all, options)
+        timings[name] = round(time.perf_counter() - model_start, 3)
+
+    # The new rows go at the end of the store, which is not always right after the parent's
+    if segments[-1][1] == store.rows:
+        segments = segments[:-1] + [[segments[-1][0], store.rows + len(X_new)]]
+    else:
+        segments = segments + [[store.rows, store.rows + len(X_new)]]
+    manifest = {
+        "parent": parent, "serve": served_model(parent_manifest), "segments": segments,
+        "rows_total": len(y_all), "rows_added": len(X_new), "rows_replayed": len(replay_rows),
+        "trees_added": trees, "rounds_added": rounds, "scaler_drift": scaler_drift(scaler, X_new),
+        "update_s": round(time.perf_counter() - start, 3), "model_update_s": timings
+    }
+    version, path = write_version(models, scaler, manifest, versions_dir)
+    # Rows are committed to the store only once the version that used them exists
+    store.append(X_new, y_new)
+    return version, path, manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the models with new tracks instead of retraining.")
+    parser.add_argument("new_tracks", nargs="?", help="CSV of new tracks (same columns as the dataset)")
+    parser.add_argument("--init", action="store_true", help="Snapshot the training rows and current models as the first version")
+    parser.add_argument("--trees", type=int, default=10, help="Trees added to the Random Forest")
+    parser.add_argument("--rounds", type=int, default=20, help="Boosting rounds added to XGBoost")
+    parser.add_argument("--replay", type=float, default=1.0, help="Older rows replayed per new row")
+    parser.add_argument("--promote", action="store_true", help="Also activate the new version (see model_registry.py)")
+    args = parser.parse_args()
+    try:
+        if args.init:
+            version, path = initialize()
+            print(f"Base version {version} saved to {path} ({TrainingStore().rows} training rows)")
+        if args.new_tracks:
+            new_df = pd.read_csv(args.new_tracks, usecols=TRAINING_COLUMNS)
+            version, path, manifest = apply_update(new_df, args.trees, args.rounds, args.replay)
+            print(f"Version {version} (from {manifest['parent']}): +{manifest['rows_added']} rows "
+                  f"({manifest['rows_total']} total) in {manifest['update_s']:.2f}s")
+            for name, seconds in manifest["model_update_s"].items():
+                print(f"  {name:<20} {seconds:.2f}s")
+            if manifest["scaler_drift"]:
+                print(f"  New rows outside the pinned scaler's range: {manifest['scaler_drift']}")
+            if args.promote:
+                activate(version)
+                print(f"Activated {version}")
+        elif not args.init:
+            parser.print_help()
+    except Exception as e:
+        print(f"Error during incremental update: {e}")
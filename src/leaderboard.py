@@ -0,0 +1,199 @@
+"""
+Cost-aware model leaderboard.
+
+Next to the cross-validation scores, every saved model is measured for what it costs to
+serve: fit time on the full data, single-row and batched prediction latency (p50/p99,
+through predict_batch like the live predictor), pickled size, and the resident memory
+it takes once loaded (measured in a fresh process). The results go to
+models/leaderboard.json together with the winner: the most accurate model that fits the
+latency / memory / size budget. load_prediction_artifacts() serves that model.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from src.schema import FEATURE_COLUMNS
+
+LEADERBOARD_PATH = os.path.join("models", "leaderboard.json")
+DEFAULT_MODEL_PATH = os.path.join("models", "random_forest.pkl")
+
+# Rows per call when timing batched prediction
+BATCH_SIZE = 1000
+
+def model_file(name):
+    return os.path.join("models", f"{name.replace(' ', '_').lower()}.pkl")
+
+def _percentiles_ms(samples):
+    samples = np.asarray(samples) * 1000
+    return round(float(np.percentile(samples, 50)), 4), round(float(np.percentile(samples, 99)), 4)
+
+def measure_latency(model, scaler, raw, single_calls=300, batch_calls=20, batch_size=BATCH_SIZE, seed=42):
+    """
+    Time predict_batch on one-row dicts (the live predictor's call) and on DataFrame batches.
+    raw is a DataFrame of unscaled FEATURE_COLUMNS.
+    """
+    from src.predict import predict_batch
+    rng = np.random.default_rng(seed)
+    records = raw[FEATURE_COLUMNS].iloc[rng.integers(0, len(raw), size=single_calls)].to_dict("records")
+    predict_batch(records[:1], model, scaler)
+
+    single = []
+    for record in records:
+        start = time.perf_counter()
+        predict_batch([record], model, scaler)
+        single.append(time.perf_counter() - start)
+
+    batched = []
+    batch_size = min(batch_size, len(raw))
+    for _ in range(batch_calls):
+        offset = int(rng.integers(0, len(raw) - batch_size + 1))
+        batch = raw[FEATURE_COLUMNS].iloc[offset:offset + batch_size]
+        start = time.perf_counter()
+        predict_batch(batch, model, scaler)
+        batched.append(time.perf_counter() - start)
+
+    single_p50, single_p99 = _percentiles_ms(single)
+    batch_p50, batch_p99 = _percentiles_ms(batched)
+    return {
+        "single_p50_ms": single_p50, "single_p99_ms": single_p99,
+        "batch_size": batch_size, "batch_p50_ms": batch_p50, "batch_p99_ms": batch_p99,
+        "batch_rows_per_s": round(batch_size / float(np.median(batched)))
+    }
+
+def _rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+def _load_footprint(path):
+    """
+    Runs in a fresh process: resident memory added by loading one pickled model.
+    """
+    import joblib
+    # Import the model libraries first so only the model itself is counted
+    import sklearn.ensemble, sklearn.linear_model, xgboost  # noqa: F401
+    import src.neighbor_index  # noqa: F401
+    before = _rss_mb()
+    model = joblib.load(path)
+    return round(_rss_mb() - before, 2) if model is not None else None
+
+def measure_memory(path):
+    """
+    Resident memory (MB) of the loaded model, or None where /proc is not available.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    if not os.path.exists("/proc/self/statm"):
+        return None
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(_load_footprint, path).result()
+
+def build_entries(evaluation, raw, scaler):
+    """
+    One leaderboard entry per evaluated model: CV means plus the serving costs.
+    evaluation is run_scheduled_evaluation()'s result; the models must already be saved.
+    """
+    entries = []
+    for name, outcome in evaluation.items():
+        path = model_file(name)
+        print(f"  Measuring serving cost of {name}...")
+        entry = {"name": name, "path": path}
+        for metric, values in outcome["scores"].items():
+            entry[metric] = round(float(np.mean(values)), 6)
+        entry["fit_s"] = outcome.get("fit_s")
+        entry.update(measure_latency(outcome["model"], scaler, raw))
+        entry["size_mb"] = round(os.path.getsize(path) / 2 ** 20, 3)
+        entry["memory_mb"] = measure_memory(path)
+        entries.append(entry)
+    return entries
+
+def within_budget(entry, budget):
+    limits = {"max_latency_ms": "single_p99_ms", "max_memory_mb": "memory_mb", "max_size_mb": "size_mb"}
+    for key, field in limits.items():
+        limit = budget.get(key)
+        if limit is not None and entry.get(field) is not None and entry[field] > limit:
+            return False
+    return True
+
+def select_winner(entries, budget=None, metric="accuracy"):
+    """
+    Best model by metric among those within budget. If none fits, the best model overall
+    is returned with within_budget False.
+    """
+    budget = budget or {}
+    fitting = [entry for entry in entries if within_budget(entry, budget)]
+    pool = fitting or entries
+    winner = max(pool, key=lambda entry: entry[metric])
+    return winner, bool(fitting)
+
+def save_leaderboard(entries, budget=None, metric="accuracy", path=LEADERBOARD_PATH):
+    winner, fits = select_winner(entries, budget, metric)
+    board = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "metric": metric, "budget": budget or {},
+        "winner": winner["name"], "winner_path": winner["path"], "within_budget": fits,
+        "models": sorted(entries, key=lambda entry: -entry[metric])
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(board, f, indent=2)
+    os.replace(tmp_path, path)
+    return board
+
+def load_leaderboard(path=LEADERBOARD_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def selected_model_path(path=LEADERBOARD_PATH):
+    """
+    The model the leaderboard picked, or random_forest.pkl when there is no leaderboard
+    (or its winner file is gone).
+    """
+    board = load_leaderboard(path)
+    if board and os.path.exists(board.get("winner_path", "")):
+        return board["winner_path"]
+    return DEFAULT_MODEL_PATH
+
+def print_leaderboard(board):
+    print(f"\n{'Model':<22} {'Acc':>7} {'F1':>7} {'Fit s':>8} {'1-row p50/p99 ms':>18} "
+          f"{'Batch p50/p99 ms':>18} {'Size MB':>8} {'RSS MB':>8}")
+    for entry in board["models"]:
+        fit = f"{entry['fit_s']:.2f}" if entry.get("fit_s") is not None else "-"
+        memory = f"{entry['memory_mb']:.1f}" if entry.get("memory_mb") is not None else "-"
+        marker = "*" if entry["name"] == board["winner"] else " "
+        print(f"{marker}{entry['name']:<21} {entry['accuracy']:>7.4f} {entry['f1']:>7.4f} {fit:>8} "
+              f"{entry['single_p50_ms']:>8.3f}/{entry['single_p99_ms']:<9.3f} "
+              f"{entry['batch_p50_ms']:>8.2f}/{entry['batch_p99_ms']:<9.2f} {entry['size_mb']:>8.2f} {memory:>8}")
+    budget = ", ".join(f"{key}={value}" for key, value in board["budget"].items() if value is not None)
+    print(f"Selected: {board['winner']} (best {board['metric']}"
+          f"{' within ' + budget if budget else ''}"
+          f"{'' if board['within_budget'] else '; nothing fits the budget'})")
+
+def add_budget_arguments(parser):
+    parser.add_argument("--max-latency-ms", type=float, default=None, help="Budget on single-row p99 latency")
+    parser.add_argument("--max-memory-mb", type=float, default=None, help="Budget on the loaded model's memory")
+    parser.add_argument("--max-size-mb", type=float, default=None, help="Budget on the pickled model size")
+    parser.add_argument("--metric", default="accuracy", help="CV metric the winner is chosen by")
+
+def budget_from_args(args):
+    return {"max_latency_ms": args.max_latency_ms, "max_memory_mb": args.max_memory_mb,
+            "max_size_mb": args.max_size_mb}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the leaderboard or re-pick its winner under a new budget.")
+    add_budget_arguments(parser)
+    args = parser.parse_args()
+    try:
+        board = load_leaderboard()
+        if board is None:
+            print(f"No leaderboard at {LEADERBOARD_PATH}. Run evaluate.py first.")
+            sys.exit(1)
+        if any(value is not None for value in budget_from_args(args).values()) or args.metric != board["metric"]:
+            board = save_leaderboard(board["models"], budget_from_args(args), args.metric)
+        print_leaderboard(board)
+    except Exception as e:
+        print(f"Error: {e}")
@@ -1,12 +1,17 @@
 import os
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
+import sys
+import contextlib
+import threading
 from dotenv import load_dotenv
-from src.predict import load_prediction_artifacts, predict_song
-from src.data_loader import load_data
-import pandas as pd
+from src.schema import FEATURE_COLUMNS
 import logging
 
+# pandas, sklearn, spotipy and the search index are imported inside the functions that use
+# them (or by the warm-up threads in startup.py) so the prompt appears without waiting on them
+
+# Only the columns needed for search, score lookup and prediction are loaded from the local database
+CATALOG_COLUMNS = ['id', 'name', 'artists', 'popularity'] + FEATURE_COLUMNS
+
 # Silence Spotipy and request logging
 logging.getLogger('spotipy').setLevel(logging.CRITICAL)
 logging.getLogger('urllib3').setLevel(logging.CRITICAL)
@@ -16,134 +21,262 @@ load_dotenv()
 
 def get_spotify_client():
     """
-    Initialize Spotify client.
+    Initialize the pooled, cached Spotify access layer.
     """
     client_id = os.getenv("SPOTIPY_CLIENT_ID")
     client_secret = os.getenv("SPOTIPY_CLIENT_SECRET")
     
     if not client_id or not client_secret:
         return None
-        
-    auth_manager = SpotifyClientCredentials(client_id=client_id, client_secret=client_secret)
-    return spotipy.Spotify(auth_manager=auth_manager)
+    
+    from src.spotify_client import create_spotify_access
+    return create_spotify_access(client_id=client_id, client_secret=client_secret)
 
-import sys
-import contextlib
+# API calls can overlap (see hedged_lookup.py), so stderr is swapped once for all of them
+_stderr_lock = threading.Lock()
+_stderr_state = {"depth": 0, "saved": None}
 
 @contextlib.contextmanager
 def suppress_stderr():
     """
     Context manager to suppress stderr to silence Spotipy's noisy printer.
     """
-    with open(os.devnull, "w") as devnull:
-        old_stderr = sys.stderr
-        sys.stderr = devnull
-        try:
-            yield
-        finally:
-            sys.stderr = old_stderr
+    with _stderr_lock:
+        if _stderr_state["depth"] == 0:
+            _stderr_state["saved"] = sys.stderr
+            sys.stderr = open(os.devnull, "w")
+        _stderr_state["depth"] += 1
+    try:
+        yield
+    finally:
+        with _stderr_lock:
+            _stderr_state["depth"] -= 1
+            if _stderr_state["depth"] == 0:
+                sys.stderr.close()
+                sys.stderr = _stderr_state["saved"]
 
-import difflib
+def catalog_row(df, position):
+    """
+    (features dict, name, artist display string) for one row of the catalog.
+    Works on a DataFrame or on a SlimCatalog, whose artists are already parsed.
+    """
+    if hasattr(df, "row"):
+        features = df.row(position)
+        return features, features['name'], features['artists']
+    from src.search_index import clean_artists
+    features = df.iloc[position].to_dict()
+    return features, features['name'], clean_artists(features['artists'])
 
-def search_local_data(df, query):
+def search_local_data(df, query, index=None, log=print):
     """
     Search for a song in the local dataframe using smart matching and fuzzy logic.
+    Lookups go through the prebuilt search index instead of scanning the table.
+    df may also be a SlimCatalog (see catalog.py) when an index is given.
+    Progress notes ("Did you mean ...") are passed to log.
     """
+    from src.search_index import get_search_index
+    from src.query_metrics import stage, tag
+    if index is None:
+        index = get_search_index(df)
+
     query_str = str(query).lower().strip()
     
     # 1. Exact Substring Match (Fastest)
-    matches = df[df['name'].str.lower().str.contains(query_str, na=False, regex=False)]
+    with stage("local_exact"):
+        rank = index.find_substring(query_str)
+    tier = "exact"
     
     # 2. Token Match
-    if matches.empty:
+    if rank is None:
         tokens = query_str.split()
         if len(tokens) > 1:
-            mask = df.apply(lambda row: all(token in str(row['name']).lower() or token in str(row['artists']).lower() for token in tokens), axis=1)
-            matches = df[mask]
-
-    # 3. Fuzzy Search (Slowest but handles typos)
-    # We only search the top 50,000 most popular songs to keep it fast
-    if matches.empty:
-        print("  (Performing fuzzy search for typos...)")
-        # Get top 50k popular songs
-        top_songs = df.sort_values(by='popularity', ascending=False).head(50000)
-        # Create a dictionary map for fast lookup
-        # We search primarily on NAME
-        song_names = top_songs['name'].tolist()
-        
-        # Find closest match
-        close_matches = difflib.get_close_matches(query_str, song_names, n=1, cutoff=0.6)
+            with stage("local_tokens"):
+                rank = index.find_tokens(tokens)
+            tier = "tokens"
+
+    # 3. Fuzzy Search (handles typos in song or artist names)
+    if rank is None:
+        log("  (Performing fuzzy search for typos...)")
+        with stage("local_fuzzy"):
+            candidates = index.find_fuzzy(query_str, k=5)
+        tier = "fuzzy"
         
-        if close_matches:
-            best_guess_name = close_matches[0]
-            print(f"  Did you mean: '{best_guess_name}'?")
-            matches = df[df['name'] == best_guess_name]
+        if candidates:
+            rank = candidates[0][0]
+            _, guess_name, guess_artists = catalog_row(df, index.row_position(rank))
+            log(f"  Did you mean: '{guess_name}' by {guess_artists}?")
+            if len(candidates) > 1:
+                others = [catalog_row(df, index.row_position(r))[1] for r, _ in candidates[1:]]
+                log(f"  Other matches: {', '.join(repr(str(name)) for name in others)}")
 
-    if matches.empty:
+    if rank is None:
         raise ValueError(f"Could not find any song matching '{query}'.")
+    # Only the tier of the answer that is used counts (see HedgedLookup)
+    tag(local_tier=tier)
     
-    # Sort by popularity to get the most likely match (the "hit" version)
-    best_match = matches.sort_values(by='popularity', ascending=False).iloc[0]
-    
-    # Convert row to dict
-    features = best_match.to_dict()
-    
-    # Clean up artist name
-    artist_name = str(features['artists']).replace("['", "").replace("']", "").replace("'", "")
-    
-    return features, features['name'], artist_name
+    # Ranks are ordered by popularity, so this is already the most likely match (the "hit" version)
+    return catalog_row(df, index.row_position(rank))
 
-def get_track_features(sp, df, query):
+def search_spotify(sp, query):
+    """
+    Look the song up through the Spotify API; None when it is unavailable or not found.
+    """
+    if not sp:
+        return None
+    try:
+        # Suppress the noisy HTTP 403 print from spotipy
+        with suppress_stderr():
+            return sp.get_track_features(query)
+    except Exception:
+        print("  (API unavailable. Switching to offline database...)")
+        return None
+
+def get_track_features(sp, df, query, index=None):
     """
     Search for a song and retrieve its audio features.
     Tries API first, falls back to local data.
     """
     # 1. Try Spotify API
-    if sp:
-        try:
-            # Suppress the noisy HTTP 403 print from spotipy
-            with suppress_stderr():
-                results = sp.search(q=query, limit=1, type='track')
-                
-                if results['tracks']['items']:
-                    track = results['tracks']['items'][0]
-                    track_id = track['id']
-                    track_name = track['name']
-                    artist_name = track['artists'][0]['name']
-                    release_date = track['album']['release_date']
-                    year = int(release_date.split('-')[0])
-                    
-                    # Try getting features
-                    features = sp.audio_features(track_id)[0]
-                    if features:
-                        features['year'] = year
-                        return features, track_name, artist_name
-        except Exception:
-             print("  (API unavailable. Switching to offline database...)")
+    result = search_spotify(sp, query)
+    if result:
+        return result
     
     # 2. Fallback to Local Data
-    return search_local_data(df, query)
+    return search_local_data(df, query, index)
+
+def create_lookup(warmup, budget=None):
+    """
+    A HedgedLookup that races the Spotify API against the local index (see hedged_lookup.py).
+    The budget (seconds the API gets before the local answer wins) defaults to
+    $TOPTRACK_API_BUDGET or 0.8s.
+    """
+    from src.hedged_lookup import HedgedLookup, DEFAULT_BUDGET
+    if budget is None:
+        budget = float(os.getenv("TOPTRACK_API_BUDGET", DEFAULT_BUDGET))
+
+    sp = warmup.get("spotify")
+    def api(query):
+        with suppress_stderr():
+            return sp.get_track_features(query)
+
+    def local(query, log):
+        from src.query_metrics import stage
+        with stage("warmup_wait"):
+            df, index = warmup.get("catalog")
+        return search_local_data(df, query, index, log=log)
+
+    return HedgedLookup(api if sp else None, local, budget=budget)
+
+# Prefix of the "songs most similar to X" command in the prompt
+SIMILAR_COMMAND = ":similar"
+
+# Prints the per-stage latency table (":stats prom" for the Prometheus text format)
+STATS_COMMAND = ":stats"
+
+# Goes back to the model version served before the last swap (see model_registry.py)
+ROLLBACK_COMMAND = ":rollback"
+
+def served_scores(warmup):
+    """
+    The catalog score table, unless the model has been swapped for one it was not scored with.
+    """
+    scores = warmup.get("scores")
+    if scores is None or not warmup.ready("model"):
+        # Validated against the same registry state the model is loading from
+        return scores
+    return scores if scores.matches(warmup.get("model").active.model_path) else None
+
+def find_similar(df, index, neighbors, scaler, query, k=10):
+    """
+    The k catalog songs whose scaled audio features are closest to the best match for query.
+    Returns (track_name, artist_name, [(name, artists, distance), ...]).
+    """
+    from src.predict import build_feature_matrix, scale_features
+    if neighbors.rows != len(df):
+        raise ValueError("Neighbor index is out of date with the local data. Run data_engineering.py.")
+    
+    features, track_name, artist_name = search_local_data(df, query, index)
+    scaled = scale_features(build_feature_matrix([features]), scaler)
+    # One extra neighbour: the song itself is usually its own nearest match
+    positions, distances = neighbors.similar(scaled[0], k + 1)
+    
+    similar = []
+    for position, distance in zip(positions, distances):
+        _, name, artists = catalog_row(df, int(position))
+        if name == track_name and artists == artist_name:
+            continue
+        similar.append((name, artists, float(distance)))
+    return track_name, artist_name, similar[:k]
 
 def main():
     try:
-        model, scaler = load_prediction_artifacts()
+        from src.startup import start_warmup
+        from src.query_metrics import create_metrics, stage, tag
         
-        # Load local data silently
+        # Model, local data and API client load in the background while the prompt is up
         print("Initializing System...")
-        df = load_data(verbose=False)
-        sp = get_spotify_client()
+        warmup = start_warmup()
+        lookup = None
+        metrics = create_metrics()
         
         print("\n🎵 Spotify Hit Predictor Ready! 🎵")
         
         while True:
-            query = input("\nEnter song name (or 'q' to quit): ")
+            query = input(f"\nEnter song name ('{SIMILAR_COMMAND} <song>' for similar songs, 'q' to quit): ")
             if query.lower() == 'q':
                 break
+            
+            if query.lower().startswith(STATS_COMMAND):
+                if query[len(STATS_COMMAND):].strip().lower() == "prom":
+                    print(metrics.prometheus(), end="")
+                else:
+                    print(metrics.format_table())
+                continue
+            
+            if query.lower() == ROLLBACK_COMMAND:
+                try:
+                    version = warmup.get("model").rollback()
+                    print(f"Now serving model version {version or 'from models/'}")
+                except Exception as e:
+                    print(f"❌ {e}")
+                continue
+            
+            if query.lower().startswith(SIMILAR_COMMAND):
+                try:
+                    df, index = warmup.get("catalog")
+                    _, scaler = warmup.get("model").get()
+                    track_name, artist_name, similar = find_similar(
+                        df, index, warmup.get("neighbors"), scaler, query[len(SIMILAR_COMMAND):].strip()
+                    )
+                    print("-" * 40)
+                    print(f"🎧 Songs most similar to {track_name} - {artist_name}:")
+                    for rank, (name, artists, distance) in enumerate(similar, 1):
+                        print(f"  {rank:>2}. {name} - {artists} (distance {distance:.3f})")
+                    print("-" * 40)
+                except Exception as e:
+                    print(f"❌ {e}")
+                continue
                 
+            record, token = metrics.begin_query(query)
             try:
-                features, track_name, artist_name = get_track_features(sp, df, query)
+                if lookup is None:
+                    lookup = create_lookup(warmup)
+                result = None
+                found, source = lookup.lookup(query)
+                tag(source=source, tier="api" if source == "api" else record.local_tier)
+                if source == "local":
+                    # Local songs were all scored at evaluation time
+                    scores = served_scores(warmup)
+                    if scores is not None:
+                        with stage("score_lookup"):
+                            result = scores.lookup(found[0].get('id'))
+                features, track_name, artist_name = found
                 
-                result = predict_song(features, model, scaler)
+                if result is None:
+                    from src.predict import predict_song
+                    with stage("warmup_wait"):
+                        model, scaler = warmup.get("model").get()
+                    result = predict_song(features, model, scaler)
                 
                 print("-" * 40)
                 print(f"🎤 {track_name} - {artist_name}")
@@ -156,8 +289,10 @@ def main():
                 print("-" * 40)
                     
             except Exception as e:
-                # print(f"❌ {e}")
+                tag(error=type(e).__name__)
                 print(f"❌ {e}")
+            finally:
+                metrics.end_query(record, token)
 
     except Exception as e:
         print(f"Critical Error: {e}")
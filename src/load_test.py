@@ -0,0 +1,117 @@
+"""
+Load-test client for the prediction server (src/server.py).
+
+Opens many keep-alive connections at once and sends /predict (or /search) requests as
+fast as each connection gets its answers, then reports throughput, latency percentiles,
+status codes, and the server's average micro-batch size over the run. Standard library
+only, so it runs against a local server with no other services.
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+from src.schema import FEATURE_COLUMNS
+from src.query_metrics import nearest_rank
+
+SEARCH_QUERIES = ["blinding lights", "shape of you", "bohemian rhapsody", "dance monkey",
+                  "someone like you", "smells like teen spirit", "bad guy", "hey jude"]
+
+def random_features(rng):
+    """
+    One plausible set of audio features.
+    """
+    features = {column: rng.random() for column in FEATURE_COLUMNS}
+    features.update(key=rng.randrange(12), mode=rng.randrange(2), loudness=-30 * rng.random(),
+                    tempo=60 + 140 * rng.random(), duration_ms=rng.randrange(120000, 300000),
+                    year=rng.randrange(1950, 2021))
+    return features
+
+async def _request(reader, writer, method, path, payload=None):
+    """
+    Send one HTTP/1.1 keep-alive request; returns (status, decoded JSON body).
+    """
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                 f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        if key.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length) or b"null")
+
+async def _health(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        return (await _request(reader, writer, "GET", "/health"))[1]
+    finally:
+        writer.close()
+
+async def _client(host, port, n_requests, route, rng, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(n_requests):
+            if route == "search":
+                query = rng.choice(SEARCH_QUERIES).replace(" ", "+")
+                method, path, payload = "GET", f"/search?q={query}", None
+            else:
+                method, path, payload = "POST", "/predict", {"features": random_features(rng)}
+            start = time.perf_counter()
+            status, _ = await _request(reader, writer, method, path, payload)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+async def run_load_test(host="127.0.0.1", port=8000, concurrency=200, requests=5000, route="predict", seed=42):
+    """
+    Spread requests over concurrency connections and report what the server sustained.
+    """
+    rng = random.Random(seed)
+    before = await _health(host, port)
+    latencies, statuses = [], {}
+    per_client = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _client(host, port, n, route, random.Random(rng.random()), latencies, statuses)
+        for n in per_client if n
+    ))
+    elapsed = time.perf_counter() - start
+    after = await _health(host, port)
+
+    latencies.sort()
+    pct = lambda q: nearest_rank(latencies, q) * 1000
+    batches = after["batches"] - before["batches"]
+    items = after["items"] - before["items"]
+    results = {
+        "requests": len(latencies), "elapsed_s": elapsed, "requests_per_s": len(latencies) / elapsed,
+        "p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99), "max_ms": latencies[-1] * 1000,
+        "statuses": statuses, "avg_batch": items / batches if batches else None
+    }
+    print(f"{results['requests']} {route} requests over {concurrency} connections in {elapsed:.2f}s "
+          f"({results['requests_per_s']:.0f} req/s)")
+    print(f"Latency ms: p50 {results['p50_ms']:.2f} | p95 {results['p95_ms']:.2f} | "
+          f"p99 {results['p99_ms']:.2f} | max {results['max_ms']:.2f}")
+    print("Status codes: " + ", ".join(f"{code}={n}" for code, n in sorted(statuses.items())))
+    if batches:
+        print(f"Server batches: {batches} ({results['avg_batch']:.1f} items on average)")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test a running prediction server (python -m src.server).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--concurrency", type=int, default=200, help="Simultaneous keep-alive connections")
+    parser.add_argument("--requests", type=int, default=5000, help="Total requests across all connections")
+    parser.add_argument("--route", choices=["predict", "search"], default="predict")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_load_test(args.host, args.port, args.concurrency, args.requests, args.route))
+    except Exception as e:
+        print(f"Error: {e}")
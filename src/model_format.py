@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import numpy as np
+from src.forest_engine import CompiledForest
+from src.schema import FEATURE_COLUMNS
+
+FORMAT_VERSION = 1
+ARTIFACT_PATH = os.path.join("models", "random_forest.model")
+MODEL_PATH = os.path.join("models", "random_forest.pkl")
+SCALER_PATH = os.path.join("models", "scaler.pkl")
+
+# Every array starts on a cache-line boundary inside arrays.bin
+ALIGNMENT = 64
+
+# Leaf probabilities stored as uint16 are fractions of this value
+LEAF_QUANT_SCALE = 65535
+
+class AffineScaler:
+    """
+    The MinMaxScaler transform (X * scale_ + min_) without sklearn, read from an artifact.
+    scale_features() applies it through the same fast path as the real scaler.
+    """
+    clip = False
+
+    def __init__(self, scale, min_):
+        self.scale_ = scale
+        self.min_ = min_
+
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float64) * self.scale_ + self.min_
+
+def write_artifact(path, arrays, meta):
+    """
+    Write named arrays as raw, aligned buffers in <path>/arrays.bin, described by <path>/manifest.json.
+    The directory is built next to the target and swapped in, so readers never see half an artifact.
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    entries = {}
+    offset = 0
+    with open(os.path.join(tmp_path, "arrays.bin"), "wb") as f:
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            padding = -offset % ALIGNMENT
+            f.write(b"\0" * padding)
+            offset += padding
+            entries[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            f.write(array.tobytes())
+            offset += array.nbytes
+
+    manifest = {"version": FORMAT_VERSION, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "meta": meta, "arrays": entries}
+    with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    old_path = f"{path}.old-{os.getpid()}"
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+def read_manifest(path):
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact version {manifest.get('version')} in {path}")
+    return manifest
+
+def read_artifact(path, mmap=True):
+    """
+    Return (arrays, meta). With mmap=True the arrays are read-only views of one shared
+    file mapping, so loading costs no copies and processes share the page cache.
+    """
+    manifest = read_manifest(path)
+    bin_path = os.path.join(path, "arrays.bin")
+    if mmap:
+        buffer = np.memmap(bin_path, dtype=np.uint8, mode='r')
+    else:
+        buffer = np.fromfile(bin_path, dtype=np.uint8)
+    arrays = {}
+    for name, entry in manifest["arrays"].items():
+        dtype = np.dtype(entry["dtype"])
+        shape = tuple(entry["shape"])
+        count = int(np.prod(shape, dtype=np.int64))
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=entry["offset"]).reshape(shape)
+    return arrays, manifest["meta"]
+
+def round_down_float32(values):
+    """
+    Largest float32 <= each float64 value. For float32 inputs, x <= t and x <= round_down(t)
+    always agree, so thresholds stored this way give exactly the same splits.
+    """
+    rounded = values.astype(np.float32)
+    too_big = rounded.astype(np.float64) > values
+    rounded[too_big] = np.nextafter(rounded[too_big], np.float32(-np.inf))
+    return rounded
+
+def forest_arrays(engine, threshold_dtype="float64", leaf_dtype="float64"):
+    """
+    Node arrays of a CompiledForest in their on-disk dtypes.
+
+    threshold_dtype="float32" is lossless (see round_down_float32); leaf_dtype="float32" or
+    "uint16" (quantized to 1/65535) trades a little probability precision for size.
+    """
+    if threshold_dtype == "float32":
+        threshold = round_down_float32(engine.threshold)
+    elif threshold_dtype == "float64":
+        threshold = engine.threshold.astype(np.float64)
+    else:
+        raise ValueError(f"Unsupported threshold dtype: {threshold_dtype}")
+
+    if leaf_dtype == "uint16":
+        leaf_proba = np.round(engine.leaf_proba * LEAF_QUANT_SCALE).astype(np.uint16)
+    elif leaf_dtype in ("float32", "float64"):
+        leaf_proba = engine.leaf_proba.astype(leaf_dtype)
+    else:
+        raise ValueError(f"Unsupported leaf dtype: {leaf_dtype}")
+
+    # Feature ids fit in int16 for any realistic feature count
+    feature_dtype = np.int16 if engine.feature.max(initial=0) < 2 ** 15 else np.int32
+    arrays = {
+        "feature": engine.feature.astype(feature_dtype), "threshold": threshold,
+        "left": engine.left, "right": engine.right, "leaf_proba": leaf_proba,
+        "roots": engine.roots, "classes": engine.classes_
+    }
+    if engine.scale is not None:
+        arrays["scale"] = engine.scale
+        arrays["offset"] = engine.offset
+    return arrays
+
+def source_stamp(path):
+    """
+    Cheap change detector for a source file: its path, size and modification time.
+    """
+    stat = os.stat(path)
+    return {"path": path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def sources_unchanged(sources):
+    """
+    True if every stamped file still has the stamp it was recorded with.
+    """
+    for source in sources:
+        try:
+            if source_stamp(source["path"]) != source:
+                return False
+        except OSError:
+            return False
+    return True
+
+def save_forest(engine, path=ARTIFACT_PATH, threshold_dtype="float64", leaf_dtype="float64", sources=()):
+    """
+    Write a CompiledForest (with its folded-in scaler) as a memory-mappable artifact.
+    sources are the files it was converted from; is_fresh() checks them.
+    """
+    meta = {
+        "kind": "random_forest", "feature_columns": FEATURE_COLUMNS,
+        "n_estimators": engine.n_estimators, "node_count": engine.node_count,
+        "threshold_dtype": threshold_dtype, "leaf_dtype": leaf_dtype,
+        "leaf_scale": 1.0 / LEAF_QUANT_SCALE if leaf_dtype == "uint16" else None,
+        "sources": [source_stamp(source) for source in sources]
+    }
+    write_artifact(path, forest_arrays(engine, threshold_dtype, leaf_dtype), meta)
+
+def load_forest(path=ARTIFACT_PATH, mmap=True):
+    """
+    Load a forest artifact as a CompiledForest and an AffineScaler for its scaler parameters.
+    """
+    arrays, meta = read_artifact(path, mmap=mmap)
+    if meta.get("feature_columns") != FEATURE_COLUMNS:
+        raise ValueError(f"Model artifact {path} was built for different feature columns.")
+    engine = CompiledForest(
+        arrays["feature"], arrays["threshold"], arrays["left"], arrays["right"],
+        arrays["leaf_proba"], arrays["roots"], arrays["classes"],
+        arrays.get("scale"), arrays.get("offset"), leaf_scale=meta.get("leaf_scale")
+    )
+    scaler = AffineScaler(arrays["scale"], arrays["offset"]) if "scale" in arrays else None
+    return engine, scaler
+
+def is_fresh(path=ARTIFACT_PATH):
+    """
+    True if the artifact exists and the files it was converted from are unchanged.
+    """
+    try:
+        meta = read_manifest(path)["meta"]
+    except (OSError, ValueError):
+        return False
+    return sources_unchanged(meta.get("sources", []))
+
+def convert(model_path=MODEL_PATH, scaler_path=SCALER_PATH, path=ARTIFACT_PATH,
+            threshold_dtype="float64", leaf_dtype="float64"):
+    """
+    Convert the pickled Random Forest + scaler into the memory-mappable format.
+    Returns (engine, model, scaler) so the caller can check equivalence.
+    """
+    import joblib
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    engine = CompiledForest.from_sklearn(model, scaler)
+    save_forest(engine, path, threshold_dtype, leaf_dtype, sources=(model_path, scaler_path))
+    return engine, model, scaler
+
+def compare_with_sklearn(path, model, scaler, raw_features):
+    """
+    Score raw features with the artifact and with sklearn; report exactness and drift.
+    """
+    import pandas as pd
+    from src.predict import scale_features
+    raw_features = np.asarray(raw_features, dtype=np.float32)
+    expected = model.predict_proba(pd.DataFrame(scale_features(raw_features, scaler), columns=FEATURE_COLUMNS))
+    engine, _ = load_forest(path)
+    actual = engine.predict_proba(raw_features)
+    return {
+        "identical": bool(np.array_equal(expected, actual)),
+        "max_abs_diff": float(np.abs(expected - actual).max()),
+        "label_agreement": float(np.mean(expected.argmax(axis=1) == actual.argmax(axis=1)))
+    }
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the pickled Random Forest to the memory-mapped artifact format.")
+    parser.add_argument("--output", default=ARTIFACT_PATH)
+    parser.add_argument("--threshold-dtype", choices=["float64", "float32"], default="float32",
+                        help="float32 is lossless (thresholds are rounded down)")
+    parser.add_argument("--leaf-dtype", choices=["float64", "float32", "uint16"], default="float64",
+                        help="float32/uint16 shrink the leaf values at a small precision cost")
+    parser.add_argument("--check", action="store_true", help="Compare with sklearn on a sample of the local data")
+    args = parser.parse_args()
+    try:
+        engine, model, scaler = convert(path=args.output, threshold_dtype=args.threshold_dtype,
+                                        leaf_dtype=args.leaf_dtype)
+        print(f"Converted {engine.n_estimators} trees ({engine.node_count} nodes) to {args.output}")
+        print(f"Size: {os.path.getsize(MODEL_PATH) / 2 ** 20:.1f} MB pickled -> "
+              f"{directory_size(args.output) / 2 ** 20:.1f} MB mapped")
+
+        start = time.perf_counter()
+        load_forest(args.output)
+        print(f"Load time (mmap): {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        if args.check:
+            from src.data_loader import load_data
+            df = load_data(verbose=False, columns=FEATURE_COLUMNS)
+            raw = df[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+            sample = raw[np.random.default_rng(42).choice(len(raw), size=min(len(raw), 10000), replace=False)]
+            report = compare_with_sklearn(args.output, model, scaler, sample)
+            print(f"Bit-for-bit identical to sklearn: {report['identical']}")
+            print(f"Max probability difference: {report['max_abs_diff']:.2e} | "
+                  f"Label agreement: {report['label_agreement']:.4%}")
+    except Exception as e:
+        print(f"Error: {e}")
@@ -0,0 +1,376 @@
+"""
+Versioned model registry with hot-swap for long-running predictors.
+
+Every version is a directory under models/versions/ (vNNNN) holding its models, the
+scaler they were trained with and a manifest. Versions are written to a temp dir and
+renamed, and are never changed afterwards. models/versions/CURRENT names the version
+to serve; it is replaced atomically, and every activation is appended to HISTORY so the
+previous one can be restored.
+
+ModelHandle is what a long-running predictor holds instead of a (model, scaler) pair.
+A watcher thread polls CURRENT; a new version is loaded and warmed in that thread while
+requests keep using the old one, then swapped in with a single assignment. The replaced
+version stays in memory, so rollback() is instant.
+
+Without a CURRENT pointer, predictors serve models/ as before (see load_prediction_artifacts).
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import threading
+from collections import namedtuple
+import joblib
+from src.leaderboard import selected_model_path, load_leaderboard
+
+VERSIONS_DIR = os.path.join("models", "versions")
+SCALER_FILE = "scaler.pkl"
+CURRENT_FILE = "CURRENT"
+HISTORY_FILE = "HISTORY"
+
+# Model files carried from version to version (the names evaluate.py saves under)
+MODEL_FILES = {
+    "Logistic Regression": "logistic_regression.pkl",
+    "Random Forest": "random_forest.pkl",
+    "XGBoost": "xgboost.pkl",
+    "KNN": "knn.pkl"
+}
+
+# Seconds between two looks at CURRENT by a watching ModelHandle
+WATCH_INTERVAL = float(os.getenv("TOPTRACK_REGISTRY_INTERVAL", 2))
+
+def list_versions(versions_dir=VERSIONS_DIR):
+    if not os.path.isdir(versions_dir):
+        return []
+    return sorted(name for name in os.listdir(versions_dir)
+                  if os.path.exists(os.path.join(versions_dir, name, "manifest.json")))
+
+def read_version(version, versions_dir=VERSIONS_DIR):
+    with open(os.path.join(versions_dir, version, "manifest.json")) as f:
+        return json.load(f)
+
+def next_version(versions_dir=VERSIONS_DIR):
+    versions = list_versions(versions_dir)
+    return f"v{int(versions[-1][1:]) + 1 if versions else 1:04d}"
+
+def _save_version(write_files, manifest, versions_dir):
+    """
+    Build the next version in a temp dir (write_files(tmp_path) returns {name: file}) and
+    rename it into place, so a version directory is either complete or absent.
+    """
+    version = next_version(versions_dir)
+    path = os.path.join(versions_dir, version)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    os.makedirs(tmp_path)
+    files = write_files(tmp_path)
+    manifest = dict(manifest, version=version, created=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    scaler=SCALER_FILE, models=files)
+    with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+    return version, path
+
+def write_version(models, scaler, manifest, versions_dir=VERSIONS_DIR):
+    """
+    Save models + pinned scaler + manifest as the next version.
+    """
+    def write_files(tmp_path):
+        for name, model in models.items():
+            joblib.dump(model, os.path.join(tmp_path, MODEL_FILES[name]))
+        joblib.dump(scaler, os.path.join(tmp_path, SCALER_FILE))
+        return {name: MODEL_FILES[name] for name in models}
+    return _save_version(write_files, manifest, versions_dir)
+
+def default_served(models):
+    """
+    The model a new version serves unless told otherwise: the current leaderboard winner
+    if the version has it, else the Random Forest, else any model.
+    """
+    board = load_leaderboard()
+    if board and board.get("winner") in models:
+        return board["winner"]
+    return "Random Forest" if "Random Forest" in models else next(iter(models))
+
+def register(models_dir="models", serve=None, versions_dir=VERSIONS_DIR):
+    """
+    Snapshot the models and scaler saved by evaluate.py as a new version.
+    serve names the model predictors use (default: the leaderboard winner now).
+    """
+    found = {name: file for name, file in MODEL_FILES.items() if os.path.exists(os.path.join(models_dir, file))}
+    if not found:
+        raise FileNotFoundError(f"No models found in {models_dir}. Run evaluate.py first.")
+    if serve is not None and serve not in found:
+        raise ValueError(f"{serve} is not among the saved models ({', '.join(found)}).")
+
+    def write_files(tmp_path):
+        for file in list(found.values()) + [SCALER_FILE]:
+            shutil.copyfile(os.path.join(models_dir, file), os.path.join(tmp_path, file))
+        return found
+    manifest = {"parent": current_version(versions_dir), "source": models_dir,
+                "serve": serve if serve is not None else default_served(found)}
+    return _save_version(write_files, manifest, versions_dir)
+
+def load_version(version, versions_dir=VERSIONS_DIR):
+    path = os.path.join(versions_dir, version)
+    manifest = read_version(version, versions_dir)
+    models = {name: joblib.load(os.path.join(path, file)) for name, file in manifest["models"].items()}
+    return models, joblib.load(os.path.join(path, manifest["scaler"])), manifest
+
+def served_model(manifest):
+    """
+    The model of a version that predictors serve, as fixed in its manifest when it was
+    written (so re-running evaluate.py does not change what an old version serves).
+    Manifests from before "serve" was recorded serve their Random Forest.
+    """
+    models = manifest["models"]
+    if manifest.get("serve") in models:
+        return manifest["serve"]
+    return "Random Forest" if "Random Forest" in models else next(iter(models))
+
+def version_paths(version, versions_dir=VERSIONS_DIR):
+    """
+    (model path, scaler path) predictors load for a version.
+    """
+    manifest = read_version(version, versions_dir)
+    path = os.path.join(versions_dir, version)
+    return (os.path.join(path, manifest["models"][served_model(manifest)]),
+            os.path.join(path, manifest["scaler"]))
+
+def current_version(versions_dir=VERSIONS_DIR):
+    """
+    The version CURRENT points at, or None when there is no pointer (or its version is gone).
+    """
+    try:
+        with open(os.path.join(versions_dir, CURRENT_FILE)) as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    if not version or not os.path.exists(os.path.join(versions_dir, version, "manifest.json")):
+        return None
+    return version
+
+def served_paths(versions_dir=VERSIONS_DIR):
+    """
+    (model path, scaler path) a predictor loads right now: the current version's, or
+    the leaderboard's pick in models/ when the registry is not in use.
+    """
+    version = current_version(versions_dir)
+    if version is not None:
+        return version_paths(version, versions_dir)
+    return selected_model_path(), os.path.join("models", SCALER_FILE)
+
+def activate(version, versions_dir=VERSIONS_DIR):
+    """
+    Point CURRENT at version; watching predictors pick it up within WATCH_INTERVAL.
+    """
+    if version not in list_versions(versions_dir):
+        raise ValueError(f"No version {version} in {versions_dir}.")
+    tmp_path = os.path.join(versions_dir, f"{CURRENT_FILE}.tmp-{os.getpid()}")
+    with open(tmp_path, "w") as f:
+        f.write(version + "\n")
+    os.replace(tmp_path, os.path.join(versions_dir, CURRENT_FILE))
+    with open(os.path.join(versions_dir, HISTORY_FILE), "a") as f:
+        f.write(f"{time.strftime('%Y-%m-%dT%H:%M:%S')} {version}\n")
+
+def previous_version(versions_dir=VERSIONS_DIR):
+    """
+    The last activated version before the current one, or None.
+    """
+    try:
+        with open(os.path.join(versions_dir, HISTORY_FILE)) as f:
+            history = [line.split()[-1] for line in f if line.strip()]
+    except OSError:
+        return None
+    current = current_version(versions_dir)
+    for version in reversed(history):
+        if version != current and version in list_versions(versions_dir):
+            return version
+    return None
+
+def rollback(versions_dir=VERSIONS_DIR):
+    """
+    Point CURRENT back at the previous activation; returns that version.
+    """
+    version = previous_version(versions_dir)
+    if version is None:
+        raise ValueError("No earlier activation to roll back to.")
+    activate(version, versions_dir)
+    return version
+
+LoadedVersion = namedtuple("LoadedVersion", ["version", "model", "scaler", "model_path"])
+
+def load_served(version, versions_dir=VERSIONS_DIR, mapped=False):
+    """
+    A version's served model and scaler as a LoadedVersion; version None loads what
+    load_prediction_artifacts serves without a registry (mapped is passed on to it).
+    """
+    if version is None:
+        from src.predict import load_prediction_artifacts
+        model_path = selected_model_path()
+        model, scaler = load_prediction_artifacts(verbose=False, mapped=mapped)
+        return LoadedVersion(None, model, scaler, model_path)
+    model_path, scaler_path = version_paths(version, versions_dir)
+    return LoadedVersion(version, joblib.load(model_path), joblib.load(scaler_path), model_path)
+
+def _warm(loaded):
+    """
+    One prediction before the swap, so the first request on the new version pays no first-call costs.
+    """
+    from src.predict import predict_batch
+    predict_batch([{}], loaded.model, loaded.scaler)
+
+class ModelHandle:
+    """
+    The model and scaler a long-running predictor serves, swappable while it serves.
+
+    get() returns both from one attribute read, so a request never pairs a model with
+    another version's scaler; callers should call it once per request (or batch).
+    """
+
+    def __init__(self, loaded, versions_dir=VERSIONS_DIR, mapped=False):
+        self.versions_dir = versions_dir
+        self.mapped = mapped
+        self._active = loaded
+        self._previous = None
+        self._swap_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get(self):
+        active = self._active
+        return active.model, active.scaler
+
+    @property
+    def active(self):
+        return self._active
+
+    @property
+    def version(self):
+        return self._active.version
+
+    @property
+    def previous(self):
+        return self._previous
+
+    def swap(self, loaded):
+        with self._swap_lock:
+            self._previous, self._active = self._active, loaded
+
+    def rollback(self):
+        """
+        Swap the previous version back in from memory and point CURRENT at it, so the
+        watcher (and other predictors) keep it. Returns the version now served.
+        """
+        with self._swap_lock:
+            if self._previous is None:
+                raise ValueError("No earlier version loaded to roll back to.")
+            self._previous, self._active = self._active, self._previous
+            restored = self._active.version
+            # CURRENT moves under the lock too, or refresh() could read the old pointer and swap back
+            if restored is not None:
+                activate(restored, self.versions_dir)
+            elif os.path.exists(os.path.join(self.versions_dir, CURRENT_FILE)):
+                # The previous model came from models/: serve that again everywhere
+                os.remove(os.path.join(self.versions_dir, CURRENT_FILE))
+        return restored
+
+    def refresh(self):
+        """
+        Swap to the version CURRENT points at if it changed; returns the new version or
+        False when nothing changed. Loading and warming happen outside the lock, before
+        the swap; if a rollback or another swap happened meanwhile, the load is dropped.
+        """
+        with self._swap_lock:
+            target = current_version(self.versions_dir)
+            if target == self._active.version:
+                return False
+            if self._previous is not None and self._previous.version == target:
+                self._previous, self._active = self._active, self._previous
+                return target
+            active = self._active
+        loaded = load_served(target, self.versions_dir, self.mapped)
+        _warm(loaded)
+        with self._swap_lock:
+            if self._active is not active or current_version(self.versions_dir) != target:
+                return False
+            self._previous, self._active = self._active, loaded
+        return target
+
+    def _watch(self, interval, log):
+        failed = None
+        while not self._stop.wait(interval):
+            try:
+                version = self.refresh()
+            except Exception as e:
+                # Reported once per version; it is retried but stays quiet
+                target = current_version(self.versions_dir)
+                if target != failed:
+                    log(f"  (Could not load model version {target}: {e})")
+                failed = target
+                continue
+            if version is not False:
+                log(f"  (Now serving model version {version or 'from models/'})")
+
+    def watch(self, interval=WATCH_INTERVAL, log=print):
+        """
+        Start polling CURRENT in a daemon thread.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, args=(interval, log),
+                                            name="model-watch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+def load_handle(watch=True, interval=WATCH_INTERVAL, versions_dir=VERSIONS_DIR, log=print, mapped=False):
+    """
+    A ModelHandle on what is served now, watching the registry for new versions.
+    mapped=True lets it use the memory-mapped forest (single-row serving only).
+    """
+    loaded = load_served(current_version(versions_dir), versions_dir, mapped)
+    handle = ModelHandle(loaded, versions_dir, mapped)
+    return handle.watch(interval, log) if watch else handle
+
+def print_versions(versions_dir=VERSIONS_DIR):
+    current = current_version(versions_dir)
+    versions = list_versions(versions_dir)
+    if not versions:
+        print(f"No versions in {versions_dir}.")
+        return
+    for version in versions:
+        manifest = read_version(version, versions_dir)
+        marker = "*" if version == current else " "
+        rows = f"{manifest['rows_total']} rows" if "rows_total" in manifest else manifest.get("source", "")
+        print(f"{marker}{version}  {manifest['created']}  serves {served_model(manifest):<20} "
+              f"parent {manifest.get('parent') or '-':<6} {rows}")
+    if current is None:
+        print("No version is active; predictors serve models/.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List, register, activate or roll back model versions.")
+    parser.add_argument("command", nargs="?", default="list", choices=["list", "register", "activate", "rollback"])
+    parser.add_argument("version", nargs="?", help="Version to activate (vNNNN)")
+    parser.add_argument("--serve", default=None, help="Model a registered version serves (default: leaderboard winner)")
+    parser.add_argument("--activate", action="store_true", help="Activate the version right after registering it")
+    args = parser.parse_args()
+    try:
+        if args.command == "register":
+            version, path = register(serve=args.serve)
+            print(f"Registered models/ as {version} ({path})")
+            if args.activate:
+                activate(version)
+                print(f"Activated {version}")
+        elif args.command == "activate":
+            if not args.version:
+                parser.error("activate needs a version")
+            activate(args.version)
+            print(f"Activated {args.version}")
+        elif args.command == "rollback":
+            print(f"Rolled back to {rollback()}")
+        else:
+            print_versions()
+    except Exception as e:
+        print(f"Error: {e}")
@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import argparse
+import joblib
+import numpy as np
+from scipy.spatial import cKDTree
+from sklearn.base import BaseEstimator, ClassifierMixin
+
+NEIGHBOR_INDEX_PATH = os.path.join("models", "neighbor_index.pkl")
+
+# Leaf size picked with `python -m src.neighbor_index --tune` on the 13 scaled audio features
+DEFAULT_LEAFSIZE = 16
+
+# Indexes already loaded in this process, keyed by their file path
+_loaded_indexes = {}
+
+class KDTreeKNNClassifier(ClassifierMixin, BaseEstimator):
+    """
+    k-nearest-neighbours classifier on a scipy cKDTree.
+
+    Voting matches KNeighborsClassifier (uniform or distance weights, Minkowski p), but
+    queries run on all cores and eps > 0 switches to approximate search: every returned
+    neighbour is within (1 + eps) times the true k-th distance. eps is the recall knob.
+    """
+
+    def __init__(self, n_neighbors=5, weights="uniform", p=2, leafsize=DEFAULT_LEAFSIZE, eps=0.0, n_jobs=-1):
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.p = p
+        self.leafsize = leafsize
+        self.eps = eps
+        self.n_jobs = n_jobs
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        self.classes_, self._y = np.unique(np.asarray(y), return_inverse=True)
+        self.n_features_in_ = X.shape[1]
+        self.tree_ = cKDTree(X, leafsize=self.leafsize)
+        return self
+
+    def kneighbors(self, X, n_neighbors=None):
+        """
+        Distances and training-row indices of the nearest neighbours, shape (n_samples, k).
+        """
+        k = n_neighbors or self.n_neighbors
+        distances, indices = self.tree_.query(
+            np.asarray(X, dtype=np.float64), k=k, eps=self.eps, p=self.p, workers=self.n_jobs
+        )
+        if k == 1:
+            distances, indices = distances[:, np.newaxis], indices[:, np.newaxis]
+        return distances, indices
+
+    def predict_proba(self, X):
+        distances, indices = self.kneighbors(X)
+        labels = self._y[indices]
+        if self.weights == "distance":
+            # Same rule as sklearn: exact matches (distance 0) take all the weight
+            with np.errstate(divide="ignore"):
+                weights = 1.0 / distances
+            exact = np.isinf(weights)
+            has_exact = exact.any(axis=1)
+            weights[has_exact] = exact[has_exact]
+        else:
+            weights = np.ones_like(distances)
+
+        proba = np.zeros((len(labels), len(self.classes_)), dtype=np.float64)
+        for c in range(len(self.classes_)):
+            proba[:, c] = (weights * (labels == c)).sum(axis=1)
+        proba /= proba.sum(axis=1, keepdims=True)
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+class NeighborIndex:
+    """
+    Persistent nearest-neighbour index over the scaled catalog, in catalog row order.
+    Serves "similar tracks" lookups without refitting. (The KNN model saved by evaluate.py
+    is a KDTreeKNNClassifier of its own, fitted on the training rows.)
+    """
+
+    def __init__(self, model, source_key):
+        self.model = model
+        self.source_key = source_key
+
+    @property
+    def rows(self):
+        return self.model.tree_.n
+
+    def similar(self, scaled_features, k=10):
+        """
+        Catalog row positions and distances of the k songs closest to one scaled feature vector.
+        """
+        distances, indices = self.model.kneighbors(np.atleast_2d(scaled_features), n_neighbors=k)
+        return indices[0], distances[0]
+
+def _key_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+def build_neighbor_index(X_scaled, y, source_key, path=NEIGHBOR_INDEX_PATH, leafsize=DEFAULT_LEAFSIZE):
+    """
+    Fit the index on the full scaled feature matrix and save it (plus a small key file).
+    """
+    start = time.perf_counter()
+    model = KDTreeKNNClassifier(leafsize=leafsize).fit(X_scaled, y)
+    index = NeighborIndex(model, source_key)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    joblib.dump(index, path)
+    with open(_key_path(path), "w") as f:
+        json.dump({"source_key": source_key, "rows": index.rows, "leafsize": leafsize}, f)
+    _loaded_indexes[path] = index
+    print(f"Neighbor index over {index.rows} songs built in {time.perf_counter() - start:.2f}s and saved to {path}")
+    return index
+
+def ensure_neighbor_index(X_scaled, y, source_key=None, path=NEIGHBOR_INDEX_PATH):
+    """
+    Rebuild the saved index only when the scaled data it was built from has changed.
+    source_key defaults to a hash of X_scaled and y.
+    """
+    if source_key is None:
+        from src.artifact_cache import hash_data
+        source_key = hash_data(X_scaled, y)
+    try:
+        with open(_key_path(path)) as f:
+            if json.load(f).get("source_key") == source_key and os.path.exists(path):
+                return
+    except (OSError, ValueError):
+        pass
+    build_neighbor_index(X_scaled, y, source_key, path)
+
+def load_neighbor_index(path=NEIGHBOR_INDEX_PATH):
+    """
+    Load the saved index once per process.
+    """
+    if path not in _loaded_indexes:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Neighbor index not found at {path}. Run data_engineering.py first.")
+        _loaded_indexes[path] = joblib.load(path)
+    return _loaded_indexes[path]
+
+def tune_leafsize(X, candidates=(8, 16, 32, 64), n_queries=2000, k=5, seed=42):
+    """
+    Build + query time for each leaf size, on queries drawn from X itself.
+    """
+    rng = np.random.default_rng(seed)
+    queries = X[rng.choice(len(X), size=min(n_queries, len(X)), replace=False)]
+    results = []
+    for leafsize in candidates:
+        start = time.perf_counter()
+        tree = cKDTree(X, leafsize=leafsize)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        tree.query(queries, k=k, workers=-1)
+        query = time.perf_counter() - start
+        results.append({"leafsize": leafsize, "build_s": build, "query_ms_per_1k": query / len(queries) * 1e6})
+        print(f"  leafsize={leafsize:>4} | build {build:6.2f}s | query {query / len(queries) * 1e6:8.1f} ms per 1k")
+    return results
+
+def recall_at_eps(X, eps_values=(0.0, 0.5, 1.0, 2.0), n_queries=2000, k=5, leafsize=DEFAULT_LEAFSIZE, seed=42):
+    """
+    Recall of approximate (eps > 0) queries against exact ones, with their query time.
+    """
+    rng = np.random.default_rng(seed)
+    queries = X[rng.choice(len(X), size=min(n_queries, len(X)), replace=False)]
+    tree = cKDTree(X, leafsize=leafsize)
+    _, exact = tree.query(queries, k=k, workers=-1)
+    results = []
+    for eps in eps_values:
+        start = time.perf_counter()
+        _, approx = tree.query(queries, k=k, eps=eps, workers=-1)
+        elapsed = time.perf_counter() - start
+        recall = np.mean([len(np.intersect1d(a, e)) / k for a, e in zip(approx, exact)])
+        results.append({"eps": eps, "recall": float(recall), "query_ms_per_1k": elapsed / len(queries) * 1e6})
+        print(f"  eps={eps:<4} | recall@{k} {recall:.4f} | query {elapsed / len(queries) * 1e6:8.1f} ms per 1k")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the nearest-neighbour index over the scaled catalog.")
+    parser.add_argument("--tune", action="store_true", help="Time leaf sizes and measure recall for approximate search")
+    args = parser.parse_args()
+    try:
+        from src.data_loader import load_data
+        from src.data_engineering import preprocess_data, TRAINING_COLUMNS
+        X, y = preprocess_data(load_data(columns=TRAINING_COLUMNS))
+        ensure_neighbor_index(X, y)
+        if args.tune:
+            X = np.asarray(X, dtype=np.float64)
+            print("Leaf size:")
+            tune_leafsize(X)
+            print("Approximate search:")
+            recall_at_eps(X)
+    except Exception as e:
+        print(f"Error: {e}")
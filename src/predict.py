@@ -2,24 +2,124 @@ import joblib
 import pandas as pd
 import os
 import numpy as np
+import argparse
+from src.schema import FEATURE_COLUMNS
+from src.query_metrics import stage
 
-def load_prediction_artifacts():
+def load_prediction_artifacts(verbose=True, compiled=False, mapped=False):
     """
     Load the saved model and scaler.
+    With mapped=True a memory-mapped artifact converted from the current pickles
+    (see model_format.py) is used when present: it loads in milliseconds and is shared
+    between processes through the page cache. It is meant for the live predictor's
+    single-row queries; on large batches the NumPy engine is slower than sklearn, so
+    batch scoring keeps the default.
+    With compiled=True the array-based forest engine (see forest_engine.py) is used
+    as the model when it has been exported.
+    The model is the one models/leaderboard.json selected (see leaderboard.py), or the
+    Random Forest when there is no leaderboard; the mapped and compiled forms only apply
+    to the Random Forest. When the model registry has a current version (see
+    model_registry.py), that version's model and scaler are loaded instead.
     """
-    model_path = os.path.join("models", "random_forest.pkl")
-    scaler_path = os.path.join("models", "scaler.pkl")
+    from src.leaderboard import DEFAULT_MODEL_PATH
+    from src.model_registry import served_paths
+    model_path, scaler_path = served_paths()
+    is_forest = model_path == DEFAULT_MODEL_PATH
+    
+    if mapped and is_forest:
+        from src.model_format import ARTIFACT_PATH, is_fresh, load_forest
+        if is_fresh(ARTIFACT_PATH):
+            if verbose:
+                print(f"Mapping model from {ARTIFACT_PATH}...")
+            return load_forest(ARTIFACT_PATH)
+        if verbose and os.path.exists(ARTIFACT_PATH):
+            print(f"{ARTIFACT_PATH} is older than the pickled model. Using the pickled model.")
     
     if not os.path.exists(model_path):
         raise FileNotFoundError(f"Model not found at {model_path}. Run evaluate.py first.")
     if not os.path.exists(scaler_path):
         raise FileNotFoundError(f"Scaler not found at {scaler_path}. Run data_engineering.py first.")
         
-    print("Loading model and scaler...")
-    model = joblib.load(model_path)
+    if verbose:
+        print(f"Loading model ({model_path}) and scaler...")
     scaler = joblib.load(scaler_path)
+    if compiled and is_forest:
+        from src.forest_engine import CompiledForest, ENGINE_PATH
+        if os.path.exists(ENGINE_PATH):
+            return CompiledForest.load(ENGINE_PATH), scaler
+        if verbose:
+            print(f"Compiled engine not found at {ENGINE_PATH}. Using the pickled model.")
+    model = joblib.load(model_path)
     return model, scaler
 
+def build_feature_matrix(records):
+    """
+    Build a float32 feature matrix (rows x FEATURE_COLUMNS) from a DataFrame or list of dicts.
+    Missing feature columns and empty values are filled with 0; a value that is present but
+    not numeric raises ValueError naming the column (as the server's /predict does).
+    """
+    if not isinstance(records, pd.DataFrame):
+        records = pd.DataFrame(list(records))
+    
+    matrix = np.zeros((len(records), len(FEATURE_COLUMNS)), dtype=np.float32)
+    for i, col in enumerate(FEATURE_COLUMNS):
+        if col in records.columns:
+            values = records[col]
+            if not pd.api.types.is_numeric_dtype(values):
+                numeric = pd.to_numeric(values, errors='coerce')
+                bad = numeric.isna() & values.notna()
+                if bad.any():
+                    row = bad.idxmax()
+                    raise ValueError(f"Feature '{col}' must be numeric, got {values[row]!r} (row {row}).")
+                values = numeric
+            matrix[:, i] = values.fillna(0).to_numpy(dtype=np.float32)
+    return matrix
+
+def scale_features(matrix, scaler):
+    """
+    Apply the fitted scaler to a raw feature matrix.
+    MinMaxScaler is applied directly as its affine transform to skip sklearn's per-call validation.
+    The arithmetic is done in float64 (like scaler.transform) and only the result is cast back.
+    """
+    if hasattr(scaler, "scale_") and hasattr(scaler, "min_") and not getattr(scaler, "clip", False):
+        scaled = matrix * scaler.scale_
+        scaled += scaler.min_
+        return scaled.astype(matrix.dtype)
+    return scaler.transform(pd.DataFrame(matrix, columns=FEATURE_COLUMNS)).astype(matrix.dtype)
+
+def predict_batch(records, model, scaler):
+    """
+    Predict hits for many songs at once.
+    
+    Args:
+        records (DataFrame or list of dict): Song audio features, one row per song.
+        model: Trained classifier.
+        scaler: Fitted scaler.
+        
+    Returns:
+        DataFrame: 'is_hit' and 'hit_probability' columns, aligned with the input rows.
+    """
+    matrix = build_feature_matrix(records)
+    
+    if getattr(model, "takes_raw_features", False):
+        # Compiled engines apply the scaler themselves
+        with stage("inference"):
+            proba = model.predict_proba(matrix)
+    else:
+        with stage("scale"):
+            scaled = scale_features(matrix, scaler)
+        # Keep feature names so the model doesn't warn about them
+        with stage("inference"):
+            proba = model.predict_proba(pd.DataFrame(scaled, columns=FEATURE_COLUMNS, copy=False))
+    # Derive labels from the probabilities instead of walking the model a second time
+    labels = model.classes_.take(np.argmax(proba, axis=1))
+    hit_column = list(model.classes_).index(1)
+    
+    return pd.DataFrame({
+        "is_hit": labels.astype(bool),
+        "hit_probability": proba[:, hit_column]
+    })
+
 def predict_song(features, model, scaler):
     """
     Predict if a song is a hit based on features.
@@ -32,39 +132,113 @@ def predict_song(features, model, scaler):
     Returns:
         dict: Prediction result and probability.
     """
-    # Define the expected order of columns (must match training)
-    feature_columns = [
-        'danceability', 'energy', 'key', 'loudness', 'mode', 
-        'speechiness', 'acousticness', 'instrumentalness', 
-        'liveness', 'valence', 'tempo', 'duration_ms', 'year'
-    ]
+    result = predict_batch([features], model, scaler).iloc[0]
     
-    # Create DataFrame from input features
-    df = pd.DataFrame([features])
-    
-    # Ensure all columns exist (fill missing with 0 or handle error)
-    for col in feature_columns:
-        if col not in df.columns:
-            df[col] = 0 # Default value if missing
-            
-    # Reorder columns to match training
-    df = df[feature_columns]
+    return {
+        "is_hit": bool(result['is_hit']),
+        "hit_probability": round(float(result['hit_probability']), 4)
+    }
+
+# Columns copied from the input file to the scores file, when present
+PASSTHROUGH_COLUMNS = ['id', 'name', 'artists']
+
+# Artifacts loaded once per worker process
+_worker_artifacts = None
+
+def _init_worker():
+    global _worker_artifacts
+    _worker_artifacts = load_prediction_artifacts(verbose=False, mapped=False)
+
+def _score_chunk(chunk):
+    model, scaler = _worker_artifacts
+    return _scores_frame(chunk, model, scaler)
+
+def _scores_frame(chunk, model, scaler):
+    scores = predict_batch(chunk, model, scaler)
+    keep = [col for col in PASSTHROUGH_COLUMNS if col in chunk.columns]
+    return pd.concat([chunk[keep].reset_index(drop=True), scores], axis=1)
+
+def _scored_in_order(executor, chunks, window):
+    """
+    Submit chunks to the pool with at most window of them in flight, and yield their
+    scores in input order. (executor.map would read the whole file up front.)
+    """
+    from collections import deque
+    pending = deque()
+    for chunk in chunks:
+        pending.append(executor.submit(_score_chunk, chunk))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def score_file(input_path, output_path, chunksize=50000, workers=1):
+    """
+    Stream a CSV of tracks through predict_batch in chunks and write the scores.
+    Output format follows the extension: .parquet (requires pyarrow) or CSV.
+    With workers > 1, at most two chunks per worker are read ahead of the writer.
+    """
+    as_parquet = output_path.endswith(".parquet")
+    if as_parquet:
+        # Fail before any scoring rather than after the last chunk
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Writing .parquet needs pyarrow (pip install pyarrow); use a .csv output instead.")
+    chunks = pd.read_csv(input_path, chunksize=chunksize)
     
-    # Scale features
-    df_scaled_array = scaler.transform(df)
-    # Convert back to DataFrame to preserve feature names for the model
-    df_scaled = pd.DataFrame(df_scaled_array, columns=feature_columns)
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        results = _scored_in_order(executor, chunks, 2 * workers)
+    else:
+        executor = None
+        model, scaler = load_prediction_artifacts(mapped=False)
+        results = (_scores_frame(chunk, model, scaler) for chunk in chunks)
     
-    # Predict
-    prediction = model.predict(df_scaled)[0]
-    probability = model.predict_proba(df_scaled)[0][1] # Probability of Class 1 (Hit)
+    writer = None
+    n_rows = 0
+    try:
+        for i, scores in enumerate(results):
+            n_rows += len(scores)
+            if as_parquet:
+                # One row group per chunk; later chunks are cast to the first chunk's schema
+                if writer is None:
+                    table = pa.Table.from_pandas(scores, preserve_index=False)
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                else:
+                    table = pa.Table.from_pandas(scores, schema=writer.schema, preserve_index=False)
+                writer.write_table(table)
+            else:
+                scores.to_csv(output_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+            print(f"  Scored {n_rows} tracks...")
+    finally:
+        if writer is not None:
+            writer.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
     
-    return {
-        "is_hit": bool(prediction),
-        "hit_probability": round(probability, 4)
-    }
+    print(f"Scores for {n_rows} tracks saved to {output_path}")
+    return n_rows
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Predict hits for a single example song or a CSV of tracks.")
+    parser.add_argument("--input", help="CSV of tracks with audio feature columns")
+    parser.add_argument("--output", default="scores.csv", help="Where to write scores (.csv or .parquet)")
+    parser.add_argument("--chunksize", type=int, default=50000, help="Rows scored per chunk")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes to spread chunks across")
+    return parser.parse_args()
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.input:
+        try:
+            score_file(args.input, args.output, chunksize=args.chunksize, workers=args.workers)
+        except Exception as e:
+            print(f"Error: {e}")
+        raise SystemExit
+    
     try:
         model, scaler = load_prediction_artifacts()
         
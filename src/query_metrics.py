@@ -0,0 +1,279 @@
+"""
+Per-query latency metrics for the live predictor.
+
+Each query gets a record (begin_query); code on the query path times its stages with
+stage("name"), which is a shared no-op object outside a query. The record follows the
+query into the lookup threads through contextvars. When the query ends, every stage is
+added to a rolling histogram keyed by (stage, tier), tier being the search tier that
+answered (api, exact, tokens or fuzzy; error when the query failed).
+
+Histograms are shown by the `:stats` command, appended as JSON lines to
+$TOPTRACK_METRICS_PATH (default logs/live_metrics.jsonl) every
+$TOPTRACK_METRICS_INTERVAL seconds (default 60) by a background timer, skipping intervals
+with no new queries, and at exit, next to a Prometheus text snapshot (.prom) of the same
+counters.
+"""
+import os
+import json
+import math
+import time
+import atexit
+import threading
+import contextvars
+from collections import deque
+
+METRICS_PATH = os.getenv("TOPTRACK_METRICS_PATH", os.path.join("logs", "live_metrics.jsonl"))
+DUMP_INTERVAL = float(os.getenv("TOPTRACK_METRICS_INTERVAL", 60))
+
+# Prometheus bucket upper bounds, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Percentiles are taken over the most recent samples of each histogram
+WINDOW = 2048
+
+_current = contextvars.ContextVar("toptrack_query", default=None)
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+class _Stage:
+    def __init__(self, record, name):
+        self.record = record
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.record.add(self.name, time.perf_counter() - self.start)
+        return False
+
+class QueryRecord:
+    """
+    Stage timings of one query. Stages that finish after the query ended (an abandoned
+    API call, say) are dropped.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.start = time.perf_counter()
+        self.stages = []
+        self.tier = None
+        self.local_tier = None
+        self.source = None
+        self.error = None
+        self.closed = False
+
+    def add(self, name, seconds):
+        if not self.closed:
+            self.stages.append((name, seconds))
+
+def stage(name):
+    """
+    Time one stage of the current query: `with stage("local_fuzzy"): ...`
+    """
+    record = _current.get()
+    if record is None:
+        return _NULL_STAGE
+    return _Stage(record, name)
+
+def tag(**attrs):
+    """
+    Set tier/source/error on the current query, if there is one.
+    """
+    record = _current.get()
+    if record is not None:
+        for key, value in attrs.items():
+            setattr(record, key, value)
+
+def context_bound(fn):
+    """
+    Wrap fn so it runs with the caller's current query (for work handed to other threads).
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+def nearest_rank(ordered, q):
+    """
+    The q-th percentile of an ascending list by the nearest-rank method (an actual sample).
+    """
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+class RollingHistogram:
+    """
+    Cumulative Prometheus-style buckets, count and sum, plus the last WINDOW samples for percentiles.
+    """
+
+    def __init__(self, window=WINDOW):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        index = 0
+        while index < len(BUCKETS) and seconds > BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def percentiles(self, qs=(50, 95, 99)):
+        if not self.recent:
+            return {q: None for q in qs}
+        ordered = sorted(self.recent)
+        return {q: nearest_rank(ordered, q) for q in qs}
+
+    def summary(self):
+        p = self.percentiles()
+        return {"count": self.count, "mean_s": self.sum / self.count if self.count else None,
+                "p50_s": p[50], "p95_s": p[95], "p99_s": p[99], "max_s": self.max}
+
+class QueryMetrics:
+    """
+    Rolling histograms per (stage, tier), query/error counters, and the periodic dump.
+    """
+
+    def __init__(self, path=METRICS_PATH, interval=DUMP_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.histograms = {}
+        self.queries = {}
+        self.errors = {}
+        self.started = time.time()
+        self.last_dump = time.monotonic()
+        self._dumped_queries = 0
+        self._lock = threading.Lock()
+        self._dump_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._timer = None
+
+    def begin_query(self, query):
+        """
+        Start timing a query; returns (record, token) for end_query().
+        """
+        record = QueryRecord(query)
+        return record, _current.set(record)
+
+    def end_query(self, record, token):
+        record.total = time.perf_counter() - record.start
+        record.closed = True
+        _current.reset(token)
+        tier = record.tier or ("error" if record.error else "none")
+        with self._lock:
+            for name, seconds in record.stages + [("total", record.total)]:
+                self.histograms.setdefault((name, tier), RollingHistogram()).observe(seconds)
+            self.queries[tier] = self.queries.get(tier, 0) + 1
+            if record.error:
+                self.errors[record.error] = self.errors.get(record.error, 0) + 1
+        return record
+
+    def start_timer(self):
+        """
+        Dump every interval seconds from a daemon thread, whether or not a query is running.
+        """
+        if not self.interval or self._timer is not None:
+            return
+        def run():
+            while not self._stop.wait(self.interval):
+                with self._lock:
+                    total = sum(self.queries.values())
+                if total != self._dumped_queries:
+                    self.dump()
+        self._timer = threading.Thread(target=run, name="metrics-dump", daemon=True)
+        self._timer.start()
+
+    def close(self):
+        """
+        Stop the timer and write a final snapshot.
+        """
+        self._stop.set()
+        self.dump()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "uptime_s": round(time.time() - self.started, 1),
+                "queries": dict(self.queries), "errors": dict(self.errors),
+                "stages": [dict(stage=name, tier=tier, **histogram.summary())
+                           for (name, tier), histogram in sorted(self.histograms.items())]
+            }
+
+    def format_table(self):
+        """
+        The :stats report: one line per (stage, tier), slowest p99 first.
+        """
+        snapshot = self.snapshot()
+        if not snapshot["stages"]:
+            return "No queries timed yet."
+        ms = lambda value: f"{value * 1000:9.2f}" if value is not None else f"{'-':>9}"
+        lines = [f"{'stage':<16} {'tier':<12} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+        for row in sorted(snapshot["stages"], key=lambda row: -(row["p99_s"] or 0)):
+            lines.append(f"{row['stage']:<16} {row['tier']:<12} {row['count']:>6} "
+                         f"{ms(row['p50_s'])} {ms(row['p95_s'])} {ms(row['p99_s'])} {ms(row['max_s'])}")
+        lines.append("Queries by tier: " + ", ".join(f"{tier}={n}" for tier, n in sorted(snapshot["queries"].items())))
+        if snapshot["errors"]:
+            lines.append("Errors: " + ", ".join(f"{name}={n}" for name, n in sorted(snapshot["errors"].items())))
+        return "\n".join(lines)
+
+    def prometheus(self):
+        """
+        Prometheus text exposition format snapshot of the histograms and counters.
+        """
+        lines = ["# HELP toptrack_stage_seconds Live predictor query stage latency.",
+                 "# TYPE toptrack_stage_seconds histogram"]
+        with self._lock:
+            for (name, tier), histogram in sorted(self.histograms.items()):
+                labels = f'stage="{name}",tier="{tier}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'toptrack_stage_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"toptrack_stage_seconds_sum{{{labels}}} {histogram.sum:.6f}")
+                lines.append(f"toptrack_stage_seconds_count{{{labels}}} {histogram.count}")
+            lines += ["# HELP toptrack_queries_total Queries answered, by search tier.",
+                      "# TYPE toptrack_queries_total counter"]
+            lines += [f'toptrack_queries_total{{tier="{tier}"}} {n}' for tier, n in sorted(self.queries.items())]
+            lines += ["# HELP toptrack_query_errors_total Failed queries, by exception type.",
+                      "# TYPE toptrack_query_errors_total counter"]
+            lines += [f'toptrack_query_errors_total{{error="{name}"}} {n}' for name, n in sorted(self.errors.items())]
+        return "\n".join(lines) + "\n"
+
+    def dump(self):
+        """
+        Append a snapshot line to the JSON-lines file and rewrite the .prom snapshot next to it.
+        """
+        with self._dump_lock:
+            self.last_dump = time.monotonic()
+            if not self.path or not self.histograms:
+                return
+            snapshot = self.snapshot()
+            self._dumped_queries = sum(snapshot["queries"].values())
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(snapshot) + "\n")
+            prom_path = os.path.splitext(self.path)[0] + ".prom"
+            with open(prom_path + ".tmp", "w") as f:
+                f.write(self.prometheus())
+            os.replace(prom_path + ".tmp", prom_path)
+
+def create_metrics(path=METRICS_PATH, interval=DUMP_INTERVAL):
+    """
+    A QueryMetrics that dumps on its timer and once more when the process exits.
+    """
+    metrics = QueryMetrics(path, interval)
+    metrics.start_timer()
+    atexit.register(metrics.close)
+    return metrics
@@ -0,0 +1,172 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+from src.artifact_cache import ArtifactCache, hash_data, model_key
+from src import tracing
+
+# Every metric is computed for every fold in the same pass
+METRICS = ["accuracy", "precision", "recall", "f1", "roc_auc"]
+
+# Shared-memory arrays already attached in this (worker) process, keyed by block name
+_attached = {}
+
+def share_array(array):
+    """
+    Copy an array into a shared-memory block once. Returns (block, descriptor for workers).
+    """
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+    view[:] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+def attach_array(descriptor):
+    """
+    Map a shared-memory array in a worker without copying it.
+    """
+    name, shape, dtype = descriptor
+    if name not in _attached:
+        block = shared_memory.SharedMemory(name=name)
+        _attached[name] = (block, np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf))
+    return _attached[name][1]
+
+def score_predictions(y_true, y_pred, y_proba):
+    return {
+        "accuracy": accuracy_score(y_true, y_pred),
+        "precision": precision_score(y_true, y_pred, zero_division=0),
+        "recall": recall_score(y_true, y_pred, zero_division=0),
+        "f1": f1_score(y_true, y_pred, zero_division=0),
+        "roc_auc": roc_auc_score(y_true, y_proba)
+    }
+
+def _run_task(task):
+    """
+    Worker entry point: fit one model on one fold (or on everything for the final fit),
+    then checkpoint the result to the artifact cache.
+    """
+    X_all = attach_array(task["X"])
+    y_all = attach_array(task["y"])
+    columns = task["columns"]
+    model = task["model"]
+    label = "final_fit" if task["fold"] is None else f"fold{task['fold']}"
+
+    with tracing.span(f"{task['name']}:{label}"):
+        if task["fold"] is None:
+            with tracing.span("fit", rows=len(y_all)):
+                start = time.perf_counter()
+                model.fit(pd.DataFrame(X_all, columns=columns), y_all)
+            result = {"model": model, "fit_s": time.perf_counter() - start}
+        else:
+            train_idx, test_idx = task["train_idx"], task["test_idx"]
+            with tracing.span("fit", rows=len(train_idx)):
+                model.fit(pd.DataFrame(X_all[train_idx], columns=columns), y_all[train_idx])
+            with tracing.span("score", rows=len(test_idx)):
+                X_test = pd.DataFrame(X_all[test_idx], columns=columns)
+                y_proba = model.predict_proba(X_test)[:, 1]
+                y_pred = model.classes_.take((y_proba > 0.5).astype(int))
+                result = {"scores": score_predictions(y_all[test_idx], y_pred, y_proba)}
+
+        with tracing.span("checkpoint"):
+            ArtifactCache(task["cache_root"]).save("evaluation", task["key"], result)
+    # Workers never run atexit hooks, so hand the spans to the parent through the trace directory
+    tracing.flush()
+    return task["name"], task["fold"], result
+
+def task_key(data_key, name, model, cv, fold):
+    """
+    Cache key of one task: the data, this model's parameters, the CV splitter and the fold.
+    """
+    return model_key(data_key, name, model, repr(cv), "final" if fold is None else f"fold{fold}")
+
+def _single_threaded(model):
+    """
+    Each task gets one core; the pool provides the parallelism.
+    """
+    params = model.get_params()
+    # Wrapped estimators (e.g. DownsampledClassifier) expose theirs as estimator__n_jobs
+    n_jobs = {key: 1 for key in params if key == "n_jobs" or key.endswith("__n_jobs")}
+    if n_jobs:
+        model.set_params(**n_jobs)
+    return model
+
+@tracing.traced("run_scheduled_evaluation")
+def run_scheduled_evaluation(X, y, models, cv, cache=None, max_workers=None):
+    """
+    Cross-validate and refit every model with all (model, fold) pairs and final fits in
+    one process pool. Features are shared with workers through shared memory, and every
+    finished task is stored in the artifact cache under a key of the data and that
+    model's parameters. A rerun resumes from those entries, and changing one model's
+    hyperparameters only reruns that model.
+
+    Returns {name: {"scores": {metric: [per-fold values]}, "model": fitted model,
+    "fit_s": seconds of the single-core final fit}}.
+    """
+    columns = list(X.columns) if isinstance(X, pd.DataFrame) else None
+    X_array = np.asarray(X)
+    y_array = np.asarray(y)
+    cache = cache if cache is not None else ArtifactCache()
+    data_key = hash_data(X, y)
+
+    splits = list(cv.split(X_array, y_array))
+    results = {name: {"scores": {metric: [None] * len(splits) for metric in METRICS}, "model": None, "fit_s": None}
+               for name in models}
+
+    # Final fits are the longest tasks, so they are queued first
+    pending = []
+    for name, model in models.items():
+        for fold in [None] + list(range(len(splits))):
+            pending.append((name, fold, task_key(data_key, name, model, cv, fold)))
+
+    def record(name, fold, result):
+        if fold is None:
+            results[name]["model"] = result["model"]
+            # Final fits checkpointed before fit times were recorded have none
+            results[name]["fit_s"] = result.get("fit_s")
+        else:
+            for metric, value in result["scores"].items():
+                results[name]["scores"][metric][fold] = value
+
+    todo = []
+    for name, fold, key in pending:
+        cached = cache.get("evaluation", key)
+        if cached is not None:
+            record(name, fold, cached)
+        else:
+            todo.append((name, fold, key))
+
+    print(f"{len(pending) - len(todo)} of {len(pending)} tasks restored from {cache.root}")
+    if not todo:
+        return results
+
+    with tracing.span("share_arrays"):
+        X_block, X_desc = share_array(X_array)
+        y_block, y_desc = share_array(y_array)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+            futures = []
+            for name, fold, key in todo:
+                task = {
+                    "name": name, "fold": fold, "key": key, "cache_root": cache.root,
+                    "model": _single_threaded(clone(models[name])),
+                    "X": X_desc, "y": y_desc, "columns": columns
+                }
+                if fold is not None:
+                    task["train_idx"], task["test_idx"] = splits[fold]
+                futures.append(executor.submit(_run_task, task))
+
+            for done, future in enumerate(as_completed(futures), start=1):
+                name, fold, result = future.result()
+                record(name, fold, result)
+                label = "final fit" if fold is None else f"fold {fold + 1}"
+                print(f"  [{done}/{len(todo)}] {name} {label} done")
+    finally:
+        for block in (X_block, y_block):
+            block.close()
+            block.unlink()
+
+    return results
@@ -0,0 +1,17 @@
+"""
+Column lists and the target definition shared by training and prediction.
+Kept free of heavy imports so the live predictor can start without pandas or sklearn.
+"""
+
+# Standard audio features provided by Spotify (order must match training)
+FEATURE_COLUMNS = [
+    'danceability', 'energy', 'key', 'loudness', 'mode', 
+    'speechiness', 'acousticness', 'instrumentalness', 
+    'liveness', 'valence', 'tempo', 'duration_ms', 'year'
+]
+
+# Columns needed to build features and target from the raw data
+TRAINING_COLUMNS = FEATURE_COLUMNS + ['popularity']
+
+# A song is a "Hit" when its popularity is above this value
+HIT_THRESHOLD = 70
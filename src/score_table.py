@@ -0,0 +1,122 @@
+import os
+import time
+import hashlib
+import numpy as np
+from src.model_format import write_artifact, read_artifact, source_stamp, sources_unchanged
+from src.model_registry import served_paths
+from src.schema import FEATURE_COLUMNS
+
+SCORE_TABLE_PATH = os.path.join("models", "catalog_scores")
+
+# Bumped when the stored arrays change shape or meaning
+LAYOUT_VERSION = 3
+
+class ScoreTable:
+    """
+    Precomputed hit probability and label for every catalog song, keyed by track id.
+    Only valid while the model and scaler files it was scored with are unchanged.
+
+    Ids are stored sorted as fixed-width bytes and looked up by binary search on the
+    mapped array, so loading builds no per-song Python objects.
+    """
+
+    def __init__(self, ids, probabilities, labels, meta):
+        self.ids = ids
+        self.probabilities = probabilities
+        self.labels = labels
+        self.meta = meta
+
+    @property
+    def model_version(self):
+        return self.meta["model_version"]
+
+    def is_current(self):
+        return sources_unchanged(self.meta["sources"])
+
+    def matches(self, model_path):
+        """
+        True if the table was scored with the model at model_path (what a hot-swapped
+        predictor serves may differ from what it started with).
+        """
+        return self.meta["model_path"] == model_path
+
+    def lookup(self, track_id):
+        """
+        The stored prediction for one track id, in predict_song's format; None if the id is
+        unknown or the model has changed since the table was built.
+        """
+        if not track_id:
+            return None
+        try:
+            key = np.bytes_(track_id)
+        except UnicodeEncodeError:
+            return None
+        position = int(np.searchsorted(self.ids, key))
+        if position == len(self.ids) or self.ids[position] != key or not self.is_current():
+            return None
+        return {
+            "is_hit": bool(self.labels[position]),
+            "hit_probability": round(float(self.probabilities[position]), 4)
+        }
+
+def file_digest(path, block=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(block), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def build_score_table(path=SCORE_TABLE_PATH, chunksize=50000):
+    """
+    Score the whole local catalog with the live model in vectorized chunks and save
+    the id -> probability/label table, stamped with the model version.
+    """
+    from src.data_loader import load_data
+    from src.predict import load_prediction_artifacts, predict_batch
+
+    start = time.perf_counter()
+    model_path, scaler_path = served_paths()
+    model, scaler = load_prediction_artifacts(verbose=False, mapped=False)
+    df = load_data(verbose=False, columns=['id'] + FEATURE_COLUMNS)
+
+    probabilities = np.empty(len(df), dtype=np.float32)
+    labels = np.empty(len(df), dtype=np.int8)
+    for offset in range(0, len(df), chunksize):
+        scores = predict_batch(df.iloc[offset:offset + chunksize], model, scaler)
+        probabilities[offset:offset + len(scores)] = scores['hit_probability'].to_numpy()
+        labels[offset:offset + len(scores)] = scores['is_hit'].to_numpy()
+
+    ids = df['id'].astype(str).to_numpy().astype(np.bytes_)
+    order = np.argsort(ids, kind='stable')
+    ids, probabilities, labels = ids[order], probabilities[order], labels[order]
+    meta = {
+        "layout": LAYOUT_VERSION,
+        "model_version": file_digest(model_path)[:16],
+        "model_path": model_path,
+        "sources": [source_stamp(model_path), source_stamp(scaler_path)],
+        "rows": len(df)
+    }
+    write_artifact(path, {"ids": ids, "probabilities": probabilities, "labels": labels}, meta)
+    print(f"Scored {len(df)} catalog songs in {time.perf_counter() - start:.2f}s "
+          f"(model {meta['model_version']}); saved to {path}")
+    return path
+
+def load_score_table(path=SCORE_TABLE_PATH):
+    """
+    The saved table, or None if it is missing or was built with a different model
+    (including a different leaderboard winner or registry version).
+    """
+    try:
+        arrays, meta = read_artifact(path)
+    except (OSError, ValueError):
+        return None
+    if meta.get("layout") != LAYOUT_VERSION or meta.get("model_path") != served_paths()[0]:
+        return None
+    table = ScoreTable(arrays["ids"], arrays["probabilities"], arrays["labels"], meta)
+    return table if table.is_current() else None
+
+if __name__ == "__main__":
+    try:
+        build_score_table()
+    except Exception as e:
+        print(f"Error while scoring the catalog: {e}")
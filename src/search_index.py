@@ -0,0 +1,211 @@
+import os
+import numpy as np
+import joblib
+from src.fuzzy_search import FuzzyMatcher
+
+INDEX_VERSION = 3
+DEFAULT_DATA_PATH = os.path.join("data", "spotify_data.csv")
+
+# Indexes already loaded in this process, keyed by their file path
+_loaded_indexes = {}
+
+def normalize_text(value):
+    """
+    Lowercase a name/artist value the same way the search queries are normalized.
+    """
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    return str(value).lower()
+
+def clean_artists(value):
+    """
+    Turn the raw artists column ("['A', 'B']") into a display string ("A, B").
+    """
+    return str(value).replace("['", "").replace("']", "").replace("'", "")
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _build_postings(texts):
+    """
+    Build a trigram -> sorted rank array inverted index over a list of (tuples of) strings.
+    """
+    postings = {}
+    for rank, parts in enumerate(texts):
+        grams = set()
+        for part in parts:
+            grams |= _trigrams(part)
+        for gram in grams:
+            postings.setdefault(gram, []).append(rank)
+    # Ranks are appended in increasing order, so every posting list is already sorted
+    return {gram: np.asarray(ranks, dtype=np.int32) for gram, ranks in postings.items()}
+
+class SearchIndex:
+    """
+    Trigram inverted index over song names and artists, plus a FuzzyMatcher for typos.
+
+    Rows are stored pre-sorted by popularity (rank 0 = most popular), so the first
+    verified candidate of any lookup is also the best match.
+    """
+
+    def __init__(self, order, names, artists, name_grams, text_grams, fuzzy, source_stamp=None):
+        self.order = order
+        self.names = names
+        self.artists = artists
+        self.name_grams = name_grams
+        self.text_grams = text_grams
+        self.fuzzy = fuzzy
+        self.source_stamp = source_stamp
+
+    def __len__(self):
+        return len(self.order)
+
+    def _candidates(self, postings, text):
+        """
+        Intersect the posting lists of every trigram in text.
+        Returns None when text is too short to use the index (caller must scan).
+        """
+        grams = _trigrams(text)
+        if not grams:
+            return None
+        lists = []
+        for gram in grams:
+            ranks = postings.get(gram)
+            if ranks is None:
+                return np.empty(0, dtype=np.int32)
+            lists.append(ranks)
+        lists.sort(key=len)
+        candidates = lists[0]
+        for ranks in lists[1:]:
+            candidates = np.intersect1d(candidates, ranks, assume_unique=True)
+            if candidates.size == 0:
+                break
+        return candidates
+
+    def find_substring(self, query):
+        """
+        Return the rank of the most popular song whose name contains query, or None.
+        """
+        candidates = self._candidates(self.name_grams, query)
+        if candidates is None:
+            candidates = range(len(self.names))
+        for rank in candidates:
+            if query in self.names[rank]:
+                return int(rank)
+        return None
+
+    def find_tokens(self, tokens):
+        """
+        Return the rank of the most popular song where every token appears in the name or artists.
+        """
+        candidates = None
+        for token in tokens:
+            token_candidates = self._candidates(self.text_grams, token)
+            if token_candidates is None:
+                continue
+            if candidates is None:
+                candidates = token_candidates
+            else:
+                candidates = np.intersect1d(candidates, token_candidates, assume_unique=True)
+            if candidates.size == 0:
+                return None
+        if candidates is None:
+            candidates = range(len(self.names))
+        for rank in candidates:
+            name, artists = self.names[rank], self.artists[rank]
+            if all(token in name or token in artists for token in tokens):
+                return int(rank)
+        return None
+
+    def find_fuzzy(self, query, k=5):
+        """
+        Return up to k (rank, score) typo-tolerant matches on name and artist tokens, best first;
+        empty when nothing scores at least fuzzy_search.MIN_SCORE.
+        """
+        return self.fuzzy.search(query, k=k)
+
+    def row_position(self, rank):
+        """
+        Map a popularity rank back to a positional row index in the source DataFrame.
+        """
+        return int(self.order[rank])
+
+def build_search_index(df, source_stamp=None):
+    """
+    Build a SearchIndex from the catalog DataFrame.
+    """
+    print("Building search index...")
+    popularity = df['popularity'].to_numpy()
+    # Most popular first; stable so equal popularity keeps file order
+    order = np.argsort(-popularity, kind='stable').astype(np.int32)
+
+    # Repeated names/artists share one string object (pickle keeps the sharing on load)
+    interned = {}
+    names = [interned.setdefault(text, text) for text in map(normalize_text, df['name'].to_numpy()[order])]
+    artists = [
+        interned.setdefault(text, text)
+        for text in (normalize_text(clean_artists(value)) for value in df['artists'].to_numpy()[order])
+    ]
+
+    name_grams = _build_postings((name,) for name in names)
+    text_grams = _build_postings(zip(names, artists))
+    fuzzy = FuzzyMatcher().fit(names, artists)
+    return SearchIndex(order, names, artists, name_grams, text_grams, fuzzy, source_stamp)
+
+def get_index_path(data_path=DEFAULT_DATA_PATH):
+    """
+    The search index is stored next to the CSV it was built from.
+    """
+    return os.path.splitext(data_path)[0] + "_search_index.pkl"
+
+def _source_stamp(data_path, n_rows):
+    if not os.path.exists(data_path):
+        return (INDEX_VERSION, n_rows)
+    stat = os.stat(data_path)
+    return (INDEX_VERSION, n_rows, stat.st_size, stat.st_mtime_ns)
+
+def get_search_index(df, data_path=DEFAULT_DATA_PATH):
+    """
+    Load the search index saved next to data_path, rebuilding and saving it if it
+    is missing or was built from a different version of the data.
+    """
+    index_path = get_index_path(data_path)
+    stamp = _source_stamp(data_path, len(df))
+
+    index = _loaded_indexes.get(index_path)
+    if index is not None and index.source_stamp == stamp:
+        return index
+
+    index = None
+    if os.path.exists(index_path):
+        try:
+            index = joblib.load(index_path)
+        except Exception:
+            index = None
+        if not isinstance(index, SearchIndex) or index.source_stamp != stamp:
+            index = None
+
+    if index is None:
+        index = build_search_index(df, source_stamp=stamp)
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        joblib.dump(index, index_path)
+        print(f"Search index saved to {index_path}")
+
+    _loaded_indexes[index_path] = index
+    return index
+
+if __name__ == "__main__":
+    from src.data_loader import load_data
+    # Build through the importable module so the pickle refers to src.search_index.SearchIndex,
+    # not __main__.SearchIndex (which other processes could not load)
+    from src.search_index import get_search_index, get_index_path
+    try:
+        df = load_data()
+        # Always rebuild when run directly
+        index_path = get_index_path()
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        index = get_search_index(df)
+        print(f"Indexed {len(index)} songs ({len(index.name_grams)} name trigrams).")
+    except Exception as e:
+        print(f"Error: {e}")
@@ -0,0 +1,236 @@
+import asyncio
+import argparse
+import json
+import math
+import time
+from urllib.parse import urlsplit, parse_qs
+from src.predict import predict_batch
+from src.model_registry import load_handle
+from src.catalog import load_slim_catalog
+from src.live_predict import search_local_data
+from src.schema import FEATURE_COLUMNS
+
+def validate_features(features):
+    """
+    Raise ValueError naming the first feature whose value is not a finite number.
+    Missing features are allowed (they are scored as 0); unknown keys are ignored.
+    """
+    if not isinstance(features, dict):
+        raise ValueError("Expected a JSON object of audio features.")
+    for column in FEATURE_COLUMNS:
+        if column not in features:
+            continue
+        value = features[column]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(f"Feature '{column}' must be a finite number, got {json.dumps(value)}.")
+
+class MicroBatcher:
+    """
+    Coalesces concurrent predict requests into one model call.
+
+    A batch is flushed when it reaches max_batch items or when the oldest item
+    has waited max_wait seconds, whichever comes first.
+    """
+
+    def __init__(self, predict_fn, max_batch=64, max_wait=0.002):
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.items = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, features):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((features, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            features = [item[0] for item in batch]
+            try:
+                # Run the model off the event loop so new requests keep queueing
+                results = await loop.run_in_executor(None, self.predict_fn, features)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+class PredictionServer:
+    """
+    Keeps the model, scaler, catalog and search index warm and serves them over HTTP/JSON.
+
+    Routes:
+        POST /predict          body: {"features": {...}} or a bare feature dict; 400 if a
+                               feature value is not a number
+        GET  /search?q=<song>  best local match plus its prediction (and fuzzy-search notes)
+        POST /rollback         serve the model version replaced last (see model_registry.py)
+        GET  /health           batching counters and the model version served
+
+    The model and scaler are read from the handle once per batch, so a hot swap takes
+    effect between batches.
+    """
+
+    def __init__(self, handle, df, index, max_batch=64, max_wait=0.002):
+        self.handle = handle
+        self.df = df
+        self.index = index
+        self.batcher = MicroBatcher(self._predict_many, max_batch=max_batch, max_wait=max_wait)
+
+    def _predict_many(self, features):
+        model, scaler = self.handle.get()
+        scores = predict_batch(features, model, scaler)
+        return [
+            {"is_hit": bool(is_hit), "hit_probability": round(float(probability), 4)}
+            for is_hit, probability in zip(scores['is_hit'], scores['hit_probability'])
+        ]
+
+    async def handle_predict(self, body):
+        payload = json.loads(body or b"{}")
+        features = payload.get("features", payload) if isinstance(payload, dict) else payload
+        validate_features(features)
+        return 200, await self.batcher.submit(features)
+
+    async def handle_search(self, params):
+        query = params.get("q", [""])[0].strip()
+        if not query:
+            raise ValueError("Missing query parameter 'q'.")
+        loop = asyncio.get_running_loop()
+        # Fuzzy-search notes ("Did you mean ...") go in the response, not the server's stdout
+        notes = []
+        try:
+            features, track_name, artist_name = await loop.run_in_executor(
+                None, search_local_data, self.df, query, self.index, notes.append
+            )
+        except ValueError as e:
+            return 404, {"error": str(e)}
+        prediction = await self.batcher.submit(features)
+        response = {"name": str(track_name), "artists": artist_name, **prediction}
+        if notes:
+            response["notes"] = [note.strip() for note in notes]
+        return 200, response
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        if url.path == "/predict" and method == "POST":
+            return await self.handle_predict(body)
+        if url.path == "/search" and method == "GET":
+            return await self.handle_search(parse_qs(url.query))
+        if url.path == "/rollback" and method == "POST":
+            return 200, {"model_version": self.handle.rollback()}
+        if url.path == "/health" and method == "GET":
+            return 200, {"status": "ok", "batches": self.batcher.batches, "items": self.batcher.items,
+                         "model_version": self.handle.version}
+        return 404, {"error": f"No route for {method} {url.path}"}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    status, payload = await self.dispatch(method, target, body)
+                except (ValueError, json.JSONDecodeError) as e:
+                    status, payload = 400, {"error": str(e)}
+                except Exception as e:
+                    status, payload = 500, {"error": str(e)}
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                data = json.dumps(payload).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8000):
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving on http://{host}:{port} (max batch {self.batcher.max_batch}, "
+              f"max wait {self.batcher.max_wait * 1000:.1f} ms)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+
+def create_server(max_batch=64, max_wait=0.002):
+    """
+    Load every artifact once and build a PredictionServer around them.
+    The catalog is the memory-mapped SlimCatalog the live predictor uses, not a DataFrame.
+    The model handle keeps watching the registry for new versions.
+    """
+    start = time.time()
+    handle = load_handle()
+    df, index = load_slim_catalog()
+    print(f"Artifacts loaded in {time.time() - start:.2f}s")
+    print(f"Serving model version {handle.version or 'from models/'}")
+    return PredictionServer(handle, df, index, max_batch=max_batch, max_wait=max_wait)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve hit predictions over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch", type=int, default=64, help="Largest micro-batch sent to the model")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="Longest a request waits for its batch to fill")
+    args = parser.parse_args()
+    try:
+        server = create_server(max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000)
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+    except Exception as e:
+        print(f"Error: {e}")
@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import requests
+import spotipy
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from spotipy.oauth2 import SpotifyClientCredentials
+from src.query_metrics import stage
+
+CACHE_PATH = os.path.join("data", "spotify_cache.sqlite")
+
+# Spotify's audio-features endpoint accepts at most 100 ids per call
+MAX_FEATURE_IDS = 100
+
+class TTLCache:
+    """
+    Small persistent key/value cache with per-entry expiry, backed by sqlite.
+    Values are stored as JSON; None is a valid (negative) cached value.
+    Expired rows are deleted when the cache is opened and then at most every purge_interval
+    seconds on write, so the file does not grow without bound.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=7 * 24 * 3600, purge_interval=3600):
+        self.path = path
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT, key TEXT, value TEXT, expires REAL, PRIMARY KEY (namespace, key))"
+        )
+        self._conn.commit()
+        self.purge_expired()
+
+    def get_many(self, namespace, keys):
+        """
+        Return {key: value} for keys that are cached and not expired.
+        """
+        keys = list(keys)
+        found = {}
+        now = time.time()
+        with self._lock:
+            # sqlite limits the number of bound parameters per statement
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM cache WHERE namespace = ? AND expires > ? "
+                    f"AND key IN ({','.join('?' * len(chunk))})",
+                    [namespace, now] + chunk
+                ).fetchall()
+                for key, value in rows:
+                    found[key] = json.loads(value)
+        return found
+
+    def get(self, namespace, key, default=None):
+        return self.get_many(namespace, [key]).get(key, default)
+
+    def purge_expired(self):
+        """
+        Delete every expired row; returns how many were removed.
+        """
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),)).rowcount
+            self._conn.commit()
+            self._last_purge = time.monotonic()
+        return removed
+
+    def set_many(self, namespace, items, ttl=None):
+        if not items:
+            return
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+                [(namespace, key, json.dumps(value), expires) for key, value in items.items()]
+            )
+            self._conn.commit()
+        if time.monotonic() - self._last_purge >= self.purge_interval:
+            self.purge_expired()
+
+    def set(self, namespace, key, value, ttl=None):
+        self.set_many(namespace, {key: value}, ttl=ttl)
+
+def create_session(pool_size=10):
+    """
+    A requests session with a connection pool sized for concurrent lookups.
+    Retries are left to the caller so a dead API fails fast.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+class SpotifyAccess:
+    """
+    Pooled, cached access to the Spotify search and audio-features endpoints.
+
+    query -> track and id -> features lookups are remembered in a TTLCache, so repeated
+    lookups never hit the network, and features for many tracks are fetched in batches
+    of up to 100 ids.
+    """
+
+    def __init__(self, sp, cache=None, miss_ttl=3600, max_workers=8):
+        self.sp = sp
+        self.cache = cache if cache is not None else TTLCache()
+        self.miss_ttl = miss_ttl
+        self.max_workers = max_workers
+        self.api_calls = 0
+
+    @staticmethod
+    def _query_key(query):
+        return " ".join(str(query).lower().split())
+
+    def search_track(self, query):
+        """
+        Resolve a query to {'id', 'name', 'artist', 'year'}, or None if Spotify has no match.
+        """
+        key = self._query_key(query)
+        cached = self.cache.get_many("query", [key])
+        if key in cached:
+            return cached[key]
+
+        self.api_calls += 1
+        with stage("api_search"):
+            results = self.sp.search(q=query, limit=1, type='track')
+        track = None
+        if results['tracks']['items']:
+            item = results['tracks']['items'][0]
+            track = {
+                "id": item['id'],
+                "name": item['name'],
+                "artist": item['artists'][0]['name'],
+                "year": int(item['album']['release_date'].split('-')[0])
+            }
+        # Remember misses too, but not for as long
+        self.cache.set("query", key, track, ttl=None if track else self.miss_ttl)
+        return track
+
+    def audio_features(self, track_ids):
+        """
+        Return {id: features or None} for every id, fetching uncached ids in batches of 100.
+        """
+        track_ids = list(dict.fromkeys(track_ids))
+        found = self.cache.get_many("features", track_ids)
+        missing = [track_id for track_id in track_ids if track_id not in found]
+
+        for i in range(0, len(missing), MAX_FEATURE_IDS):
+            chunk = missing[i:i + MAX_FEATURE_IDS]
+            self.api_calls += 1
+            with stage("api_features"):
+                features = self.sp.audio_features(chunk) or []
+            fetched = {track_id: None for track_id in chunk}
+            for item in features:
+                if item:
+                    fetched[item['id']] = item
+            # Misses (None) are kept only for miss_ttl, like search misses
+            self.cache.set_many("features", {k: v for k, v in fetched.items() if v is not None})
+            self.cache.set_many("features", {k: v for k, v in fetched.items() if v is None}, ttl=self.miss_ttl)
+            found.update(fetched)
+        return found
+
+    def get_track_features(self, query):
+        """
+        Search for a song and return (features, track_name, artist_name), or None if not found.
+        """
+        return self.resolve_many([query])[0]
+
+    def resolve_many(self, queries):
+        """
+        Resolve many queries at once: uncached searches run concurrently over the pooled
+        session, then features are fetched in batched calls.
+        Returns a list aligned with queries of (features, track_name, artist_name) or None.
+        """
+        queries = list(queries)
+        if len(queries) > 1 and self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                tracks = list(executor.map(self.search_track, queries))
+        else:
+            tracks = [self.search_track(query) for query in queries]
+        features = self.audio_features(track['id'] for track in tracks if track)
+
+        results = []
+        for track in tracks:
+            track_features = features.get(track['id']) if track else None
+            if not track_features:
+                results.append(None)
+                continue
+            track_features = dict(track_features, year=track['year'])
+            results.append((track_features, track['name'], track['artist']))
+        return results
+
+def create_spotify_access(client_id=None, client_secret=None, prefix=None, auth=None,
+                          timeout=5, pool_size=10, cache=None):
+    """
+    Build a SpotifyAccess with a pooled session and a request timeout.
+    prefix/auth point it at another host (e.g. the local stand-in server in spotify_stub.py).
+    """
+    session = create_session(pool_size)
+    if auth is not None:
+        sp = spotipy.Spotify(auth=auth, requests_session=session, requests_timeout=timeout,
+                             retries=0, status_retries=0)
+    else:
+        auth_manager = SpotifyClientCredentials(client_id=client_id, client_secret=client_secret,
+                                                requests_session=session, requests_timeout=timeout)
+        sp = spotipy.Spotify(auth_manager=auth_manager, requests_session=session,
+                             requests_timeout=timeout, retries=0, status_retries=0)
+    if prefix is not None:
+        sp.prefix = prefix
+    return SpotifyAccess(sp, cache=cache, max_workers=pool_size)
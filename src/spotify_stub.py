@@ -0,0 +1,122 @@
+import json
+import time
+import zlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from src.spotify_client import create_spotify_access, TTLCache
+
+def _fake_id(query):
+    return f"{zlib.crc32(query.lower().encode('utf-8')):022d}"
+
+def _fake_features(track_id):
+    """
+    Deterministic, plausible audio features derived from the track id.
+    """
+    seed = int(track_id) if track_id.isdigit() else zlib.crc32(track_id.encode('utf-8'))
+    unit = lambda shift: ((seed >> shift) % 1000) / 1000
+    return {
+        "id": track_id, "danceability": unit(0), "energy": unit(3), "key": seed % 12,
+        "loudness": -30 * unit(6), "mode": seed % 2, "speechiness": unit(9) / 4,
+        "acousticness": unit(12), "instrumentalness": unit(15) / 2, "liveness": unit(18) / 2,
+        "valence": unit(21), "tempo": 60 + 140 * unit(24), "duration_ms": 120000 + seed % 180000
+    }
+
+class StubSpotifyHandler(BaseHTTPRequestHandler):
+    """
+    Mimics the /v1/search and /v1/audio-features endpoints used by SpotifyAccess.
+    Every query resolves to a deterministic fake track; latency is simulated per request.
+    """
+
+    latency = 0.02
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; don't let Nagle delay the body
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        self.server.request_count += 1
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+
+        if url.path == "/v1/search":
+            query = params.get("q", [""])[0]
+            track = {
+                "id": _fake_id(query), "name": query.title(),
+                "artists": [{"name": "Stub Artist"}], "album": {"release_date": "2021-06-01"}
+            }
+            self._send_json(200, {"tracks": {"items": [track]}})
+        elif url.path.rstrip("/") == "/v1/audio-features":
+            ids = [track_id for track_id in params.get("ids", [""])[0].split(",") if track_id]
+            if len(ids) > 100:
+                self._send_json(400, {"error": {"status": 400, "message": "Too many ids requested"}})
+                return
+            self._send_json(200, {"audio_features": [_fake_features(track_id) for track_id in ids]})
+        else:
+            self._send_json(404, {"error": {"status": 404, "message": "Not found"}})
+
+def start_stub_server(host="127.0.0.1", port=0, latency=0.02):
+    """
+    Start the stand-in server in a background thread. Returns (server, prefix URL).
+    """
+    handler = type("Handler", (StubSpotifyHandler,), {"latency": latency})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.request_count = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1/"
+
+def run_throughput(n_tracks=500, latency=0.02):
+    """
+    Compare one-at-a-time lookups against batched, cached lookups on the stand-in server.
+    """
+    server, prefix = start_stub_server(latency=latency)
+    queries = [f"stub song {i}" for i in range(n_tracks)]
+    try:
+        results = {}
+
+        # Baseline: search + single-id audio_features per track, no cache
+        access = create_spotify_access(prefix=prefix, auth="stub-token", cache=TTLCache(":memory:"))
+        server.request_count = 0
+        start = time.perf_counter()
+        for query in queries:
+            track = access.sp.search(q=query, limit=1, type='track')['tracks']['items'][0]
+            access.sp.audio_features(track['id'])
+        results["one_at_a_time"] = (time.perf_counter() - start, server.request_count)
+
+        # Batched features with a cold cache, then the same lookups warm
+        access = create_spotify_access(prefix=prefix, auth="stub-token", cache=TTLCache(":memory:"))
+        for label in ("batched_cold", "batched_warm"):
+            server.request_count = 0
+            start = time.perf_counter()
+            access.resolve_many(queries)
+            results[label] = (time.perf_counter() - start, server.request_count)
+
+        for label, (elapsed, requests_made) in results.items():
+            print(f"  {label:<14} {elapsed:7.3f}s | {requests_made:5d} HTTP requests | "
+                  f"{n_tracks / elapsed:9.1f} tracks/s")
+        return results
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Spotify API, with a throughput check.")
+    parser.add_argument("--tracks", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Simulated latency per request")
+    args = parser.parse_args()
+    try:
+        print(f"Resolving {args.tracks} tracks against the stand-in server...")
+        run_throughput(args.tracks, args.latency_ms / 1000)
+    except Exception as e:
+        print(f"Error: {e}")
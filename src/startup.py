@@ -0,0 +1,161 @@
+"""
+Background warm-up for the live predictor, plus a startup benchmark.
+
+The model, the local catalog (with its search index), the catalog score table, the
+nearest-neighbour index and the Spotify client are loaded concurrently in threads while the prompt is already showing;
+each query blocks only on the artifacts it actually uses.
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+def _load_model():
+    # A handle that follows the model registry (see model_registry.py); queries are
+    # single rows, where the memory-mapped forest is the fastest to load and run
+    from src.model_registry import load_handle
+    return load_handle(mapped=True)
+
+def _load_catalog():
+    from src.catalog import load_slim_catalog
+    return load_slim_catalog()
+
+def _load_neighbors():
+    from src.neighbor_index import load_neighbor_index
+    return load_neighbor_index()
+
+def _load_scores():
+    from src.score_table import load_score_table
+    return load_score_table()
+
+def _load_spotify():
+    from src.live_predict import get_spotify_client
+    return get_spotify_client()
+
+# Warm-up tasks in submission order; the model is needed by every query, so it goes first
+WARMUP_TASKS = {
+    "model": _load_model,
+    "catalog": _load_catalog,
+    "scores": _load_scores,
+    "spotify": _load_spotify,
+    "neighbors": _load_neighbors
+}
+
+class Warmup:
+    """
+    Loads each artifact in a background thread; get(name) waits for that one only.
+    Exceptions raised while loading are re-raised by get().
+    """
+    def __init__(self, tasks=None):
+        tasks = tasks or WARMUP_TASKS
+        self.started = time.perf_counter()
+        self.timings = {}
+        self._executor = ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="warmup")
+        self._futures = {name: self._executor.submit(self._timed, name, fn) for name, fn in tasks.items()}
+        self._executor.shutdown(wait=False)
+
+    def _timed(self, name, fn):
+        start = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            self.timings[name] = time.perf_counter() - start
+
+    def get(self, name):
+        return self._futures[name].result()
+
+    def ready(self, name):
+        return self._futures[name].done()
+
+def start_warmup():
+    return Warmup()
+
+IMPORTTIME_PATTERN = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def import_times(module="main", top=15):
+    """
+    Run `python -X importtime -c "import <module>"` and return (total_s, top imports).
+    Top imports are the heaviest top-level packages by cumulative time, in seconds.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    packages = {}
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if not match:
+            continue
+        cumulative_us, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        # Indent 1 marks a module imported directly by the entry point (not nested in another)
+        if indent == 1:
+            package = name.split(".")[0]
+            packages[package] = packages.get(package, 0) + cumulative_us / 1e6
+    heaviest = sorted(packages.items(), key=lambda item: -item[1])[:top]
+    return sum(packages.values()), heaviest
+
+def _read_until(proc, buffer, marker, timeout):
+    deadline = time.perf_counter() + timeout
+    while marker not in buffer[0]:
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"Timed out waiting for {marker!r}")
+        chunk = os.read(proc.stdout.fileno(), 4096)
+        if not chunk:
+            raise RuntimeError(f"Process exited before printing {marker!r}")
+        buffer[0] += chunk.decode(errors="replace")
+    return time.perf_counter()
+
+def time_to_prompt(query=None, timeout=120):
+    """
+    Launch `python main.py` and time the first prompt, and optionally the first answered query.
+    """
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "main.py"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL, env=env
+    )
+    buffer = [""]
+    try:
+        result = {"prompt_s": _read_until(proc, buffer, "Enter song name", timeout) - start}
+        if query:
+            sent = time.perf_counter()
+            proc.stdin.write(f"{query}\n".encode())
+            proc.stdin.flush()
+            # Every answer (prediction or error) ends with the next prompt
+            buffer[0] = ""
+            result["first_query_s"] = _read_until(proc, buffer, "Enter song name", timeout) - sent
+            result["first_answer_total_s"] = result["first_query_s"] + result["prompt_s"]
+        proc.stdin.write(b"q\n")
+        proc.stdin.flush()
+        proc.wait(timeout=timeout)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+    return result
+
+def run_startup_benchmark(query=None, repeats=3, module="main"):
+    total, heaviest = import_times(module)
+    print(f"Import time for `import {module}`: {total:.3f}s")
+    for package, seconds in heaviest:
+        print(f"  {package:<30} {seconds:.3f}s")
+
+    runs = [time_to_prompt(query) for _ in range(repeats)]
+    print(f"\nStartup over {repeats} runs (best):")
+    for key in runs[0]:
+        print(f"  {key:<22} {min(run[key] for run in runs):.3f}s")
+    return {"import_s": total, "imports": dict(heaviest), "runs": runs}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure live predictor import and startup times.")
+    parser.add_argument("--query", default=None, help="Also time the first answer to this query")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--module", default="main", help="Module whose imports are profiled")
+    args = parser.parse_args()
+    try:
+        run_startup_benchmark(query=args.query, repeats=args.repeats, module=args.module)
+    except Exception as e:
+        print(f"Error during startup benchmark: {e}")
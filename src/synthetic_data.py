@@ -0,0 +1,121 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+# Column order of the Kaggle "160k Spotify songs" CSV
+COLUMNS = [
+    'acousticness', 'artists', 'danceability', 'duration_ms', 'energy', 'explicit', 'id',
+    'instrumentalness', 'key', 'liveness', 'loudness', 'mode', 'name', 'popularity',
+    'release_date', 'speechiness', 'tempo', 'valence', 'year'
+]
+
+WORDS = [
+    "love", "night", "baby", "heart", "dance", "fire", "rain", "blue", "summer", "dream",
+    "girl", "time", "light", "home", "sweet", "river", "lights", "shape", "you", "me",
+    "forever", "wild", "golden", "midnight", "city", "stars", "moon", "road", "money", "party",
+    "crazy", "lonely", "happy", "dark", "young", "world", "tonight", "paradise", "heaven", "gold"
+]
+
+ARTIST_FIRST = ["The", "Lil", "DJ", "Big", "Young", "Miss", "Saint", "King", "Los", "Neon"]
+ARTIST_LAST = [
+    "Weeknd", "Rivers", "Echo", "Harmony", "Wolves", "Kid", "Sparks", "Waves", "Ghost", "Tigers",
+    "Lights", "Dreams", "Stone", "Velvet", "Comets", "Monarch", "Atlas", "Pilots", "Static", "Bloom"
+]
+
+def generate_catalog(n_rows, seed=42, n_artists=None):
+    """
+    Deterministic synthetic catalog with the same schema as the Kaggle dataset.
+
+    Popularity depends on year, loudness, danceability and energy (plus noise), so the
+    "popularity > 70" target is learnable and imbalanced like the real data.
+    """
+    rng = np.random.default_rng(seed)
+    n_artists = n_artists or max(n_rows // 5, 10)
+
+    artist_names = np.array([
+        f"{ARTIST_FIRST[i % len(ARTIST_FIRST)]} {ARTIST_LAST[(i // len(ARTIST_FIRST)) % len(ARTIST_LAST)]}"
+        + ("" if i < len(ARTIST_FIRST) * len(ARTIST_LAST) else f" {i}")
+        for i in range(n_artists)
+    ])
+    # A few artists release most of the songs
+    artist_weights = 1.0 / np.arange(1, n_artists + 1)
+    artist_weights /= artist_weights.sum()
+    main_artist = rng.choice(n_artists, size=n_rows, p=artist_weights)
+    featured = rng.choice(n_artists, size=n_rows)
+    has_feature = rng.random(n_rows) < 0.15
+    artists = [
+        f"['{artist_names[a]}', '{artist_names[b]}']" if both else f"['{artist_names[a]}']"
+        for a, b, both in zip(main_artist, featured, has_feature)
+    ]
+
+    words = np.array(WORDS)
+    n_words = rng.integers(1, 5, size=n_rows)
+    word_ids = rng.integers(0, len(words), size=(n_rows, 4))
+    names = [" ".join(words[word_ids[i, :n_words[i]]]).title() for i in range(n_rows)]
+
+    year = rng.integers(1921, 2021, size=n_rows)
+    danceability = rng.beta(5, 3, size=n_rows)
+    energy = rng.beta(4, 3, size=n_rows)
+    loudness = np.clip(-60 + 55 * energy + rng.normal(0, 4, size=n_rows), -60, 3)
+    acousticness = np.clip(1 - energy + rng.normal(0, 0.2, size=n_rows), 0, 1)
+
+    recency = (year - 1921) / 100
+    popularity = (
+        70 * recency + 8 * danceability + 6 * energy + 0.2 * (loudness + 20)
+        + rng.normal(0, 9, size=n_rows)
+    )
+    popularity = np.clip(np.round(popularity), 0, 100).astype(int)
+
+    month = rng.integers(1, 13, size=n_rows)
+    day = rng.integers(1, 29, size=n_rows)
+
+    df = pd.DataFrame({
+        'acousticness': acousticness,
+        'artists': artists,
+        'danceability': danceability,
+        'duration_ms': rng.integers(60000, 420000, size=n_rows),
+        'energy': energy,
+        'explicit': (rng.random(n_rows) < 0.08).astype(int),
+        'id': [f"{i:022x}" for i in rng.integers(0, 2 ** 62, size=n_rows)],
+        'instrumentalness': rng.beta(0.3, 3, size=n_rows),
+        'key': rng.integers(0, 12, size=n_rows),
+        'liveness': rng.beta(2, 8, size=n_rows),
+        'loudness': loudness,
+        'mode': (rng.random(n_rows) < 0.7).astype(int),
+        'name': names,
+        'popularity': popularity,
+        'release_date': [f"{y}-{m:02d}-{d:02d}" for y, m, d in zip(year, month, day)],
+        'speechiness': rng.beta(1, 12, size=n_rows),
+        'tempo': np.clip(rng.normal(118, 29, size=n_rows), 40, 220),
+        'valence': rng.beta(3, 3, size=n_rows),
+        'year': year
+    })
+    return df[COLUMNS]
+
+def write_catalog(path, n_rows, seed=42, chunk_rows=500000):
+    """
+    Write a synthetic catalog CSV, generating it in chunks so large sizes fit in memory.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    written = 0
+    chunk = 0
+    while written < n_rows:
+        rows = min(chunk_rows, n_rows - written)
+        df = generate_catalog(rows, seed=seed + chunk)
+        df.to_csv(path, mode='w' if chunk == 0 else 'a', header=(chunk == 0), index=False)
+        written += rows
+        chunk += 1
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Spotify-shaped catalog CSV.")
+    parser.add_argument("--rows", type=int, default=170000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=os.path.join("data", "synthetic_spotify_data.csv"))
+    args = parser.parse_args()
+    try:
+        write_catalog(args.output, args.rows, seed=args.seed)
+        print(f"Synthetic catalog with {args.rows} rows saved to {args.output}")
+    except Exception as e:
+        print(f"Error: {e}")
@@ -0,0 +1,205 @@
+"""
+Stage-level tracing for the training pipeline.
+
+Set TOPTRACK_TRACE to switch it on, either to "1" (writes traces/trace-<timestamp>.*) or to
+an output prefix such as "traces/evaluate". Every span records wall time, CPU time and RSS;
+spans nest, work across process pools, and are written at exit as
+<prefix>.json (span list) and <prefix>.trace.json (Chrome trace-event format,
+open in chrome://tracing or https://ui.perfetto.dev).
+
+When the variable is unset, span() returns a shared no-op object and traced() returns the
+function unchanged, so instrumentation costs next to nothing.
+"""
+import os
+import json
+import glob
+import time
+import atexit
+import threading
+import functools
+
+ENV_VAR = "TOPTRACK_TRACE"
+ROOT_ENV_VAR = "TOPTRACK_TRACE_ROOT_PID"
+
+ENABLED = os.environ.get(ENV_VAR, "").strip().lower() not in ("", "0", "false", "off")
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+_spans = []
+_local = threading.local()
+_lock = threading.Lock()
+
+def _rss_bytes():
+    """
+    Current resident set size (Linux); 0 where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+def _peak_rss_bytes():
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+class _Span:
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1].name if stack else None
+        self.depth = len(stack)
+        stack.append(self)
+        self.rss_start = _rss_bytes()
+        self.cpu_start = time.process_time()
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end_ns = time.time_ns()
+        cpu = time.process_time() - self.cpu_start
+        _local.stack.pop()
+        record = {
+            "name": self.name,
+            "parent": self.parent,
+            "depth": self.depth,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "start_us": self.start_ns // 1000,
+            "wall_s": (end_ns - self.start_ns) / 1e9,
+            "cpu_s": cpu,
+            "rss_mb": _rss_bytes() / 2 ** 20,
+            "rss_delta_mb": (_rss_bytes() - self.rss_start) / 2 ** 20,
+            "peak_rss_mb": _peak_rss_bytes() / 2 ** 20,
+            "error": exc_type.__name__ if exc_type else None,
+            "attrs": self.attrs
+        }
+        with _lock:
+            _spans.append(record)
+        return False
+
+def span(name, **attrs):
+    """
+    Context manager timing one pipeline stage: `with span("preprocess_data", rows=n): ...`
+    """
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name, attrs)
+
+def traced(name=None):
+    """
+    Decorator form of span(); a no-op when tracing is off.
+    """
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Span(span_name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _output_prefix():
+    return os.environ[ENV_VAR]
+
+def flush():
+    """
+    Write this process's finished spans to <prefix>.part-<pid>.json.
+    Worker processes call this after each task; the root process merges the parts at exit.
+    """
+    if not ENABLED:
+        return
+    with _lock:
+        records = list(_spans)
+    if not records:
+        return
+    path = f"{_output_prefix()}.part-{os.getpid()}.json"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(records, f)
+    os.replace(tmp_path, path)
+
+def to_chrome_trace(records):
+    """
+    Convert span records to Chrome trace-event "complete" (ph=X) events.
+    """
+    events = []
+    for record in records:
+        events.append({
+            "name": record["name"], "cat": "pipeline", "ph": "X",
+            "ts": record["start_us"], "dur": int(record["wall_s"] * 1e6),
+            "pid": record["pid"], "tid": record["tid"],
+            "args": {
+                "cpu_s": round(record["cpu_s"], 4), "rss_mb": round(record["rss_mb"], 1),
+                "peak_rss_mb": round(record["peak_rss_mb"], 1), **record["attrs"]
+            }
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def _export():
+    """
+    Root process at exit: merge every process's spans and write JSON + Chrome trace files.
+    """
+    flush()
+    prefix = _output_prefix()
+    records = []
+    for part in glob.glob(f"{glob.escape(prefix)}.part-*.json"):
+        with open(part) as f:
+            records.extend(json.load(f))
+        os.remove(part)
+    if not records:
+        return
+    records.sort(key=lambda r: r["start_us"])
+
+    with open(f"{prefix}.json", "w") as f:
+        json.dump(records, f, indent=1, default=str)
+    with open(f"{prefix}.trace.json", "w") as f:
+        json.dump(to_chrome_trace(records), f, default=str)
+    print(f"Trace with {len(records)} spans saved to {prefix}.json and {prefix}.trace.json")
+
+def _reset_after_fork():
+    global _spans, _lock
+    _spans = []
+    _lock = threading.Lock()
+    _local.__dict__.clear()
+
+if ENABLED:
+    if os.environ[ENV_VAR].strip().lower() in ("1", "true", "on", "yes"):
+        os.environ[ENV_VAR] = os.path.join("traces", time.strftime("trace-%Y%m%d-%H%M%S"))
+    # Child processes inherit the resolved prefix and know they are not the root
+    if ROOT_ENV_VAR not in os.environ:
+        os.environ[ROOT_ENV_VAR] = str(os.getpid())
+    if os.environ[ROOT_ENV_VAR] == str(os.getpid()):
+        atexit.register(_export)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,31 +1,92 @@
 import pandas as pd
-from sklearn.linear_model import LogisticRegression
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.utils.class_weight import compute_class_weight
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.neighbors import KNeighborsClassifier
 from xgboost import XGBClassifier
-from sklearn.metrics import accuracy_score, classification_report
+from sklearn.metrics import accuracy_score, classification_report, f1_score, roc_auc_score
 from src.data_loader import load_data
-from src.data_engineering import preprocess_data, split_data
+from src.data_engineering import preprocess_data, preprocess_streaming, split_data, TRAINING_COLUMNS
+from src.tracing import span, traced
+from src.neighbor_index import KDTreeKNNClassifier
+from src.artifact_cache import ArtifactCache, hash_data, model_key
+from src.downsampling import DownsampledClassifier
 import time
+import argparse
 
-def get_models():
+class ChunkedLogisticRegression(ClassifierMixin, BaseEstimator):
+    """
+    Logistic regression fitted by SGD (log loss) one block of rows at a time, so memory-mapped
+    training data is never copied whole into RAM (LogisticRegression makes a float64 copy).
+    Blocks are visited in a shuffled order each epoch. class_weight='balanced' is computed
+    from all labels up front, since partial_fit cannot derive it from one block.
+    """
+
+    def __init__(self, block_rows=100000, epochs=5, alpha=1e-4, random_state=42):
+        self.block_rows = block_rows
+        self.epochs = epochs
+        self.alpha = alpha
+        self.random_state = random_state
+
+    def _blocks(self, n_rows):
+        return [(start, min(start + self.block_rows, n_rows)) for start in range(0, n_rows, self.block_rows)]
+
+    def fit(self, X, y):
+        y = np.asarray(y)
+        classes = np.unique(y)
+        class_weight = dict(zip(classes.tolist(), compute_class_weight("balanced", classes=classes, y=y)))
+        self.model_ = SGDClassifier(loss="log_loss", alpha=self.alpha, class_weight=class_weight,
+                                    random_state=self.random_state)
+        rng = np.random.default_rng(self.random_state)
+        blocks = self._blocks(len(y))
+        for _ in range(self.epochs):
+            for i in rng.permutation(len(blocks)):
+                start, stop = blocks[i]
+                self.model_.partial_fit(np.asarray(X[start:stop], dtype=np.float64), y[start:stop], classes=classes)
+        self.classes_ = self.model_.classes_
+        self.n_features_in_ = self.model_.n_features_in_
+        return self
+
+    def predict_proba(self, X):
+        return np.concatenate([self.model_.predict_proba(np.asarray(X[start:stop], dtype=np.float64))
+                               for start, stop in self._blocks(len(X))])
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+def get_models(negative_rate=None, streaming=False):
     """
     Returns a dictionary of initialized models.
+    With negative_rate (fast mode), each model trains on all hits and that fraction of the
+    non-hits, with its probabilities corrected for the sampling (see downsampling.py).
+    With streaming (--stream), Logistic Regression is fitted block by block. The others
+    still hold the training rows in memory: the KD-tree and the forest's trees are built
+    in RAM, and XGBoost builds its own quantized copy.
     """
-    return {
+    models = {
         "Logistic Regression": LogisticRegression(class_weight='balanced', max_iter=1000, random_state=42),
         "Random Forest": RandomForestClassifier(class_weight='balanced', n_estimators=100, random_state=42),
         "XGBoost": XGBClassifier(scale_pos_weight=20, eval_metric='logloss', use_label_encoder=False, random_state=42),
-        "KNN": KNeighborsClassifier(n_neighbors=5)
+        "KNN": KDTreeKNNClassifier(n_neighbors=5)
     }
+    if streaming:
+        models["Logistic Regression"] = ChunkedLogisticRegression()
+    if negative_rate is not None:
+        models = {name: DownsampledClassifier(model, negative_rate) for name, model in models.items()}
+    return models
 
-def train_and_evaluate(X_train, X_test, y_train, y_test):
+@traced("train_and_evaluate")
+def train_and_evaluate(X_train, X_test, y_train, y_test, use_cache=True, negative_rate=None, streaming=False):
     """
     Train and evaluate multiple models.
+    Fitted models are cached under a hash of the training data and each model's parameters.
     """
     
     # Initialize models
-    models = get_models()
+    models = get_models(negative_rate, streaming)
+    cache = ArtifactCache()
+    data_key = hash_data(X_train, y_train)
     
     results = {}
     
@@ -36,15 +97,27 @@ def train_and_evaluate(X_train, X_test, y_train, y_test):
         print(f"Training {name}...")
         start_time = time.time()
         
-        # Train
-        model.fit(X_train, y_train)
+        # Train (or reuse an identical earlier fit)
+        key = model_key(data_key, name, model)
+        cached_model = cache.get("trained", key) if use_cache else None
+        if cached_model is not None:
+            model = cached_model
+            print("  (reusing cached fit)")
+        else:
+            with span(f"fit:{name}", rows=len(X_train)):
+                model.fit(X_train, y_train)
+            if use_cache:
+                with span(f"cache_model:{name}"):
+                    cache.save("trained", key, model)
         
         # Predict
-        y_pred = model.predict(X_test)
+        with span(f"predict:{name}", rows=len(X_test)):
+            y_pred = model.predict(X_test)
         
         # Evaluate
-        accuracy = accuracy_score(y_test, y_pred)
-        report = classification_report(y_test, y_pred)
+        with span(f"metrics:{name}"):
+            accuracy = accuracy_score(y_test, y_pred)
+            report = classification_report(y_test, y_pred)
         
         elapsed_time = time.time() - start_time
         print(f"Done in {elapsed_time:.2f}s | Accuracy: {accuracy:.4f}")
@@ -57,23 +130,79 @@ def train_and_evaluate(X_train, X_test, y_train, y_test):
 
     return results
 
+def _fit_and_score(model, X_train, X_test, y_train, y_test):
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - start
+    proba = model.predict_proba(X_test)[:, list(model.classes_).index(1)]
+    y_pred = model.predict(X_test)
+    return {
+        "fit_s": fit_s, "rows": getattr(model, "n_train_rows_", len(y_train)),
+        "accuracy": accuracy_score(y_test, y_pred), "f1": f1_score(y_test, y_pred, zero_division=0),
+        "roc_auc": roc_auc_score(y_test, proba)
+    }
+
+@traced("compare_downsampling")
+def compare_downsampling(X_train, X_test, y_train, y_test, negative_rate):
+    """
+    Fit every model on the full training set and in fast mode, and report the accuracy,
+    F1 and AUC deltas next to the fit-time savings. Nothing is cached, so the times are real.
+    """
+    full_models = get_models()
+    fast_models = get_models(negative_rate)
+    comparison = {}
+    print(f"\nFull training vs. fast mode (all hits + {negative_rate:.0%} of non-hits)...")
+    for name in full_models:
+        with span(f"compare:{name}"):
+            full = _fit_and_score(full_models[name], X_train, X_test, y_train, y_test)
+            fast = _fit_and_score(fast_models[name], X_train, X_test, y_train, y_test)
+        comparison[name] = {"full": full, "fast": fast}
+
+    print(f"\n{'Model':<20} {'Rows':>15} {'Fit s':>15} {'Speedup':>8} {'d Acc':>8} {'d F1':>8} {'d AUC':>8}")
+    for name, result in comparison.items():
+        full, fast = result["full"], result["fast"]
+        print(f"{name:<20} {full['rows']:>7}/{fast['rows']:<7} {full['fit_s']:>7.2f}/{fast['fit_s']:<7.2f} "
+              f"{full['fit_s'] / max(fast['fit_s'], 1e-9):>7.1f}x "
+              f"{fast['accuracy'] - full['accuracy']:>+8.4f} {fast['f1'] - full['f1']:>+8.4f} "
+              f"{fast['roc_auc'] - full['roc_auc']:>+8.4f}")
+    return comparison
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train and evaluate all models on a train/test split.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Preprocess out-of-core and train from memory-mapped files. Logistic Regression is "
+                             "fitted in row blocks; Random Forest, XGBoost and KNN still need the training rows in RAM")
+    parser.add_argument("--chunksize", type=int, default=500000, help="Rows per chunk with --stream")
+    parser.add_argument("--negative-rate", type=float, default=None,
+                        help="Fast mode: train on all hits and this fraction of the non-hits")
+    parser.add_argument("--compare", action="store_true",
+                        help="With --negative-rate, compare fast mode against full training")
+    args = parser.parse_args()
     try:
         # Load and Prepare Data
-        df = load_data()
-        X, y = preprocess_data(df)
+        if args.stream:
+            X, y = preprocess_streaming(chunksize=args.chunksize)
+        else:
+            df = load_data(columns=TRAINING_COLUMNS)
+            X, y = preprocess_data(df)
         X_train, X_test, y_train, y_test = split_data(X, y)
         
-        # Train Models
-        results = train_and_evaluate(X_train, X_test, y_train, y_test)
-        
-        # Detailed Reports
-        print("\n" + "="*60)
-        print("FINAL EVALUATION REPORTS")
-        print("="*60)
-        for name, data in results.items():
-            print(f"\nModel: {name}")
-            print(data['report'])
+        if args.compare:
+            if args.negative_rate is None:
+                raise ValueError("--compare needs --negative-rate")
+            compare_downsampling(X_train, X_test, y_train, y_test, args.negative_rate)
+        else:
+            # Train Models
+            results = train_and_evaluate(X_train, X_test, y_train, y_test, negative_rate=args.negative_rate,
+                                         streaming=args.stream)
+            
+            # Detailed Reports
+            print("\n" + "="*60)
+            print("FINAL EVALUATION REPORTS")
+            print("="*60)
+            for name, data in results.items():
+                print(f"\nModel: {name}")
+                print(data['report'])
             
     except Exception as e:
         print(f"Error during training: {e}")
@@ -0,0 +1,257 @@
+import os
+import json
+import math
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import train_test_split
+from src.data_loader import load_data
+from src.data_engineering import preprocess_data, TRAINING_COLUMNS
+from src.train_models import get_models
+from src.scheduler import share_array, attach_array
+
+RESULTS_PATH = os.path.join("models", "tuning_results.json")
+
+# Search space per model family. Lists are sampled uniformly, ("log", low, high) log-uniformly
+# and ("int", low, high) as integers in [low, high].
+SEARCH_SPACES = {
+    "Logistic Regression": {
+        "C": ("log", 1e-3, 1e2),
+        "class_weight": ["balanced", None]
+    },
+    "Random Forest": {
+        "max_depth": [None, 10, 20, 30],
+        "min_samples_leaf": [1, 2, 5, 10],
+        "max_features": ["sqrt", 0.5, None],
+        "class_weight": ["balanced", "balanced_subsample", None]
+    },
+    "XGBoost": {
+        "learning_rate": ("log", 0.01, 0.3),
+        "max_depth": ("int", 3, 10),
+        "subsample": [0.6, 0.8, 1.0],
+        "colsample_bytree": [0.6, 0.8, 1.0],
+        "scale_pos_weight": [1, 5, 10, 20]
+    },
+    "KNN": {
+        "n_neighbors": ("int", 3, 50),
+        "weights": ["uniform", "distance"],
+        "p": [1, 2]
+    }
+}
+
+# Families whose second resource is the number of trees / boosting rounds
+TREE_FAMILIES = {"Random Forest", "XGBoost"}
+
+def sample_config(space, rng):
+    config = {}
+    for param, spec in space.items():
+        if isinstance(spec, tuple) and spec[0] == "log":
+            config[param] = float(math.exp(rng.uniform(math.log(spec[1]), math.log(spec[2]))))
+        elif isinstance(spec, tuple) and spec[0] == "int":
+            config[param] = int(rng.integers(spec[1], spec[2] + 1))
+        else:
+            config[param] = spec[int(rng.integers(len(spec)))]
+    return config
+
+def _evaluate_config(task):
+    """
+    Worker entry point: fit one configuration on a subset of the training split and
+    score it on the validation split. Returns the score and the CPU/wall time spent.
+    """
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    X_train = attach_array(task["X_train"])
+    y_train = attach_array(task["y_train"])
+    X_val = attach_array(task["X_val"])
+    y_val = attach_array(task["y_val"])
+    columns = task["columns"]
+
+    subset = task["subset"]
+    model = task["model"]
+    model.fit(pd.DataFrame(X_train[subset], columns=columns), y_train[subset])
+    score = get_scorer(task["scoring"])(model, pd.DataFrame(X_val, columns=columns), y_val)
+
+    return {
+        "family": task["family"], "config_id": task["config_id"], "score": float(score),
+        "cpu_seconds": time.process_time() - cpu_start,
+        "wall_seconds": time.perf_counter() - wall_start
+    }
+
+def _abandon(executor):
+    """
+    Stop a process pool without waiting: cancel queued work and terminate busy workers.
+    """
+    # shutdown(wait=False) alone would still leave running fits to finish before exit
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join()
+
+def successive_halving(X, y, families=None, n_candidates=27, eta=3, min_fraction=1 / 27,
+                       max_trees=300, budget_seconds=600, scoring="accuracy",
+                       max_workers=None, random_state=42):
+    """
+    Budgeted hyperparameter search over the model families in get_models().
+
+    Every family starts with n_candidates random configurations trained on min_fraction
+    of the training split (and, for tree models, the same fraction of max_trees). After
+    each rung only the best 1/eta configurations are promoted to eta times the resource.
+    All families' configurations in a rung run in one process pool. When the wall-clock
+    budget runs out mid-rung, that rung's unfinished evaluations are discarded (queued ones
+    cancelled, running workers terminated) and the best configuration of each family's last
+    completed rung is reported.
+    """
+    families = list(families or SEARCH_SPACES)
+    base_models = get_models()
+    rng = np.random.default_rng(random_state)
+
+    columns = list(X.columns) if isinstance(X, pd.DataFrame) else None
+    X_train, X_val, y_train, y_val = train_test_split(
+        np.asarray(X), np.asarray(y), test_size=0.2, random_state=random_state, stratify=np.asarray(y)
+    )
+    # One fixed random order: a rung's subset is always a prefix of the next rung's
+    subset_order = rng.permutation(len(X_train))
+
+    state = {}
+    for family in families:
+        configs = [sample_config(SEARCH_SPACES[family], rng) for _ in range(n_candidates)]
+        state[family] = {
+            "configs": configs, "alive": list(range(len(configs))), "best": None,
+            "cpu_seconds": 0.0, "wall_seconds": 0.0, "evaluations": 0
+        }
+
+    blocks = []
+    descriptors = {}
+    for label, array in (("X_train", X_train), ("y_train", y_train), ("X_val", X_val), ("y_val", y_val)):
+        block, descriptors[label] = share_array(array)
+        blocks.append(block)
+
+    deadline = time.perf_counter() + budget_seconds
+    fraction = min_fraction
+    rung = 0
+    executor = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count())
+    out_of_budget = False
+    try:
+        while any(len(s["alive"]) for s in state.values()) and time.perf_counter() < deadline:
+            n_rows = max(int(len(X_train) * fraction), 50)
+            subset = np.sort(subset_order[:n_rows])
+            n_trees = max(int(max_trees * fraction), 10)
+            print(f"Rung {rung}: {fraction:.1%} of training data ({n_rows} rows), up to {n_trees} trees")
+
+            futures = []
+            for family, s in state.items():
+                for config_id in s["alive"]:
+                    model = clone(base_models[family]).set_params(**s["configs"][config_id])
+                    if "n_jobs" in model.get_params():
+                        model.set_params(n_jobs=1)
+                    if family in TREE_FAMILIES:
+                        model.set_params(n_estimators=n_trees)
+                    futures.append(executor.submit(_evaluate_config, {
+                        "family": family, "config_id": config_id, "model": model,
+                        "subset": subset, "columns": columns, "scoring": scoring, **descriptors
+                    }))
+
+            rung_scores = {family: {} for family in state}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=max(deadline - time.perf_counter(), 0),
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    s = state[result["family"]]
+                    s["cpu_seconds"] += result["cpu_seconds"]
+                    s["wall_seconds"] += result["wall_seconds"]
+                    s["evaluations"] += 1
+                    rung_scores[result["family"]][result["config_id"]] = result["score"]
+                if not done and time.perf_counter() >= deadline:
+                    # Out of budget: discard this rung's unfinished evaluations (see finally)
+                    out_of_budget = True
+                    print("  Budget exhausted; keeping results from the last completed rung.")
+                    break
+
+            complete = not pending
+            for family, s in state.items():
+                scores = rung_scores[family]
+                if not complete or not scores:
+                    continue
+                ranked = sorted(scores, key=scores.get, reverse=True)
+                top = ranked[0]
+                s["best"] = {
+                    "params": s["configs"][top], "score": scores[top], "rung": rung,
+                    "data_fraction": fraction, "n_estimators": n_trees if family in TREE_FAMILIES else None
+                }
+                print(f"  {family}: best {scoring} {scores[top]:.4f} ({len(scores)} configs)")
+                # Promote the top 1/eta; the family is finished after its full-resource rung
+                s["alive"] = ranked[:max(len(ranked) // eta, 1)] if fraction < 1 else []
+
+            if not complete:
+                break
+            fraction = min(fraction * eta, 1.0)
+            rung += 1
+    finally:
+        if out_of_budget:
+            _abandon(executor)
+        else:
+            executor.shutdown()
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    return {
+        family: {
+            "best": s["best"], "evaluations": s["evaluations"],
+            "cpu_seconds": round(s["cpu_seconds"], 2), "wall_seconds": round(s["wall_seconds"], 2)
+        }
+        for family, s in state.items()
+    }
+
+def print_report(results, scoring="accuracy"):
+    print("\n" + "=" * 60)
+    print("BEST CONFIGURATION PER MODEL FAMILY")
+    print("=" * 60)
+    for family, result in results.items():
+        best = result["best"]
+        print(f"\n{family}: {result['evaluations']} evaluations, "
+              f"{result['cpu_seconds']:.1f} CPU-s, {result['wall_seconds']:.1f} task wall-s")
+        if best is None:
+            print("  No rung completed within the budget.")
+            continue
+        print(f"  {scoring}: {best['score']:.4f} at {best['data_fraction']:.1%} of the data"
+              + (f", {best['n_estimators']} trees" if best['n_estimators'] else ""))
+        print(f"  params: {best['params']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Successive-halving hyperparameter search for all model families.")
+    parser.add_argument("--budget", type=float, default=600, help="Wall-clock budget in seconds")
+    parser.add_argument("--candidates", type=int, default=27, help="Random configurations per family")
+    parser.add_argument("--eta", type=int, default=3, help="Keep the best 1/eta configurations at each rung")
+    parser.add_argument("--max-trees", type=int, default=300, help="Trees / boosting rounds at the full resource")
+    parser.add_argument("--families", nargs="*", choices=list(SEARCH_SPACES), help="Restrict to these families")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    try:
+        df = load_data(columns=TRAINING_COLUMNS)
+        X, y = preprocess_data(df)
+        start = time.perf_counter()
+        results = successive_halving(
+            X, y, families=args.families, n_candidates=args.candidates, eta=args.eta,
+            min_fraction=1 / args.eta ** 3, max_trees=args.max_trees,
+            budget_seconds=args.budget, max_workers=args.workers
+        )
+        print_report(results)
+        print(f"\nTotal search time: {time.perf_counter() - start:.1f}s")
+
+        os.makedirs("models", exist_ok=True)
+        with open(RESULTS_PATH, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"Results saved to {RESULTS_PATH}")
+    except Exception as e:
+        print(f"Error during tuning: {e}")